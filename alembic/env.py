@@ -13,6 +13,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.base import Base
 from app.config import settings
 from app.models.category import Category
+from app.models.data_version import DataVersion
 from app.models.point import Point
 
 # this is the Alembic Config object, which provides
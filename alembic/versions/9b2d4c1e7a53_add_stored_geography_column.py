@@ -0,0 +1,96 @@
+"""Add stored geography column to points
+
+Revision ID: 9b2d4c1e7a53
+Revises: 4f36fddeda68
+Create Date: 2026-10-17 09:12:44.318201
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b2d4c1e7a53"
+down_revision = "4f36fddeda68"
+branch_labels = None
+depends_on = None
+
+# Rows converted per transaction while backfilling, so no single UPDATE holds
+# row locks on a large share of the table
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_geog(skip_locked: bool = True):
+    """
+    Populate geog in batches; run inside an autocommit block so each commits.
+
+    Runs until a batch finds nothing left to convert. With skip_locked, rows
+    held by concurrent writers are left for a later pass without it, which
+    waits for them.
+    """
+    conn = op.get_bind()
+    lock = "FOR UPDATE SKIP LOCKED" if skip_locked else "FOR UPDATE"
+    while True:
+        result = conn.execute(
+            sa.text(
+                f"""
+                UPDATE points SET geog = geometry::geography
+                WHERE id IN (
+                    SELECT id FROM points
+                    WHERE geog IS NULL
+                    LIMIT :batch_size
+                    {lock}
+                )
+                """
+            ),
+            {"batch_size": BACKFILL_BATCH_SIZE},
+        )
+        if result.rowcount == 0:
+            break
+
+
+def upgrade():
+    # Nullable column without a default: a catalog-only change, no rewrite
+    op.execute(
+        "ALTER TABLE points ADD COLUMN IF NOT EXISTS geog geography(Point, 4326)"
+    )
+
+    with op.get_context().autocommit_block():
+        backfill_geog()
+
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_points_geog "
+            "ON points USING GIST (geog)"
+        )
+
+        # A NULL geog drops the point from every geodesic query, so from here
+        # on new rows must carry one; instances still on the previous release
+        # can no longer insert and have to be drained first
+        op.execute(
+            "ALTER TABLE points ADD CONSTRAINT points_geog_not_null "
+            "CHECK (geog IS NOT NULL) NOT VALID"
+        )
+
+        # Rows written since, and rows skipped above because a writer held
+        # them; this time the pass waits for those writers
+        backfill_geog(skip_locked=False)
+
+        # Validating doesn't block writes, and lets SET NOT NULL skip its scan
+        op.execute("ALTER TABLE points VALIDATE CONSTRAINT points_geog_not_null")
+        op.execute("ALTER TABLE points ALTER COLUMN geog SET NOT NULL")
+        op.execute("ALTER TABLE points DROP CONSTRAINT points_geog_not_null")
+
+        # Superseded by idx_points_geog
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_points_geography")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_points_geography "
+            "ON points USING GIST (geography(geometry))"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_points_geog")
+
+    op.execute("ALTER TABLE points DROP COLUMN IF EXISTS geog")
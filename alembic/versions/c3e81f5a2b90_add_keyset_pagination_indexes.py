@@ -0,0 +1,35 @@
+"""Add keyset pagination indexes to points
+
+Revision ID: c3e81f5a2b90
+Revises: 9b2d4c1e7a53
+Create Date: 2026-10-17 14:03:27.551904
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c3e81f5a2b90"
+down_revision = "9b2d4c1e7a53"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "idx_points_created_at_id": "created_at, id",
+    "idx_points_category_id_id": "category_id, id",
+    "idx_points_category_created_at_id": "category_id, created_at, id",
+}
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON points ({columns})"
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
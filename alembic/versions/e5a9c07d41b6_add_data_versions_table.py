@@ -0,0 +1,30 @@
+"""Add data_versions table
+
+Revision ID: e5a9c07d41b6
+Revises: c3e81f5a2b90
+Create Date: 2026-10-17 16:42:09.118734
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5a9c07d41b6"
+down_revision = "c3e81f5a2b90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "data_versions",
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade():
+    op.drop_table("data_versions")
@@ -1,7 +1,7 @@
 # app/api/__init__.py
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, categories, points
+from app.api.endpoints import admin, auth, categories, points
 
 # Create API router
 api_router = APIRouter()
@@ -10,3 +10,4 @@ api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(points.router, prefix="/points", tags=["points"])
 api_router.include_router(categories.router, prefix="/categories", tags=["categories"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
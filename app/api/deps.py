@@ -1,26 +1,48 @@
 # app/api/deps.py
-from typing import Generator
+from typing import Any, AsyncGenerator, Generator, Optional, Union
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.core.exceptions import AuthenticationException
+from app.core.caching import version_etag
+from app.core.constants import ExportFormat
+from app.core.exceptions import AuthenticationException, NotModifiedException
 from app.core.security import is_token_blacklisted
-from app.database import SessionLocal
+from app.core.utils import etag_matches
+from app.database import (
+    AsyncSessionLocal,
+    AsyncSessionRunner,
+    SessionLocal,
+    SyncSessionRunner,
+    open_session_runner,
+)
 from app.models.user import User
 from app.repositories.category import CategoryRepository
+from app.repositories.data_version import DataVersionRepository
 from app.repositories.point import PointRepository
 from app.repositories.user import UserRepository
 from app.schemas.user import TokenData
+from app.services.async_adapter import AsyncServiceAdapter
 from app.services.category import CategoryService
+from app.services.columnar import table_format_for
+from app.services.counts import PointCounts, point_counts
 from app.services.point import PointService
+from app.services.query_cache import QueryCache, query_cache
 from app.services.user import UserService
+from app.spatial.clusters import cluster_cache
+from app.spatial.point_index import PointIndex, point_index
+from app.spatial.tiles import TileCache, tile_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token")
 
+SessionRunner = Union[AsyncSessionRunner, SyncSessionRunner]
+
 
 def get_db() -> Generator[Session, None, None]:
     """Provide a database session with proper error handling"""
@@ -35,49 +57,239 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Provide an async database session with proper error handling"""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            # Always rollback on exception
+            await db.rollback()
+            raise
+
+
+async def get_sync_session_runner(
+    db: Session = Depends(get_db),
+) -> SyncSessionRunner:
+    """Run repository work on a psycopg2 session in the threadpool"""
+    return SyncSessionRunner(db)
+
+
+async def get_async_session_runner(
+    db: AsyncSession = Depends(get_async_db),
+) -> AsyncSessionRunner:
+    """Run repository work on an asyncpg-backed AsyncSession"""
+    return AsyncSessionRunner(db)
+
+
+# Selected once at startup from DATABASE_MODE
+get_session_runner = (
+    get_async_session_runner
+    if settings.DATABASE_MODE == "async"
+    else get_sync_session_runner
+)
+
+
+def get_session_runner_factory():
+    """Opens session runners that outlive the request, for streamed responses"""
+    return open_session_runner
+
+
+def json_body(adapter: TypeAdapter):
+    """Dependency validating the raw JSON body against `adapter` in one pass"""
+
+    async def parse_body(request: Request):
+        try:
+            return adapter.validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(
+                [
+                    {**error, "loc": ("body", *error["loc"])}
+                    for error in e.errors(include_url=False)
+                ]
+            )
+
+    return parse_body
+
+
+def get_table_format(request: Request) -> Optional[ExportFormat]:
+    """Arrow or Parquet when the Accept header prefers it, else None"""
+    return table_format_for(request.headers.get("accept"))
+
+
+def get_point_index() -> Optional[PointIndex]:
+    """This worker's in-memory point index, when enabled"""
+    return point_index if settings.SPATIAL_INDEX_ENABLED else None
+
+
+def get_tile_cache() -> TileCache:
+    """This worker's vector tile cache"""
+    return tile_cache
+
+
+def get_cluster_cache() -> TileCache:
+    """This worker's per-tile cluster cache"""
+    return cluster_cache
+
+
+def get_point_counts() -> PointCounts:
+    """This worker's per-category point counters"""
+    return point_counts
+
+
+def get_query_cache() -> QueryCache:
+    """This worker's nearby/nearest/within result cache"""
+    return query_cache
+
+
 # Repository dependencies
-def get_user_repository(db: Session = Depends(get_db)) -> UserRepository:
+async def get_user_repository(
+    runner: SessionRunner = Depends(get_session_runner),
+) -> UserRepository:
     """Provide a UserRepository instance"""
-    return UserRepository(db)
+    return UserRepository(runner.session)
 
 
-def get_category_repository(db: Session = Depends(get_db)) -> CategoryRepository:
+async def get_category_repository(
+    runner: SessionRunner = Depends(get_session_runner),
+) -> CategoryRepository:
     """Provide a CategoryRepository instance"""
-    return CategoryRepository(db)
+    return CategoryRepository(runner.session)
 
 
-def get_point_repository(db: Session = Depends(get_db)) -> PointRepository:
+async def get_point_repository(
+    runner: SessionRunner = Depends(get_session_runner),
+) -> PointRepository:
     """Provide a PointRepository instance"""
-    return PointRepository(db)
+    return PointRepository(runner.session)
+
+
+async def get_data_version_repository(
+    runner: SessionRunner = Depends(get_session_runner),
+) -> DataVersionRepository:
+    """Provide a DataVersionRepository instance"""
+    return DataVersionRepository(runner.session)
 
 
 # Service dependencies
-def get_user_service(
+async def get_user_service(
     user_repository: UserRepository = Depends(get_user_repository),
-) -> UserService:
+    runner: SessionRunner = Depends(get_session_runner),
+) -> AsyncServiceAdapter[UserService]:
     """Provide a UserService instance"""
-    return UserService(user_repository)
+    return AsyncServiceAdapter(UserService(user_repository), runner)
 
 
-def get_category_service(
+async def get_category_service(
     category_repository: CategoryRepository = Depends(get_category_repository),
-) -> CategoryService:
+    query_cache: QueryCache = Depends(get_query_cache),
+    tile_cache: TileCache = Depends(get_tile_cache),
+    cluster_cache: TileCache = Depends(get_cluster_cache),
+    point_counts: PointCounts = Depends(get_point_counts),
+    point_index: Optional[PointIndex] = Depends(get_point_index),
+    runner: SessionRunner = Depends(get_session_runner),
+) -> AsyncServiceAdapter[CategoryService]:
     """Provide a CategoryService instance"""
-    return CategoryService(category_repository)
+    return AsyncServiceAdapter(
+        CategoryService(
+            category_repository,
+            query_cache,
+            tile_cache,
+            cluster_cache,
+            point_counts,
+            point_index,
+        ),
+        runner,
+    )
 
 
-def get_point_service(
+async def get_point_service(
     point_repository: PointRepository = Depends(get_point_repository),
     category_repository: CategoryRepository = Depends(get_category_repository),
-) -> PointService:
+    point_index: Optional[PointIndex] = Depends(get_point_index),
+    tile_cache: TileCache = Depends(get_tile_cache),
+    cluster_cache: TileCache = Depends(get_cluster_cache),
+    point_counts: PointCounts = Depends(get_point_counts),
+    query_cache: QueryCache = Depends(get_query_cache),
+    runner: SessionRunner = Depends(get_session_runner),
+) -> AsyncServiceAdapter[PointService]:
     """Provide a PointService instance"""
-    return PointService(point_repository, category_repository)
+    return AsyncServiceAdapter(
+        PointService(
+            point_repository,
+            category_repository,
+            point_index,
+            tile_cache,
+            cluster_cache,
+            point_counts,
+            query_cache,
+        ),
+        runner,
+    )
+
+
+# Conditional GET dependencies
+def _check_etag(request: Request, *versions: Any) -> None:
+    """
+    Tag the response with an ETag over `versions` and the request, and stop
+    with 304 if If-None-Match already holds it.
+
+    CacheControlMiddleware puts the ETag on the response.
+    """
+    etag = version_etag(
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        request.headers.get("accept"),
+        *versions,
+    )
+    request.state.etag = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise NotModifiedException()
+
+
+def versioned(*tables: str):
+    """Dependency answering conditional GETs from the data versions of `tables`"""
+
+    async def check_versions(
+        request: Request,
+        version_repository: DataVersionRepository = Depends(
+            get_data_version_repository
+        ),
+        runner: SessionRunner = Depends(get_session_runner),
+    ) -> None:
+        versions = await runner.run(version_repository.get_versions, tables)
+        _check_etag(request, sorted(versions.items()))
+
+    return check_versions
+
+
+async def check_point_version(
+    point_id: int,
+    request: Request,
+    point_repository: PointRepository = Depends(get_point_repository),
+    version_repository: DataVersionRepository = Depends(get_data_version_repository),
+    runner: SessionRunner = Depends(get_session_runner),
+) -> None:
+    """Answer conditional GETs of one point from its updated_at"""
+
+    def load():
+        updated_at = point_repository.get_updated_at(id=point_id)
+        # Points carry their category's name and color
+        versions = version_repository.get_versions(["categories"])
+        return updated_at, versions["categories"]
+
+    updated_at, category_version = await runner.run(load)
+    if updated_at is None:
+        # Let the service answer 404
+        return
+    _check_etag(request, updated_at.isoformat(), category_version)
 
 
 # Authentication dependencies
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
     user_repository: UserRepository = Depends(get_user_repository),
+    runner: SessionRunner = Depends(get_session_runner),
 ) -> User:
     """Get current user from JWT token"""
     try:
@@ -98,14 +310,14 @@ def get_current_user(
         raise AuthenticationException(detail="Invalid authentication credentials")
 
     # Get user from database
-    user = user_repository.get(id=int(token_data.user_id))
+    user = await runner.run(user_repository.get, id=int(token_data.user_id))
     if user is None:
         raise AuthenticationException(detail="User not found")
 
     return user
 
 
-def get_current_active_user(
+async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
     """Verify user is active"""
@@ -116,7 +328,7 @@ def get_current_active_user(
     return current_user
 
 
-def get_current_superuser(
+async def get_current_superuser(
     current_user: User = Depends(get_current_user),
 ) -> User:
     """Verify user is a superuser"""
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_current_superuser
+from app.config import settings
+from app.core.pool_metrics import async_pool_metrics, sync_pool_metrics
+from app.database import async_engine, engine
+from app.models.user import User
+from app.schemas.metrics import DatabasePoolStats
+
+router = APIRouter()
+
+
+@router.get("/db-pool", response_model=DatabasePoolStats)
+async def read_db_pool_stats(current_user: User = Depends(get_current_superuser)):
+    return DatabasePoolStats(
+        mode=settings.DATABASE_MODE,
+        pools={
+            "sync": sync_pool_metrics.snapshot(engine.pool),
+            "async": async_pool_metrics.snapshot(async_engine.pool),
+        },
+    )
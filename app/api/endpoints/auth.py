@@ -7,6 +7,7 @@ from app.models.user import User
 from app.schemas.user import Token
 from app.schemas.user import User as UserSchema
 from app.schemas.user import UserCreate
+from app.services.async_adapter import AsyncServiceAdapter
 from app.services.user import UserService
 
 router = APIRouter()
@@ -14,33 +15,36 @@ security = HTTPBearer()
 
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    service: UserService = Depends(get_user_service),
+    service: AsyncServiceAdapter[UserService] = Depends(get_user_service),
 ):
-    user = service.authenticate(email=form_data.username, password=form_data.password)
+    user = await service.authenticate(
+        email=form_data.username, password=form_data.password
+    )
 
-    return service.create_access_token(user_id=user.id)
+    return await service.create_access_token(user_id=user.id)
 
 
 @router.post(
     "/register", response_model=UserSchema, status_code=status.HTTP_201_CREATED
 )
-def register_user(
-    user_in: UserCreate, service: UserService = Depends(get_user_service)
+async def register_user(
+    user_in: UserCreate,
+    service: AsyncServiceAdapter[UserService] = Depends(get_user_service),
 ):
-    return service.create_user(user_in=user_in)
+    return await service.create_user(user_in=user_in)
 
 
 @router.get("/me", response_model=UserSchema)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     return UserSchema.model_validate(current_user)
 
 
 @router.post("/logout")
-def logout(
+async def logout(
     token: str = Depends(security),
-    service: UserService = Depends(get_user_service),
+    service: AsyncServiceAdapter[UserService] = Depends(get_user_service),
 ):
-    service.logout(token=token)
+    await service.logout(token=token)
     return {"message": "Successfully logged out"}
@@ -1,57 +1,89 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, Query, status
 
 from app.api.deps import (
     get_category_service,
     get_current_superuser,
+    versioned,
 )
+from app.core.constants import PageOrder
+from app.core.encoders import schema_response
 from app.models.user import User
 from app.schemas.category import Category, CategoryCreate, CategoryUpdate
 from app.schemas.pagination import PagedResponse, PageParams
+from app.services.async_adapter import AsyncServiceAdapter
 from app.services.category import CategoryService
 
 router = APIRouter()
 
+# Reads answered from data versions when If-None-Match still matches
+_NOT_MODIFIED = {304: {}}
+_CATEGORIES_VERSIONED = [Depends(versioned("categories"))]
+
 
 @router.post("/", response_model=Category, status_code=status.HTTP_201_CREATED)
-def create_category(
+async def create_category(
     category_in: CategoryCreate,
     current_user: User = Depends(get_current_superuser),
-    service: CategoryService = Depends(get_category_service),
+    service: AsyncServiceAdapter[CategoryService] = Depends(get_category_service),
 ):
-    return service.create_category(category_in=category_in)
+    category = await service.create_category(category_in=category_in)
+    return schema_response(category, status_code=status.HTTP_201_CREATED)
 
 
-@router.get("/", response_model=PagedResponse[Category])
-def read_categories(
+@router.get(
+    "/",
+    response_model=PagedResponse[Category],
+    responses=_NOT_MODIFIED,
+    dependencies=_CATEGORIES_VERSIONED,
+)
+async def read_categories(
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
-    service: CategoryService = Depends(get_category_service),
+    cursor: Optional[str] = Query(
+        None, description="meta.next_cursor of the previous page; overrides page"
+    ),
+    order: PageOrder = Query(PageOrder.ID, description="Sort order"),
+    service: AsyncServiceAdapter[CategoryService] = Depends(get_category_service),
 ):
-    page_params = PageParams(page=page, limit=limit)
-    return service.get_categories(page_params=page_params)
+    page_params = PageParams(page=page, limit=limit, cursor=cursor, order=order)
+    page = await service.get_categories(page_params=page_params)
+    return schema_response(page)
 
 
-@router.get("/{category_id}", response_model=Category)
-def read_category(
-    category_id: int, service: CategoryService = Depends(get_category_service)
+@router.get(
+    "/{category_id}",
+    response_model=Category,
+    responses=_NOT_MODIFIED,
+    dependencies=_CATEGORIES_VERSIONED,
+)
+async def read_category(
+    category_id: int,
+    service: AsyncServiceAdapter[CategoryService] = Depends(get_category_service),
 ):
-    return service.get_category(category_id=category_id)
+    category = await service.get_category(category_id=category_id)
+    return schema_response(category)
 
 
 @router.put("/{category_id}", response_model=Category)
-def update_category(
+async def update_category(
     category_id: int,
     category_in: CategoryUpdate,
     current_user: User = Depends(get_current_superuser),
-    service: CategoryService = Depends(get_category_service),
+    service: AsyncServiceAdapter[CategoryService] = Depends(get_category_service),
 ):
-    return service.update_category(category_id=category_id, category_in=category_in)
+    category = await service.update_category(
+        category_id=category_id, category_in=category_in
+    )
+    return schema_response(category)
 
 
 @router.delete("/{category_id}", response_model=Category)
-def delete_category(
+async def delete_category(
     category_id: int,
     current_user: User = Depends(get_current_superuser),
-    service: CategoryService = Depends(get_category_service),
+    service: AsyncServiceAdapter[CategoryService] = Depends(get_category_service),
 ):
-    return service.delete_category(category_id=category_id)
+    category = await service.delete_category(category_id=category_id)
+    return schema_response(category)
@@ -1,91 +1,531 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    Path,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import (
+    check_point_version,
     get_current_active_user,
     get_current_superuser,
     get_point_service,
+    get_session_runner_factory,
+    get_table_format,
+    json_body,
+    versioned,
+)
+from app.config import settings
+from app.core.compression import encoded_etag, negotiate_encoding
+from app.core.constants import (
+    MAX_NEARBY_RADIUS,
+    CanonicalMode,
+    CountStrategy,
+    DistanceMethod,
+    ExportFormat,
+    NearbyStrategy,
+    PageOrder,
+    UploadFormat,
 )
+from app.core.encoders import schema_response
+from app.core.utils import etag_matches
 from app.models.user import User
-from app.schemas.pagination import PagedResponse, PageParams
-from app.schemas.point import NearbyPoint, Point, PointCreate, PointUpdate
+from app.schemas.pagination import PagedResponse, PageParams, next_page_cursor
+from app.schemas.point import (
+    DistanceMatrixRequest,
+    NearbyPoint,
+    NearbyPointList,
+    NearestBatchRequest,
+    NearestBatchResult,
+    NearestBatchResultList,
+    Point,
+    PointBulkDelete,
+    PointBulkDeleteResult,
+    PointBulkUpdate,
+    PointBulkUpdateList,
+    PointCluster,
+    PointClusterList,
+    PointCreate,
+    PointCreateList,
+    PointList,
+    PointUpdate,
+    PointUploadSummary,
+)
+from app.services.async_adapter import AsyncServiceAdapter
+from app.services.columnar import TABLE_MEDIA_TYPES, PointTable
+from app.services.export import (
+    EXPORT_MEDIA_TYPES,
+    export_bbox,
+    export_media_type,
+    stream_points,
+)
+from app.services.matrix import stream_geodesic_matrix
 from app.services.point import PointService
+from app.services.upload import spool_upload, upload_format_for
+from app.spatial.canonical import Circle, canonical_circle
+from app.spatial.clusters import DEFAULT_CLUSTER_RADIUS_PX
+from app.spatial.matrix import (
+    MATRIX_MEDIA_TYPE,
+    DistanceMatrix,
+    encode_binary,
+    encode_json,
+    haversine_matrix,
+)
+from app.spatial.tiles import MAX_ZOOM, MVT_MEDIA_TYPE
 
 router = APIRouter()
 
+# Columnar bodies the read endpoints send when Accept prefers them
+_TABLE_RESPONSES = {
+    200: {"content": {media_type: {} for media_type in TABLE_MEDIA_TYPES.values()}}
+}
+# Reads answered from data versions when If-None-Match still matches
+_NOT_MODIFIED = {304: {}}
+_POINTS_VERSIONED = [Depends(versioned("points", "categories"))]
+
+
+def _next_link(request: Request, cursor: Optional[str]) -> dict:
+    if cursor is None:
+        return {}
+    next_url = request.url.include_query_params(cursor=cursor)
+    return {"Link": f'<{next_url}>; rel="next"'}
+
+
+def _canonical_nearby(request: Request, circle: Circle) -> Optional[Tuple[Circle, str]]:
+    """
+    The canonical circle covering a nearby `circle`, and its URL; None when
+    `circle` is canonical already.
+    """
+    canonical = canonical_circle(
+        *circle,
+        decimals=settings.NEARBY_CANONICAL_DECIMALS,
+        buckets=[
+            bucket
+            for bucket in settings.nearby_radius_buckets
+            if bucket <= MAX_NEARBY_RADIUS
+        ],
+    )
+    if canonical == circle:
+        return None
+    lat, lng, radius = canonical
+    params = dict(request.query_params)
+    params.update(
+        lat=str(lat),
+        lng=str(lng),
+        radius=str(int(radius) if radius.is_integer() else radius),
+    )
+    # Sorted, so every request for the circle redirects to the same URL
+    url = request.url.replace(query=urlencode(sorted(params.items())))
+    return canonical, str(url)
+
+
+def _table_response(
+    request: Request, table: PointTable, headers: Optional[dict] = None
+) -> Response:
+    headers = {
+        "Vary": "Accept",
+        **(headers or {}),
+        **_next_link(request, table.next_cursor),
+    }
+    if table.total is not None:
+        headers["X-Total-Count"] = str(table.total)
+    return Response(content=table.content, media_type=table.media_type, headers=headers)
+
 
 @router.post("/", response_model=Point, status_code=status.HTTP_201_CREATED)
-def create_point(
+async def create_point(
     point_in: PointCreate,
     current_user: User = Depends(get_current_active_user),
-    service: PointService = Depends(get_point_service),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    point = await service.create_point(point_in=point_in)
+    return schema_response(point, status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/upload", response_model=PointUploadSummary)
+async def upload_points(
+    request: Request,
+    format: Optional[UploadFormat] = Query(
+        None, description="Body format; defaults to the one named by Content-Type"
+    ),
+    current_user: User = Depends(get_current_active_user),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    upload_format = format or upload_format_for(request.headers.get("content-type"))
+    source = await spool_upload(request)
+    try:
+        summary = await service.upload_points(
+            source=source, upload_format=upload_format
+        )
+    finally:
+        source.close()
+    return schema_response(summary)
+
+
+def _list_body(model) -> dict:
+    """OpenAPI request body for a JSON array of `model`, parsed by json_body"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": model.model_json_schema()}
+                }
+            },
+        }
+    }
+
+
+@router.post(
+    "/bulk",
+    response_model=List[Point],
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=_list_body(PointCreate),
+)
+async def bulk_create_points(
+    points_in: List[PointCreate] = Depends(json_body(PointCreateList)),
+    current_user: User = Depends(get_current_active_user),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    points = await service.bulk_create_points(points_in=points_in)
+    return schema_response(points, PointList, status_code=status.HTTP_201_CREATED)
+
+
+@router.patch(
+    "/bulk", response_model=List[Point], openapi_extra=_list_body(PointBulkUpdate)
+)
+async def bulk_update_points(
+    points_in: List[PointBulkUpdate] = Depends(json_body(PointBulkUpdateList)),
+    current_user: User = Depends(get_current_active_user),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    points = await service.bulk_update_points(points_in=points_in)
+    return schema_response(points, PointList)
+
+
+@router.delete("/bulk", response_model=PointBulkDeleteResult)
+async def bulk_delete_points(
+    body: PointBulkDelete,
+    current_user: User = Depends(get_current_superuser),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
 ):
-    return service.create_point(point_in=point_in)
+    deleted = await service.bulk_delete_points(ids=body.ids)
+    return schema_response(PointBulkDeleteResult(deleted=deleted))
 
 
-@router.get("/", response_model=PagedResponse[Point])
-def read_points(
+@router.get(
+    "/",
+    response_model=PagedResponse[Point],
+    responses={**_TABLE_RESPONSES, **_NOT_MODIFIED},
+    dependencies=_POINTS_VERSIONED,
+)
+async def read_points(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
-    service: PointService = Depends(get_point_service),
+    cursor: Optional[str] = Query(
+        None, description="meta.next_cursor of the previous page; overrides page"
+    ),
+    order: PageOrder = Query(PageOrder.ID, description="Sort order"),
+    count: CountStrategy = Query(
+        CountStrategy.EXACT,
+        description="exact: COUNT(*); estimated: planner statistics; "
+        "cached: per-worker counters; none: skip the total",
+    ),
+    table_format: Optional[ExportFormat] = Depends(get_table_format),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
 ):
-    page_params = PageParams(page=page, limit=limit)
+    page_params = PageParams(
+        page=page, limit=limit, cursor=cursor, order=order, count_strategy=count
+    )
 
-    return service.get_points(page_params=page_params, category_id=category_id)
+    if table_format is not None:
+        table = await service.get_points_table(
+            page_params=page_params, table_format=table_format, category_id=category_id
+        )
+        return _table_response(request, table)
+    page = await service.get_points(page_params=page_params, category_id=category_id)
+    return schema_response(page)
 
 
-@router.get("/nearby", response_model=List[NearbyPoint])
-def get_nearby_points(
+@router.get(
+    "/nearby",
+    response_model=List[NearbyPoint],
+    responses={**_TABLE_RESPONSES, **_NOT_MODIFIED},
+    dependencies=_POINTS_VERSIONED,
+)
+async def get_nearby_points(
+    request: Request,
     lat: float = Query(..., ge=-90, le=90, description="Latitude coordinate"),
     lng: float = Query(..., ge=-180, le=180, description="Longitude coordinate"),
-    radius: float = Query(..., gt=0, le=100000, description="Search radius in meters"),
+    radius: float = Query(
+        ..., gt=0, le=MAX_NEARBY_RADIUS, description="Search radius in meters"
+    ),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of results"),
-    service: PointService = Depends(get_point_service),
+    strategy: NearbyStrategy = Query(
+        NearbyStrategy.GEOGRAPHY,
+        description="geography: ST_DWithin on geography; "
+        "bbox: geometry index prefilter, then exact geodesic distance",
+    ),
+    table_format: Optional[ExportFormat] = Depends(get_table_format),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
 ):
-    return service.get_nearby_points(lat=lat, lng=lng, radius=radius, limit=limit)
+    # Off-grid circles are answered by the canonical circle covering them,
+    # which clients or the CDN edge filter back down to the exact circle
+    headers = {}
+    mode = CanonicalMode(settings.NEARBY_CANONICAL_MODE)
+    canonical = None
+    if mode is not CanonicalMode.OFF:
+        canonical = _canonical_nearby(request, (lat, lng, radius))
+    if canonical is not None:
+        (lat, lng, radius), canonical_url = canonical
+        if mode is CanonicalMode.REDIRECT:
+            return RedirectResponse(
+                canonical_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT
+            )
+        headers["Content-Location"] = canonical_url
 
+    if table_format is not None:
+        table = await service.get_nearby_table(
+            lat=lat,
+            lng=lng,
+            radius=radius,
+            table_format=table_format,
+            limit=limit,
+            strategy=strategy,
+        )
+        return _table_response(request, table, headers)
+    points = await service.get_nearby_points(
+        lat=lat, lng=lng, radius=radius, limit=limit, strategy=strategy
+    )
+    return schema_response(points, NearbyPointList, headers)
 
-@router.post("/within", response_model=List[Point])
-def get_points_within_polygon(
+
+@router.post("/within", response_model=List[Point], responses=_TABLE_RESPONSES)
+async def get_points_within_polygon(
+    request: Request,
     polygon_wkt: str = Query(..., description="WKT polygon string"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of results"),
-    service: PointService = Depends(get_point_service),
+    cursor: Optional[str] = Query(
+        None, description='Cursor from the rel="next" Link header of the last page'
+    ),
+    table_format: Optional[ExportFormat] = Depends(get_table_format),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
 ):
-    return service.get_points_within_polygon(polygon_wkt=polygon_wkt, limit=limit)
+    if table_format is not None:
+        table = await service.get_within_polygon_table(
+            polygon_wkt=polygon_wkt,
+            table_format=table_format,
+            limit=limit,
+            cursor=cursor,
+        )
+        return _table_response(request, table)
+    points = await service.get_points_within_polygon(
+        polygon_wkt=polygon_wkt, limit=limit, cursor=cursor
+    )
+    next_cursor = next_page_cursor(points, PageOrder.ID, limit)
+    return schema_response(points, PointList, _next_link(request, next_cursor))
 
 
-@router.get("/nearest", response_model=List[NearbyPoint])
-def get_nearest_points(
+@router.get(
+    "/nearest",
+    response_model=List[NearbyPoint],
+    responses={**_TABLE_RESPONSES, **_NOT_MODIFIED},
+    dependencies=_POINTS_VERSIONED,
+)
+async def get_nearest_points(
+    request: Request,
     lat: float = Query(..., ge=-90, le=90, description="Latitude coordinate"),
     lng: float = Query(..., ge=-180, le=180, description="Longitude coordinate"),
     limit: int = Query(5, ge=1, le=100, description="Maximum number of results"),
-    service: PointService = Depends(get_point_service),
+    table_format: Optional[ExportFormat] = Depends(get_table_format),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    if table_format is not None:
+        table = await service.get_nearest_table(
+            lat=lat, lng=lng, table_format=table_format, limit=limit
+        )
+        return _table_response(request, table)
+    points = await service.get_nearest_points(lat=lat, lng=lng, limit=limit)
+    return schema_response(points, NearbyPointList)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media: {} for media in EXPORT_MEDIA_TYPES.values()}}},
+)
+async def export_points(
+    format: ExportFormat = Query(ExportFormat.NDJSON, description="Body format"),
+    category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    min_lng: Optional[float] = Query(None, ge=-180, le=180),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lng: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    open_runner=Depends(get_session_runner_factory),
+):
+    bbox = export_bbox(min_lng, min_lat, max_lng, max_lat)
+    return StreamingResponse(
+        stream_points(
+            open_runner, export_format=format, category_id=category_id, bbox=bbox
+        ),
+        media_type=export_media_type(format),
+        headers={
+            "Content-Disposition": f'attachment; filename="points.{format.value}"'
+        },
+    )
+
+
+@router.post("/nearest/batch", response_model=List[NearestBatchResult])
+async def get_nearest_batch(
+    batch: NearestBatchRequest,
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    results = await service.get_nearest_batch(origins=batch.origins)
+    return schema_response(results, NearestBatchResultList)
+
+
+@router.post(
+    "/distance-matrix",
+    response_class=StreamingResponse,
+    responses={200: {"content": {MATRIX_MEDIA_TYPE: {}}}},
+)
+async def get_distance_matrix(
+    matrix_in: DistanceMatrixRequest,
+    accept: Optional[str] = Header(None),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+    open_runner=Depends(get_session_runner_factory),
 ):
-    return service.get_nearest_points(lat=lat, lng=lng, limit=limit)
+    sources, destinations = await service.get_matrix_coordinates(
+        sources=matrix_in.sources, destinations=matrix_in.destinations
+    )
+    binary = accept is not None and MATRIX_MEDIA_TYPE in accept
+    encode = encode_binary if binary else encode_json
+    if matrix_in.method == DistanceMethod.HAVERSINE:
+        matrix = DistanceMatrix(
+            len(sources), len(destinations), haversine_matrix(sources, destinations)
+        )
+        body = encode(matrix)
+    else:
+        body = stream_geodesic_matrix(open_runner, sources, destinations, encode)
+    if binary:
+        return StreamingResponse(
+            body,
+            media_type=MATRIX_MEDIA_TYPE,
+            headers={
+                "X-Matrix-Rows": str(len(sources)),
+                "X-Matrix-Columns": str(len(destinations)),
+            },
+        )
+    return StreamingResponse(body, media_type="application/json")
 
 
-@router.get("/{point_id}", response_model=Point)
-def read_point(point_id: int, service: PointService = Depends(get_point_service)):
-    return service.get_point(point_id=point_id)
+@router.get(
+    "/clusters",
+    response_model=List[PointCluster],
+    responses=_NOT_MODIFIED,
+    dependencies=_POINTS_VERSIONED,
+)
+async def get_point_clusters(
+    min_lng: float = Query(..., ge=-180, le=180, description="West edge of the bbox"),
+    min_lat: float = Query(..., ge=-90, le=90, description="South edge of the bbox"),
+    max_lng: float = Query(..., ge=-180, le=180, description="East edge of the bbox"),
+    max_lat: float = Query(..., ge=-90, le=90, description="North edge of the bbox"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM, description="Map zoom level"),
+    radius: int = Query(
+        DEFAULT_CLUSTER_RADIUS_PX,
+        ge=8,
+        le=256,
+        description="Cluster radius in pixels, rounded so clusters tile evenly",
+    ),
+    category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    clusters = await service.get_clusters(
+        min_lng=min_lng,
+        min_lat=min_lat,
+        max_lng=max_lng,
+        max_lat=max_lat,
+        zoom=zoom,
+        radius=radius,
+        category_id=category_id,
+    )
+    return schema_response(clusters, PointClusterList)
+
+
+@router.get(
+    "/tiles/{z}/{x}/{y}.mvt",
+    response_class=Response,
+    responses={200: {"content": {MVT_MEDIA_TYPE: {}}}, 304: {}},
+)
+async def get_point_tile(
+    z: int = Path(..., ge=0, le=MAX_ZOOM, description="Zoom level"),
+    x: int = Path(..., ge=0, description="Tile column"),
+    y: int = Path(..., ge=0, description="Tile row"),
+    category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    tile = await service.get_tile(z=z, x=x, y=y, category_id=category_id)
+
+    # Served from the copy compressed alongside the cached tile, so the
+    # compression middleware leaves it alone
+    encoding = None
+    if len(tile.content) >= settings.COMPRESSION_MINIMUM_SIZE:
+        encoding = negotiate_encoding(accept_encoding)
+    etag = encoded_etag(tile.etag, encoding)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=tile.encode(encoding), media_type=MVT_MEDIA_TYPE, headers=headers
+    )
+
+
+@router.get(
+    "/{point_id}",
+    response_model=Point,
+    responses=_NOT_MODIFIED,
+    dependencies=[Depends(check_point_version)],
+)
+async def read_point(
+    point_id: int,
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
+):
+    point = await service.get_point(point_id=point_id)
+    return schema_response(point)
 
 
 @router.put("/{point_id}", response_model=Point)
-def update_point(
+async def update_point(
     point_id: int,
     point_in: PointUpdate,
     current_user: User = Depends(get_current_active_user),
-    service: PointService = Depends(get_point_service),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
 ):
-    return service.update_point(point_id=point_id, point_in=point_in)
+    point = await service.update_point(point_id=point_id, point_in=point_in)
+    return schema_response(point)
 
 
 @router.delete("/{point_id}", response_model=Point)
-def delete_point(
+async def delete_point(
     point_id: int,
     current_user: User = Depends(get_current_superuser),
-    service: PointService = Depends(get_point_service),
+    service: AsyncServiceAdapter[PointService] = Depends(get_point_service),
 ):
-    return service.delete_point(point_id=point_id)
+    point = await service.delete_point(point_id=point_id)
+    return schema_response(point)
@@ -5,6 +5,7 @@ from typing import Any, Optional
 from dotenv import load_dotenv
 from pydantic import field_validator
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import make_url
 
 # Base directory
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +31,89 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "geopointsdb")
     POSTGRES_PORT: int = int(os.getenv("POSTGRES_PORT", "5432"))
     DATABASE_URI: Optional[str] = None
+    ASYNC_DATABASE_URI: Optional[str] = None
+
+    # Database access mode: "async" (asyncpg + AsyncSession) or "sync"
+    # (psycopg2 + threadpool), kept selectable for side-by-side load tests
+    DATABASE_MODE: str = os.getenv("DATABASE_MODE", "async")
+
+    # Connection pool settings (applied to both the sync and async engines)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    # Disable server-side prepared statements for PgBouncer transaction pooling
+    DB_PGBOUNCER_MODE: bool = os.getenv("DB_PGBOUNCER_MODE", "False").lower() == "true"
+
+    # In-process spatial index serving nearby/nearest/within reads per worker
+    SPATIAL_INDEX_ENABLED: bool = (
+        os.getenv("SPATIAL_INDEX_ENABLED", "False").lower() == "true"
+    )
+    SPATIAL_INDEX_CELL_SIZE: float = float(os.getenv("SPATIAL_INDEX_CELL_SIZE", "0.05"))
+    SPATIAL_INDEX_REFRESH_INTERVAL: float = float(
+        os.getenv("SPATIAL_INDEX_REFRESH_INTERVAL", "10")
+    )
+    # Past this many seconds without a successful refresh, reads go to PostGIS
+    SPATIAL_INDEX_MAX_STALENESS: float = float(
+        os.getenv("SPATIAL_INDEX_MAX_STALENESS", "30")
+    )
+    # Shared snapshot written by `python -m app.spatial.snapshot`; when set,
+    # workers mmap it instead of each loading the whole table
+    SPATIAL_INDEX_SNAPSHOT_PATH: Optional[str] = (
+        os.getenv("SPATIAL_INDEX_SNAPSHOT_PATH") or None
+    )
+
+    # Vector tile cache (per worker); TTL bounds staleness from other workers
+    TILE_CACHE_MAX_BYTES: int = int(os.getenv("TILE_CACHE_MAX_BYTES", "67108864"))
+    TILE_CACHE_TTL: float = float(os.getenv("TILE_CACHE_TTL", "300"))
+    TILE_CACHE_MAX_AGE: int = int(os.getenv("TILE_CACHE_MAX_AGE", "60"))
+
+    # Per-worker point counters behind ?count=cached; TTL bounds staleness
+    # from other workers
+    POINT_COUNT_CACHE_TTL: float = float(os.getenv("POINT_COUNT_CACHE_TTL", "60"))
+
+    # Per-worker nearby/nearest/within result cache; writes evict the entries
+    # around them, the TTL bounds staleness from other workers
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "4096"))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", "30"))
+    # Cache-Control for nearby/nearest/clusters responses
+    QUERY_CACHE_MAX_AGE: int = int(os.getenv("QUERY_CACHE_MAX_AGE", "10"))
+    QUERY_CACHE_STALE_WHILE_REVALIDATE: int = int(
+        os.getenv("QUERY_CACHE_STALE_WHILE_REVALIDATE", "60")
+    )
+
+    # Opt-in snapping of /points/nearby circles to shared, CDN-cacheable
+    # URLs: "off", "redirect" or "content-location". Centers snap to this
+    # many decimals (3 is about 110 m); radii round up to the next bucket
+    NEARBY_CANONICAL_MODE: str = os.getenv("NEARBY_CANONICAL_MODE", "off")
+    NEARBY_CANONICAL_DECIMALS: int = int(os.getenv("NEARBY_CANONICAL_DECIMALS", "3"))
+    NEARBY_RADIUS_BUCKETS: str = os.getenv(
+        "NEARBY_RADIUS_BUCKETS",
+        "100,250,500,1000,2500,5000,10000,25000,50000,100000",
+    )
+
+    # Cache-Control for point and category reads; their ETags make
+    # revalidating cheap, so by default clients always revalidate
+    READ_CACHE_MAX_AGE: int = int(os.getenv("READ_CACHE_MAX_AGE", "0"))
+    READ_CACHE_STALE_WHILE_REVALIDATE: int = int(
+        os.getenv("READ_CACHE_STALE_WHILE_REVALIDATE", "30")
+    )
+
+    # Cross-worker cache invalidation over LISTEN/NOTIFY; the listener needs a
+    # direct PostgreSQL connection, so set the DSN when behind PgBouncer
+    CACHE_INVALIDATION_ENABLED: bool = (
+        os.getenv("CACHE_INVALIDATION_ENABLED", "True").lower() == "true"
+    )
+    CACHE_INVALIDATION_DSN: Optional[str] = os.getenv("CACHE_INVALIDATION_DSN") or None
+
+    # Smallest response body worth compressing, in bytes
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+
+    # Rows fetched per server-side cursor round trip by /points/export
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+    # Largest /points/upload body accepted, after decompression
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", "2147483648"))
 
     # Security settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", "insecure_dev_key_change_this")
@@ -51,6 +135,37 @@ class Settings(BaseSettings):
             f"{info.data.get('POSTGRES_DB', '')}",
         )
 
+    @field_validator("ASYNC_DATABASE_URI", mode="before")
+    @classmethod
+    def assemble_async_db_connection(cls, v: Optional[str], info) -> Any:
+        if isinstance(v, str):
+            return v
+        if "ASYNC_DATABASE_URL" in os.environ:
+            return os.environ["ASYNC_DATABASE_URL"]
+        # Same database as DATABASE_URI, reached through the asyncpg driver
+        url = make_url(info.data.get("DATABASE_URI", ""))
+        return url.set(drivername="postgresql+asyncpg").render_as_string(
+            hide_password=False
+        )
+
+    @field_validator("DATABASE_MODE")
+    @classmethod
+    def validate_database_mode(cls, v: str) -> str:
+        v = v.lower()
+        if v not in ("async", "sync"):
+            raise ValueError("DATABASE_MODE must be 'async' or 'sync'")
+        return v
+
+    @field_validator("NEARBY_CANONICAL_MODE")
+    @classmethod
+    def validate_nearby_canonical_mode(cls, v: str) -> str:
+        v = v.lower()
+        if v not in ("off", "redirect", "content-location"):
+            raise ValueError(
+                "NEARBY_CANONICAL_MODE must be 'off', 'redirect' or 'content-location'"
+            )
+        return v
+
     model_config = {
         "env_file": ".env",
         "case_sensitive": True,
@@ -61,5 +176,9 @@ class Settings(BaseSettings):
     def backend_cors_origins(self):
         return self.BACKEND_CORS_ORIGINS.split(",") if self.BACKEND_CORS_ORIGINS else []
 
+    @property
+    def nearby_radius_buckets(self):
+        return sorted(float(b) for b in self.NEARBY_RADIUS_BUCKETS.split(",") if b)
+
 
 settings = Settings()
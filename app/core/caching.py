@@ -0,0 +1,41 @@
+"""
+HTTP caching: per-route Cache-Control policies and version-derived ETags.
+
+Read routes are tagged from the data versions their bodies derive from (see
+DataVersionRepository) rather than from the bodies themselves, so a matching
+If-None-Match is answered before anything is queried or rendered.
+"""
+
+import hashlib
+from typing import Any, NamedTuple, Optional
+
+
+class CachePolicy(NamedTuple):
+    """How long clients and shared caches may reuse one route's responses"""
+
+    # Seconds a response is fresh; None forbids storing it at all
+    max_age: Optional[int]
+    # Seconds a stale response may still be served while it is revalidated
+    stale_while_revalidate: int = 0
+
+    @property
+    def header(self) -> str:
+        if self.max_age is None:
+            return "no-store"
+        directives = ["public", f"max-age={self.max_age}"]
+        if self.stale_while_revalidate:
+            directives.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        return ", ".join(directives)
+
+
+NO_STORE = CachePolicy(max_age=None)
+
+
+def version_etag(*parts: Any) -> str:
+    """
+    A weak ETag over data versions and the request details a body depends on.
+
+    Weak, since equal versions promise the same data, not the same bytes.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
@@ -0,0 +1,139 @@
+"""
+Response compression codecs chosen by the Accept-Encoding header.
+
+gzip is always available; brotli and zstd are offered when the Brotli and
+zstandard packages are installed.
+"""
+
+import zlib
+from typing import Dict, NamedTuple, Optional
+
+from app.core.encoders import accepted_media_types
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional
+    zstandard = None
+
+# Level per Content-Encoding token
+Levels = Dict[str, int]
+
+# Cheap enough to run on every response
+DEFAULT_LEVELS: Levels = {"gzip": 6, "br": 4, "zstd": 3}
+# For large, repetitive bodies where the extra CPU buys real bytes
+DENSE_LEVELS: Levels = {"gzip": 6, "br": 6, "zstd": 9}
+# For long streams, where the compressor must keep up with the database
+FAST_LEVELS: Levels = {"gzip": 1, "br": 1, "zstd": 1}
+# For bodies compressed once and then served from a cache
+STORED_LEVELS: Levels = {"gzip": 9, "br": 9, "zstd": 15}
+
+# Responses of these types are worth compressing; anything else (Parquet is
+# already compressed inside) goes out as is
+COMPRESSIBLE_MEDIA_TYPES = frozenset(
+    {
+        "application/json",
+        "application/geo+json",
+        "application/x-ndjson",
+        "application/msgpack",
+        "application/vnd.apache.arrow.stream",
+        "application/vnd.mapbox-vector-tile",
+    }
+)
+
+
+class CompressionPolicy(NamedTuple):
+    """How one route's responses are compressed"""
+
+    minimum_size: int
+    levels: Levels = DEFAULT_LEVELS
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Flush each chunk so a streaming client is never left waiting on it
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+# Stream and one-shot compressor per Content-Encoding, in the order the
+# server prefers them when the client accepts several equally
+STREAMS = {}
+COMPRESSORS = {}
+if zstandard is not None:
+    STREAMS["zstd"] = _ZstdStream
+    COMPRESSORS["zstd"] = lambda data, level: zstandard.ZstdCompressor(
+        level=level
+    ).compress(data)
+if brotli is not None:
+    STREAMS["br"] = _BrotliStream
+    COMPRESSORS["br"] = lambda data, level: brotli.compress(data, quality=level)
+STREAMS["gzip"] = _GzipStream
+COMPRESSORS["gzip"] = _gzip
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    The Content-Encoding for an Accept-Encoding header, None for identity.
+
+    The supported coding with the highest q-value wins, the server's order on
+    a tie; "*" stands for the first coding the header does not name.
+    """
+    accepted = dict(accepted_media_types(accept_encoding))
+    best, best_q = None, 0.0
+    for encoding in COMPRESSORS:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, levels: Levels = DEFAULT_LEVELS) -> bytes:
+    return COMPRESSORS[encoding](data, levels[encoding])
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """A strong ETag per Content-Encoding, since the bytes differ"""
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
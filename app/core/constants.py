@@ -1,4 +1,92 @@
+from enum import Enum
+
+
 class SpatialRefSys:
     WGS84 = 4326  # World Geodetic System 1984, used for GPS
     WEB_MERCATOR = 3857  # Web Mercator, used by most web maps
     GEOGRAPHY = 4326  # Geography type (uses a spheroid model for distance calculations)
+
+
+class SQLState:
+    FOREIGN_KEY_VIOLATION = "23503"
+    UNIQUE_VIOLATION = "23505"
+
+
+class NearbyStrategy(str, Enum):
+    """How /points/nearby filters candidate rows"""
+
+    GEOGRAPHY = "geography"  # ST_DWithin on the geography index
+    BBOX = "bbox"  # geometry && envelope prefilter, then exact geodesic distance
+
+
+class CanonicalMode(str, Enum):
+    """What /points/nearby does with circles off the canonical grid"""
+
+    OFF = "off"  # Answer the exact circle
+    REDIRECT = "redirect"  # 307 to the canonical circle's URL
+    CONTENT_LOCATION = "content-location"  # Answer the canonical circle in place
+
+
+class DistanceMethod(str, Enum):
+    """How /points/distance-matrix computes distances"""
+
+    GEODESIC = "geodesic"  # ST_Distance on the spheroid, in PostGIS
+    HAVERSINE = "haversine"  # Great-circle distance with NumPy, in the API process
+
+
+class ExportFormat(str, Enum):
+    """Body format of /points/export"""
+
+    NDJSON = "ndjson"  # One JSON point per line
+    GEOJSON = "geojson"  # A single GeoJSON FeatureCollection
+    ARROW = "arrow"  # Arrow IPC stream, lng/lat as float64 columns
+    PARQUET = "parquet"  # GeoParquet with a WKB geometry column
+
+
+class UploadFormat(str, Enum):
+    """Body format of /points/upload"""
+
+    CSV = "csv"  # Header row with name, latitude, longitude[, description, category_id]
+    NDJSON = "ndjson"  # One JSON object per line, with the same fields
+    GEOJSON = "geojson"  # A FeatureCollection of Point features
+
+
+class PageOrder(str, Enum):
+    ID = "id"
+    CREATED_AT = "created_at"
+
+
+class CacheEntity(str, Enum):
+    """What a cross-worker cache invalidation event is about"""
+
+    POINT = "point"
+    CATEGORY = "category"
+    USER = "user"
+    ALL = "all"  # Too much changed to list: flush every cache
+
+
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    CACHED = "cached"
+    NONE = "none"
+
+
+# Columns each page order sorts by; the last one is always the unique id
+PAGE_ORDER_KEYS = {
+    PageOrder.ID: ("id",),
+    PageOrder.CREATED_AT: ("created_at", "id"),
+}
+
+# Largest /points/nearby radius, in meters
+MAX_NEARBY_RADIUS = 100000
+
+# Most origins accepted by one /points/nearest/batch request
+MAX_BATCH_ORIGINS = 2000
+
+# Most items in one /points/bulk request
+MAX_BULK_POINTS = 5000
+
+# Most points on either side of a distance matrix, and most cells in total
+MAX_MATRIX_POINTS = 10000
+MAX_MATRIX_CELLS = 4000000
@@ -0,0 +1,148 @@
+"""
+Response encoders chosen by the Accept header.
+
+JSON is written with orjson, or by pydantic-core when a schema serializer is
+at hand. MessagePack is offered when msgpack is installed; datetimes go out
+as MessagePack timestamps rather than strings.
+"""
+
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+import orjson
+from pydantic import TypeAdapter
+from pydantic_core import SchemaSerializer, to_jsonable_python
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - MessagePack is optional
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+class JSONEncoder:
+    media_type = JSON_MEDIA_TYPE
+
+    def encode(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+    def encode_schema(self, serializer: SchemaSerializer, value: Any) -> bytes:
+        # pydantic-core writes JSON straight from the models, no Python detour
+        return serializer.to_json(value)
+
+
+class MessagePackEncoder:
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def encode(self, content: Any) -> bytes:
+        return msgpack.packb(content, datetime=True, default=to_jsonable_python)
+
+    def encode_schema(self, serializer: SchemaSerializer, value: Any) -> bytes:
+        # Python mode keeps datetimes as datetimes for the timestamp extension
+        return self.encode(serializer.to_python(value))
+
+
+JSON_ENCODER = JSONEncoder()
+
+# Media types a client can ask for, by Accept header value
+ENCODERS: Dict[str, Any] = {JSON_MEDIA_TYPE: JSON_ENCODER}
+if msgpack is not None:
+    _msgpack_encoder = MessagePackEncoder()
+    for _media_type in (
+        MSGPACK_MEDIA_TYPE,
+        "application/x-msgpack",
+        "application/vnd.msgpack",
+    ):
+        ENCODERS[_media_type] = _msgpack_encoder
+
+# Set per request by ContentNegotiationMiddleware
+response_encoder: ContextVar[Any] = ContextVar("response_encoder", default=JSON_ENCODER)
+
+
+def accepted_media_types(accept: Optional[str]) -> Iterator[Tuple[str, float]]:
+    """(media type, q-value) pairs of an Accept header, in header order"""
+    for part in (accept or "").split(","):
+        media_type, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        yield media_type.strip().lower(), q
+
+
+def negotiate(accept: Optional[str]):
+    """
+    The encoder for an Accept header.
+
+    The supported type with the highest q-value wins, earlier types on a tie.
+    Anything else, including */* and no header, gets JSON rather than a 406,
+    so browsers and the docs keep working.
+    """
+    best, best_q = JSON_ENCODER, 0.0
+    for media_type, q in accepted_media_types(accept):
+        if media_type in ENCODERS and q > best_q:
+            best, best_q = ENCODERS[media_type], q
+    return best
+
+
+def _vary(headers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+    # Caches must key negotiated responses on Accept
+    return {**(headers or {}), "Vary": "Accept"}
+
+
+class EncodedResponse(Response):
+    """Default response class: content encoded as the request negotiated"""
+
+    media_type = JSON_MEDIA_TYPE
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.encoder = response_encoder.get()
+        super().__init__(
+            content,
+            status_code=status_code,
+            headers=_vary(headers),
+            media_type=media_type or self.encoder.media_type,
+            background=background,
+        )
+
+    def render(self, content: Any) -> bytes:
+        return self.encoder.encode(content)
+
+
+def schema_response(
+    value: Any,
+    adapter: Optional[TypeAdapter] = None,
+    headers: Optional[Mapping[str, str]] = None,
+    status_code: int = 200,
+) -> Response:
+    """
+    A response for schema data, serialized once in the negotiated format.
+
+    `value` is a model, or anything `adapter` describes such as a list of
+    models. Returning this skips FastAPI's response_model pass.
+    """
+    encoder = response_encoder.get()
+    serializer = (
+        value.__pydantic_serializer__ if adapter is None else adapter.serializer
+    )
+    return Response(
+        content=encoder.encode_schema(serializer, value),
+        status_code=status_code,
+        media_type=encoder.media_type,
+        headers=_vary(headers),
+    )
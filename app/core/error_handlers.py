@@ -3,10 +3,11 @@ from typing import Any, Dict, Union
 
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from app.core.exceptions import BaseAPIException
+from app.core.exceptions import BaseAPIException, NotModifiedException
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,13 @@ def add_exception_handlers(app: FastAPI) -> None:
             content={"detail": exc.detail, "error": exc.detail},
         )
 
+    @app.exception_handler(NotModifiedException)
+    async def handle_not_modified_exception(
+        request: Request, exc: NotModifiedException
+    ) -> Response:
+        """Answer a matching conditional GET; a 304 has no body"""
+        return Response(status_code=exc.status_code, headers=exc.headers)
+
     @app.exception_handler(RequestValidationError)
     async def handle_validation_exception(
         request: Request, exc: RequestValidationError
@@ -37,6 +45,18 @@ def add_exception_handlers(app: FastAPI) -> None:
             },
         )
 
+    @app.exception_handler(PoolTimeoutError)
+    async def handle_pool_timeout_exception(
+        request: Request, exc: PoolTimeoutError
+    ) -> JSONResponse:
+        """Handle connection pool exhaustion"""
+        logger.warning(f"Database pool exhausted: {str(exc)}")
+        return JSONResponse(
+            status_code=503,
+            content={"error": "Database temporarily unavailable"},
+            headers={"Retry-After": "1"},
+        )
+
     @app.exception_handler(SQLAlchemyError)
     async def handle_sqlalchemy_exception(
         request: Request, exc: SQLAlchemyError
@@ -48,3 +48,24 @@ class AuthenticationException(BaseAPIException):
 
     status_code = status.HTTP_401_UNAUTHORIZED
     detail = "Authentication failed"
+
+
+class PayloadTooLargeException(BaseAPIException):
+    """Request body too large exception"""
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    detail = "Request body too large"
+
+
+class UnsupportedMediaTypeException(BaseAPIException):
+    """Unsupported request body format exception"""
+
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    detail = "Unsupported media type"
+
+
+class NotModifiedException(BaseAPIException):
+    """Conditional GET whose If-None-Match still matches"""
+
+    status_code = status.HTTP_304_NOT_MODIFIED
+    detail = "Not modified"
@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """Thread-safe counters for a connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.saturated = 0
+            self.wait_count = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, saturated: bool) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if saturated:
+                self.saturated += 1
+
+    def record_timeout(self, seconds: float) -> None:
+        self.record_wait(seconds, saturated=True)
+        with self._lock:
+            self.timeouts += 1
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        """Combine the live pool state with the recorded counters"""
+        with self._lock:
+            avg_wait = self.wait_total / self.wait_count if self.wait_count else 0.0
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "saturated": self.saturated,
+                "avg_wait_ms": round(avg_wait * 1000, 3),
+                "max_wait_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+class _MetricsPoolMixin:
+    """Time every checkout, including how long it waited for a free connection"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        # No idle connection and no overflow headroom: this checkout must wait
+        saturated = self.checkedin() == 0 and (
+            self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        )
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start, saturated)
+        return conn
+
+
+class SyncMetricsPool(_MetricsPoolMixin, QueuePool):
+    metrics = sync_pool_metrics
+
+
+class AsyncMetricsPool(_MetricsPoolMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+def register_pool_events(engine, metrics: PoolMetrics) -> None:
+    """Count connection lifecycle events for an engine's pool"""
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.increment("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.increment("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidations")
@@ -6,7 +6,7 @@ from jose import jwt
 from passlib.context import CryptContext
 
 from app.config import settings
-from app.core.utils import utc_now
+from app.core.utils import run_blocking, utc_now
 
 # Password hashing context
 pwd_context = CryptContext(
@@ -36,12 +36,12 @@ def create_access_token(subject: str, expires_delta: Optional[timedelta] = None)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return run_blocking(pwd_context.verify, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return run_blocking(pwd_context.hash, password)
 
 
 def blacklist_token(token: str) -> None:
@@ -1,9 +1,14 @@
 from datetime import datetime, timezone
-from typing import Any, Dict, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
 
 from geoalchemy2.shape import to_shape
 from geojson_pydantic import Point as GeoJSONPoint
 from pydantic import BaseModel
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
 
 
 def point_to_geojson(geometry):
@@ -23,11 +28,38 @@ def extract_coords(geometry) -> Tuple[float, float]:
     return (shapely_point.y, shapely_point.x)
 
 
+def sqlstate(error: DBAPIError) -> Optional[str]:
+    """SQLSTATE code of a database error, under psycopg2 or asyncpg"""
+    return getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+
+
 def utc_now():
     """Get current UTC timestamp"""
     return datetime.now(timezone.utc)
 
 
+def run_blocking(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run CPU-heavy work (e.g. bcrypt) without stalling the event loop.
+
+    Under the AsyncSession greenlet bridge the call is moved to the threadpool;
+    anywhere else it simply runs inline.
+    """
+    if in_greenlet():
+        return await_only(run_in_threadpool(fn, *args))
+    return fn(*args)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
 def to_dict(obj: BaseModel) -> Dict[str, Any]:
     """
     Convert a Pydantic model to a dictionary consistently,
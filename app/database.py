@@ -1,12 +1,117 @@
 import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, TypeVar, Union
+from uuid import uuid4
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
+from app.core.pool_metrics import (
+    AsyncMetricsPool,
+    SyncMetricsPool,
+    async_pool_metrics,
+    register_pool_events,
+    sync_pool_metrics,
+)
 
 DATABASE_URL = settings.DATABASE_URI
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URI
 
-engine = create_engine(DATABASE_URL)
+
+def pool_options() -> Dict[str, Any]:
+    """Pool sizing shared by the sync and async engines"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def asyncpg_connect_args() -> Dict[str, Any]:
+    """asyncpg arguments; PgBouncer mode turns off prepared statement caching"""
+    if not settings.DB_PGBOUNCER_MODE:
+        return {}
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        # Unique names so pooled server connections never see a name twice
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+engine = create_engine(DATABASE_URL, poolclass=SyncMetricsPool, **pool_options())
+register_pool_events(engine, sync_pool_metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncMetricsPool,
+    connect_args=asyncpg_connect_args(),
+    **pool_options(),
+)
+register_pool_events(async_engine.sync_engine, async_pool_metrics)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+T = TypeVar("T")
+
+
+class SyncSessionRunner:
+    """Run repository work on a psycopg2 session in the threadpool"""
+
+    is_async = False
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+
+class AsyncSessionRunner:
+    """
+    Run repository work on an AsyncSession.
+
+    Repositories and services are written against the synchronous Session API;
+    ``AsyncSession.run_sync`` executes them inside SQLAlchemy's greenlet bridge,
+    so every statement is awaited on asyncpg without taking a threadpool slot.
+    """
+
+    is_async = True
+
+    def __init__(self, async_session: AsyncSession):
+        self.async_session = async_session
+        self.session = async_session.sync_session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.async_session.run_sync(lambda _: fn(*args, **kwargs))
+
+
+@asynccontextmanager
+async def open_session_runner(
+    **execution_options: Any,
+) -> AsyncIterator[Union[AsyncSessionRunner, SyncSessionRunner]]:
+    """
+    A session runner owned by the caller, for work that outlives the request.
+
+    Request-scoped sessions are closed before a streamed body is sent, so
+    streaming endpoints open their own. `execution_options` (for example
+    isolation_level) apply to the session's connection.
+    """
+    if settings.DATABASE_MODE == "async":
+        bind = async_engine.execution_options(**execution_options)
+        async with AsyncSessionLocal(bind=bind) as session:
+            yield AsyncSessionRunner(session)
+    else:
+        session = SessionLocal(bind=engine.execution_options(**execution_options))
+        try:
+            yield SyncSessionRunner(session)
+        finally:
+            await run_in_threadpool(session.close)
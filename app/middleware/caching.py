@@ -0,0 +1,68 @@
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.caching import CachePolicy
+
+# Responses a route's policy applies to; everything else gets the default
+_CACHEABLE_METHODS = frozenset({"GET", "HEAD"})
+_CACHEABLE_STATUSES = frozenset({200, 304})
+
+
+class CacheControlMiddleware:
+    """
+    Set Cache-Control per route, and the ETag a route's dependencies chose.
+
+    Policies are keyed by route path template (e.g. "/api/v1/points/{point_id}")
+    and only apply to successful GETs and their 304s; other responses, and
+    routes without a policy, get `default`. Responses that set their own
+    Cache-Control keep it.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default: CachePolicy,
+        route_policies: Optional[Dict[str, CachePolicy]] = None,
+    ):
+        self.app = app
+        self.default = default
+        self.route_policies = route_policies or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_caching(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self._add_headers(scope, message)
+            await send(message)
+
+        await self.app(scope, receive, send_with_caching)
+
+    def _add_headers(self, scope: Scope, message: Message) -> None:
+        headers = MutableHeaders(scope=message)
+        cacheable = (
+            scope["method"] in _CACHEABLE_METHODS
+            and message["status"] in _CACHEABLE_STATUSES
+        )
+
+        policy = self.default
+        # Set by the router once it has matched a route
+        route = scope.get("route")
+        if cacheable and route is not None:
+            policy = self.route_policies.get(route.path, self.default)
+        if "cache-control" not in headers:
+            headers["Cache-Control"] = policy.header
+
+        etag = scope.get("state", {}).get("etag")
+        if cacheable and etag is not None and "etag" not in headers:
+            headers["ETag"] = etag
+            # Version ETags cover the negotiated representation
+            vary = {
+                value.strip().lower() for value in headers.get("vary", "").split(",")
+            }
+            if "accept" not in vary:
+                headers.add_vary_header("Accept")
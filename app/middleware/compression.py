@@ -0,0 +1,114 @@
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.compression import (
+    COMPRESSIBLE_MEDIA_TYPES,
+    STREAMS,
+    CompressionPolicy,
+    compress,
+    negotiate_encoding,
+)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with gzip, brotli or zstd, as Accept-Encoding allows.
+
+    Each path can have its own policy (minimum size and levels); others use
+    `default`. Streamed bodies are compressed chunk by chunk, and responses
+    that already carry a Content-Encoding (precompressed ones) pass through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default: CompressionPolicy,
+        path_policies: Optional[Dict[str, CompressionPolicy]] = None,
+    ):
+        self.app = app
+        self.default = default
+        self.path_policies = path_policies or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.path_policies.get(scope["path"], self.default)
+        responder = _CompressingResponder(send, encoding, policy)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, encoding: str, policy: CompressionPolicy):
+        self._send = send
+        self.encoding = encoding
+        self.policy = policy
+        self.start: Optional[Message] = None
+        # None until the first body message decides; False passes through
+        self.stream = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is None:
+            await self._begin(body, more_body)
+        elif self.stream is False:
+            await self._send(message)
+        else:
+            chunk = self.stream.compress(body) if body else b""
+            if not more_body:
+                chunk += self.stream.finish()
+            await self._send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+
+    async def _begin(self, body: bytes, more_body: bool) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        media_type = headers.get("content-type", "").split(";")[0].strip()
+        if (
+            "content-encoding" in headers
+            or media_type not in COMPRESSIBLE_MEDIA_TYPES
+            or (not more_body and len(body) < max(self.policy.minimum_size, 1))
+        ):
+            self.stream = False
+            await self._send(self.start)
+            await self._send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            # Same representation, different bytes: no longer a strong match
+            headers["ETag"] = f"W/{etag}"
+
+        if more_body:
+            del headers["Content-Length"]
+            self.stream = STREAMS[self.encoding](self.policy.levels[self.encoding])
+            body = self.stream.compress(body)
+        else:
+            self.stream = False
+            body = compress(body, self.encoding, self.policy.levels)
+            headers["Content-Length"] = str(len(body))
+
+        await self._send(self.start)
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
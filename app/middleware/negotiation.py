@@ -0,0 +1,22 @@
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.encoders import negotiate, response_encoder
+
+
+class ContentNegotiationMiddleware:
+    """Pick the response encoder for the request's Accept header"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = response_encoder.set(negotiate(Headers(scope=scope).get("accept")))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_encoder.reset(token)
@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, String
+
+from app.base import Base
+
+
+class DataVersion(Base):
+    """Write counter per table, bumped by each transaction that changes it"""
+
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
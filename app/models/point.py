@@ -1,9 +1,10 @@
-from geoalchemy2 import Geometry
+from geoalchemy2 import Geography, Geometry
 from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship, validates
 
 from app.base import Base
 from app.core.constants import SpatialRefSys
+from app.spatial.queries import geometry_to_geography
 
 
 class Point(Base):
@@ -14,6 +15,17 @@ class Point(Base):
     geometry = Column(
         Geometry(geometry_type="POINT", srid=SpatialRefSys.WGS84), nullable=False
     )
+    # Stored copy of `geometry` for geodesic queries, so they hit a plain GiST
+    # index instead of relying on a geography(geometry) expression index.
+    # Only used inside queries, so it is never loaded with the row.
+    geog = deferred(
+        Column(
+            Geography(
+                geometry_type="POINT", srid=SpatialRefSys.GEOGRAPHY, spatial_index=False
+            ),
+            nullable=False,
+        )
+    )
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     created_at = Column(
         DateTime(timezone=True),
@@ -30,5 +42,16 @@ class Point(Base):
     # Define indexes using SQLAlchemy
     __table_args__ = (
         Index("idx_points_geometry", "geometry", postgresql_using="gist"),
-        # KNN and geography index can't be defined directly in SQLAlchemy, SQL written in the migration file
+        Index("idx_points_geog", "geog", postgresql_using="gist"),
+        # Keyset pagination seeks on these, optionally within a category
+        Index("idx_points_created_at_id", "created_at", "id"),
+        Index("idx_points_category_id_id", "category_id", "id"),
+        Index("idx_points_category_created_at_id", "category_id", "created_at", "id"),
+        # KNN index can't be defined directly in SQLAlchemy, SQL written in the migration file
     )
+
+    @validates("geometry")
+    def _sync_geog(self, key, value):
+        """Keep the stored geography in step with every geometry write"""
+        self.geog = geometry_to_geography(value)
+        return value
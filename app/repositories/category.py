@@ -1,9 +1,12 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import delete, func, insert, update
 from sqlalchemy.orm import Session
 
+from app.core.constants import PageOrder
 from app.models.category import Category
+from app.models.point import Point
+from app.repositories.pagination import paginate
 
 
 class CategoryRepository:
@@ -14,14 +17,67 @@ class CategoryRepository:
     def get(self, id: int) -> Optional[Category]:
         return self.session.query(Category).filter(Category.id == id).first()
 
-    def get_multi(self, *, skip: int = 0, limit: int = 100) -> List[Category]:
-        return self.session.query(Category).offset(skip).limit(limit).all()
+    def get_multi(
+        self,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        order: PageOrder = PageOrder.ID,
+        after: Optional[Tuple] = None,
+    ) -> List[Category]:
+        query = self.session.query(Category)
+        return paginate(
+            query, Category, order=order, after=after, skip=skip, limit=limit
+        ).all()
 
     def create(self, *, obj_data: Dict[str, Any]) -> Category:
         db_obj = Category(**obj_data)
         self.session.add(db_obj)
         return db_obj
 
+    def insert_category(self, *, obj_data: Dict[str, Any]) -> Category:
+        """INSERT ... RETURNING the new category, in one round trip"""
+        statement = insert(Category).values(**obj_data).returning(Category)
+        return self.session.scalars(statement).one()
+
+    def update_category(
+        self, *, id: int, obj_data: Dict[str, Any]
+    ) -> Optional[Category]:
+        """UPDATE ... RETURNING the category, or None if there is no such category"""
+        if not obj_data:
+            return self.get(id=id)
+        statement = (
+            update(Category)
+            .where(Category.id == id)
+            .values(**obj_data)
+            .returning(Category)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        return self.session.scalars(statement).first()
+
+    def delete_category(self, *, id: int) -> Optional[Category]:
+        """
+        DELETE ... RETURNING the category, or None if there is no such category.
+
+        Its points lose their category in the same statement, as they would
+        with an ORM delete.
+        """
+        points = Point.__table__
+        detach = (
+            update(points)
+            .where(points.c.category_id == id)
+            .values(category_id=None)
+            .cte("detached")
+        )
+        statement = (
+            delete(Category)
+            .where(Category.id == id)
+            .add_cte(detach)
+            .returning(Category)
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.scalars(statement).first()
+
     def update(self, *, db_obj: Category, obj_data: Dict[str, Any]) -> Category:
         for field, value in obj_data.items():
             if hasattr(db_obj, field):
@@ -47,5 +103,17 @@ class CategoryRepository:
             query = query.filter(Category.id != exclude_id)
         return self.session.query(query.exists()).scalar()
 
+    def get_existing_ids(self, *, ids: Iterable[int]) -> Set[int]:
+        """The subset of `ids` that are categories"""
+        ids = list(ids)
+        if not ids:
+            return set()
+        rows = self.session.query(Category.id).filter(Category.id.in_(ids)).all()
+        return {category_id for category_id, in rows}
+
+    def get_id_map(self) -> Dict[str, int]:
+        """Every category id, keyed by name"""
+        return dict(self.session.query(Category.name, Category.id).all())
+
     def count(self) -> int:
         return self.session.query(func.count(Category.id)).scalar()
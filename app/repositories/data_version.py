@@ -0,0 +1,40 @@
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.data_version import DataVersion
+
+
+class DataVersionRepository:
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def bump(self, names: Iterable[str]) -> None:
+        """
+        Add one to each table's version, within the caller's transaction.
+
+        The rows stay locked until commit, so this runs right before it; names
+        are bumped in sorted order so concurrent writers can't deadlock.
+        """
+        for name in sorted(set(names)):
+            statement = insert(DataVersion).values(name=name, version=1)
+            statement = statement.on_conflict_do_update(
+                index_elements=[DataVersion.name],
+                set_={"version": DataVersion.version + 1},
+            )
+            self.session.execute(statement)
+
+    def get_versions(self, names: Iterable[str]) -> Dict[str, int]:
+        """Current version of each table; 0 for tables never written to"""
+        names = list(names)
+        rows = self.session.execute(
+            select(DataVersion.name, DataVersion.version).where(
+                DataVersion.name.in_(names)
+            )
+        )
+        versions = dict.fromkeys(names, 0)
+        versions.update(rows.tuples())
+        return versions
@@ -0,0 +1,31 @@
+from typing import Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+from app.core.constants import PAGE_ORDER_KEYS, PageOrder
+
+
+def paginate(
+    query: Query,
+    model,
+    *,
+    order: PageOrder = PageOrder.ID,
+    after: Optional[Tuple] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> Query:
+    """
+    Sort `query` in `order` and cut one page from it.
+
+    With `after`, the sort key of the previous page's last row, the page starts
+    at a row-value comparison the matching index can seek to, so deep pages
+    cost the same as the first. Without it the page is found by OFFSET.
+    """
+    columns = [getattr(model, name) for name in PAGE_ORDER_KEYS[order]]
+    if after is not None:
+        query = query.filter(tuple_(*columns) > tuple_(*after))
+    query = query.order_by(*columns)
+    if after is None and skip:
+        query = query.offset(skip)
+    return query.limit(limit)
@@ -1,18 +1,107 @@
-from typing import Any, Dict, List, Optional, Tuple
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
 from geoalchemy2.shape import from_shape, to_shape
 from shapely.geometry import Point as ShapelyPoint
-from sqlalchemy import func, text
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Float,
+    Integer,
+    String,
+    Text,
+    any_,
+    bindparam,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    select,
+    table,
+    text,
+    true,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, aliased, contains_eager
+from sqlalchemy.util.concurrency import await_only
 
-from app.core.constants import SpatialRefSys
+from app.core.constants import NearbyStrategy, PageOrder, SpatialRefSys
+from app.models.category import Category
 from app.models.point import Point
+from app.repositories.pagination import paginate
 from app.spatial.queries import (
+    GEOGRAPHY_POINT,
+    Envelope,
     add_distance_to_query,
+    bbox_envelopes,
     filter_by_distance,
+    filter_by_envelopes,
+    filter_by_exact_distance,
+    geometry_to_geography,
     nearest_neighbor_query,
-    point_to_ewkb,
+    point_to_geography,
+    radius_envelopes,
+)
+from app.spatial.tiles import WEB_MERCATOR_HALF_WIDTH
+
+# Session-local table that uploads are COPYed into before the merge
+UPLOAD_STAGING_TABLE = "points_upload"
+UPLOAD_STAGING_COLUMNS = (
+    "upload_row",
+    "name",
+    "description",
+    "lng",
+    "lat",
+    "category_id",
+)
+
+# Column types of the VALUES list behind bulk_update
+BULK_UPDATE_TYPES = {
+    "id": Integer,
+    "name": String(100),
+    "description": Text,
+    "category_id": Integer,
+    "latitude": Float,
+    "longitude": Float,
+}
+
+
+class PointRow(NamedTuple):
+    """A point as read for a response: plain values, no ORM state or WKB"""
+
+    id: int
+    name: str
+    description: Optional[str]
+    category_id: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+    lat: float
+    lng: float
+    category_name: Optional[str]
+    category_description: Optional[str]
+    category_color: Optional[str]
+
+
+# The columns behind PointRow, in field order
+POINT_ROW_COLUMNS = (
+    Point.id,
+    Point.name,
+    Point.description,
+    Point.category_id,
+    Point.created_at,
+    Point.updated_at,
+    func.ST_Y(Point.geometry).label("lat"),
+    func.ST_X(Point.geometry).label("lng"),
+    Category.name.label("category_name"),
+    Category.description.label("category_description"),
+    Category.color.label("category_color"),
 )
+_POINT_ROW_WIDTH = len(POINT_ROW_COLUMNS)
 
 
 class PointRepository:
@@ -24,8 +113,26 @@ class PointRepository:
     def get(self, id: int) -> Optional[Point]:
         return self.session.query(Point).filter(Point.id == id).first()
 
-    def get_multi(self, *, skip: int = 0, limit: int = 100) -> List[Point]:
-        return self.session.query(Point).offset(skip).limit(limit).all()
+    def get_row(self, *, id: int) -> Optional[PointRow]:
+        rows = self._rows(self._select_rows().where(Point.id == id))
+        return rows[0] if rows else None
+
+    def get_updated_at(self, *, id: int) -> Optional[datetime]:
+        """When the point was last written, or None if there is no such point"""
+        return self.session.scalar(select(Point.updated_at).where(Point.id == id))
+
+    def get_multi(
+        self,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        order: PageOrder = PageOrder.ID,
+        after: Optional[Tuple] = None,
+    ) -> List[PointRow]:
+        query = self._select_rows()
+        return self._rows(
+            paginate(query, Point, order=order, after=after, skip=skip, limit=limit)
+        )
 
     def create(self, *, obj_data: Dict[str, Any]) -> Point:
         db_obj = Point(**obj_data)
@@ -53,6 +160,86 @@ class PointRepository:
         self.session.add(point)
         return point
 
+    def insert_point(
+        self,
+        *,
+        name: str,
+        description: Optional[str],
+        latitude: float,
+        longitude: float,
+        category_id: Optional[int] = None,
+    ) -> Point:
+        """INSERT ... RETURNING the new point with its category, in one round trip"""
+        values = dict(name=name, description=description, category_id=category_id)
+        values.update(self._geometry_values(latitude, longitude))
+        row = self._written(insert(Point.__table__).values(**values))
+        return row[0]
+
+    def update_point(
+        self,
+        *,
+        point_id: int,
+        values: Dict[str, Any],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+    ) -> Optional[Tuple[Point, float, float, Optional[int]]]:
+        """
+        UPDATE ... RETURNING the point with its category, in one round trip.
+
+        Coordinates are moved when both are given. Returns (point, previous lat,
+        previous lng, previous category_id), or None if there is no such point.
+        """
+        values = dict(values)
+        if latitude is not None and longitude is not None:
+            values.update(self._geometry_values(latitude, longitude))
+
+        # Joining a second copy of the row exposes its values before the update
+        points = Point.__table__
+        previous = points.alias("previous")
+        statement = (
+            update(points)
+            .where(points.c.id == point_id, previous.c.id == points.c.id)
+            .values(**values)
+        )
+        return self._written(
+            statement,
+            func.ST_Y(previous.c.geometry).label("previous_lat"),
+            func.ST_X(previous.c.geometry).label("previous_lng"),
+            previous.c.category_id.label("previous_category_id"),
+        )
+
+    def delete_point(self, *, point_id: int) -> Optional[Point]:
+        """DELETE ... RETURNING the point with its category, in one round trip"""
+        points = Point.__table__
+        row = self._written(delete(points).where(points.c.id == point_id))
+        return None if row is None else row[0]
+
+    def _geometry_values(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        geometry = from_shape(
+            ShapelyPoint(longitude, latitude), srid=SpatialRefSys.WGS84
+        )
+        # Core statements skip @validates, so the geography is set here
+        return {"geometry": geometry, "geog": geometry_to_geography(geometry)}
+
+    def _written(self, statement, *extra) -> Optional[Row]:
+        """
+        Run a DML statement and load the row it wrote, plus `extra` columns.
+
+        The statement goes in a CTE whose RETURNING row is mapped back onto
+        Point and joined to its category, so the write and the read of the
+        response are one statement.
+        """
+        columns = [c for c in Point.__table__.c if c.name != "geog"]
+        written = statement.returning(*columns, *extra).cte("written")
+        point = aliased(Point, written)
+        query = (
+            select(point, *(written.c[column.name] for column in extra))
+            .outerjoin(point.category)
+            .options(contains_eager(point.category))
+            .execution_options(populate_existing=True)
+        )
+        return self.session.execute(query).first()
+
     def update(self, *, db_obj: Point, obj_data: Dict[str, Any]) -> Point:
         for field, value in obj_data.items():
             if hasattr(db_obj, field):
@@ -89,53 +276,528 @@ class PointRepository:
         return self.session.query(func.count(Point.id)).scalar()
 
     def get_by_category(
-        self, *, category_id: int, skip: int = 0, limit: int = 100
-    ) -> List[Point]:
-        return (
-            self.session.query(Point)
-            .filter(Point.category_id == category_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+        self,
+        *,
+        category_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        order: PageOrder = PageOrder.ID,
+        after: Optional[Tuple] = None,
+    ) -> List[PointRow]:
+        query = self._select_rows().where(Point.category_id == category_id)
+        return self._rows(
+            paginate(query, Point, order=order, after=after, skip=skip, limit=limit)
         )
 
     def get_nearby(
-        self, *, lat: float, lng: float, radius: float, limit: int = 100
-    ) -> List[Tuple[Point, float]]:
-        wkb_point = point_to_ewkb(lat, lng)
+        self,
+        *,
+        lat: float,
+        lng: float,
+        radius: float,
+        limit: int = 100,
+        strategy: NearbyStrategy = NearbyStrategy.GEOGRAPHY,
+    ) -> List[Tuple[PointRow, float]]:
+        point_geog = point_to_geography(lat, lng)
+
+        query = self._select_rows()
+        query = add_distance_to_query(query, Point, point_geog)
 
-        query = self.session.query(Point)
-        query = add_distance_to_query(query, Point, wkb_point)
-        query = filter_by_distance(query, Point, wkb_point, radius)
+        if strategy == NearbyStrategy.BBOX:
+            envelopes = radius_envelopes(lat, lng, radius)
+            query = filter_by_envelopes(query, Point, envelopes)
+            query = filter_by_exact_distance(query, Point, point_geog, radius)
+        else:
+            query = filter_by_distance(query, Point, point_geog, radius)
 
         query = query.order_by(text("distance")).limit(limit)
 
-        return query.all()
+        return self._rows_with_distance(query)
 
     def get_nearest(
         self, *, lat: float, lng: float, limit: int = 5
-    ) -> List[Tuple[Point, float]]:
-        point_geom = point_to_ewkb(lat, lng)
+    ) -> List[Tuple[PointRow, float]]:
+        point_geog = point_to_geography(lat, lng)
 
-        query = self.session.query(Point)
-        query = add_distance_to_query(query, Point, point_geom)
-        query = nearest_neighbor_query(query, Point, point_geom)
+        query = self._select_rows()
+        query = add_distance_to_query(query, Point, point_geog)
+        query = nearest_neighbor_query(query, Point, point_geog)
         query = query.limit(limit)
 
-        return query.all()
+        return self._rows_with_distance(query)
+
+    def get_nearest_batch(
+        self, *, origins: List[Tuple[float, float, int, Optional[float]]]
+    ) -> List[Tuple[int, PointRow, float]]:
+        """
+        Nearest points for many (lat, lng, k, radius) origins in one query per kind.
+
+        Origins without a radius get their k nearest points via KNN; origins
+        with one get up to k points within it. Returns (origin index, PointRow,
+        distance) rows ordered by origin, then distance.
+        """
+        knn = [(i, *o[:3]) for i, o in enumerate(origins) if o[3] is None]
+        within = [(i, *o) for i, o in enumerate(origins) if o[3] is not None]
+
+        rows = []
+        if knn:
+            rows.extend(self._nearest_lateral(knn, with_radius=False))
+        if within:
+            rows.extend(self._nearest_lateral(within, with_radius=True))
+        return sorted(rows, key=lambda row: (row[0], row[2]))
+
+    def get_coordinates(self, *, ids: List[int]) -> Dict[int, Tuple[float, float]]:
+        """(lat, lng) of each existing point in `ids`"""
+        if not ids:
+            return {}
+        rows = (
+            self.session.query(
+                Point.id, func.ST_Y(Point.geometry), func.ST_X(Point.geometry)
+            )
+            .filter(Point.id.in_(ids))
+            .all()
+        )
+        return {point_id: (lat, lng) for point_id, lat, lng in rows}
+
+    def get_distance_matrix(
+        self,
+        *,
+        sources: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        batch_rows: int = 1000,
+    ) -> Iterator[List[List[float]]]:
+        """
+        Geodesic distances in meters from every source to every destination.
+
+        Rows come in batches of `batch_rows` sources, one query per batch, so
+        the first rows are out before the last are computed.
+        """
+        dst = self._coordinate_table("dst", destinations)
+        for start in range(0, len(sources), batch_rows):
+            src = self._coordinate_table("src", sources[start : start + batch_rows])
+            rows = (
+                self.session.query(
+                    src.c.ord,
+                    func.array_agg(
+                        aggregate_order_by(
+                            func.ST_Distance(src.c.geog, dst.c.geog), dst.c.ord
+                        )
+                    ),
+                )
+                .select_from(src)
+                .join(dst, true())
+                .group_by(src.c.ord)
+                .order_by(src.c.ord)
+                .all()
+            )
+            yield [distances for _, distances in rows]
+
+    def _coordinate_table(self, name: str, coords: List[Tuple[float, float]]):
+        """Derived table of (ord, geog) for (lat, lng) pairs, numbered from 1"""
+        lats, lngs = zip(*coords)
+        pairs = (
+            func.unnest(
+                bindparam(f"{name}_lat", list(lats), type_=ARRAY(Float)),
+                bindparam(f"{name}_lng", list(lngs), type_=ARRAY(Float)),
+            )
+            .table_valued("lat", "lng", with_ordinality="ord")
+            .render_derived(name=f"{name}_pairs")
+        )
+        return select(
+            pairs.c.ord,
+            cast(
+                func.ST_SetSRID(
+                    func.ST_MakePoint(pairs.c.lng, pairs.c.lat), SpatialRefSys.WGS84
+                ),
+                GEOGRAPHY_POINT,
+            ).label("geog"),
+        ).subquery(name)
+
+    def _nearest_lateral(
+        self, origins: List[Tuple], with_radius: bool
+    ) -> List[Tuple[int, PointRow, float]]:
+        columns = list(zip(*origins))
+        types = [Integer, Float, Float, Integer, Float]
+        names = ["idx", "lat", "lng", "k", "radius"][: len(columns)]
+        origin_table = (
+            func.unnest(
+                *(
+                    bindparam(name, list(values), type_=ARRAY(type_))
+                    for name, values, type_ in zip(names, columns, types)
+                )
+            )
+            .table_valued(*names)
+            .render_derived(name="origins")
+        )
+
+        origin_geog = cast(
+            func.ST_SetSRID(
+                func.ST_MakePoint(origin_table.c.lng, origin_table.c.lat),
+                SpatialRefSys.WGS84,
+            ),
+            GEOGRAPHY_POINT,
+        )
+        distance = func.ST_Distance(Point.geog, origin_geog)
+
+        neighbours = select(Point.id.label("id"), distance.label("distance")).correlate(
+            origin_table
+        )
+        if with_radius:
+            neighbours = neighbours.where(
+                func.ST_DWithin(Point.geog, origin_geog, origin_table.c.radius)
+            ).order_by(distance)
+        else:
+            neighbours = neighbours.order_by(Point.geog.distance_centroid(origin_geog))
+        neighbours = neighbours.limit(origin_table.c.k).lateral("neighbours")
+
+        query = (
+            select(origin_table.c.idx, *POINT_ROW_COLUMNS, neighbours.c.distance)
+            .select_from(origin_table)
+            .join(neighbours, true())
+            .join(Point, Point.id == neighbours.c.id)
+            .outerjoin(Category, Category.id == Point.category_id)
+        )
+        return [
+            (row[0], PointRow(*row[1:-1]), row[-1])
+            for row in self.session.execute(query)
+        ]
+
+    def get_within_polygon(
+        self, *, polygon_wkt: str, limit: int = 100, after_id: Optional[int] = None
+    ) -> List[PointRow]:
+        """Points inside the polygon in id order, starting after `after_id`"""
+        query = self._select_rows().where(
+            func.ST_Within(
+                Point.geometry,
+                func.ST_GeomFromText(polygon_wkt, SpatialRefSys.WGS84),
+            )
+        )
+        after = None if after_id is None else (after_id,)
+        return self._rows(paginate(query, Point, after=after, limit=limit))
+
+    def get_by_ids(self, *, ids: List[int]) -> List[PointRow]:
+        if not ids:
+            return []
+        return self._rows(self._select_rows().where(Point.id.in_(ids)))
+
+    def _select_rows(self):
+        """
+        SELECT of PointRow's columns, with the category joined in.
 
-    def get_within_polygon(self, *, polygon_wkt: str, limit: int = 100) -> List[Point]:
+        Reads go through Core rather than the ORM: nothing enters the identity
+        map, the category comes with the point instead of one lazy load per
+        row, and coordinates arrive as floats instead of WKB to decode.
+        """
         return (
-            self.session.query(Point)
-            .filter(
-                func.ST_Within(
-                    Point.geometry,
-                    func.ST_GeomFromText(polygon_wkt, SpatialRefSys.WGS84),
+            select(*POINT_ROW_COLUMNS)
+            .select_from(Point)
+            .outerjoin(Category, Category.id == Point.category_id)
+        )
+
+    def _rows(self, query) -> List[PointRow]:
+        return [PointRow(*row) for row in self.session.execute(query)]
+
+    def _rows_with_distance(self, query) -> List[Tuple[PointRow, float]]:
+        """(PointRow, distance) pairs of a row query with a distance column added"""
+        return [
+            (PointRow(*row[:_POINT_ROW_WIDTH]), row[_POINT_ROW_WIDTH])
+            for row in self.session.execute(query)
+        ]
+
+    def get_ids(self) -> List[int]:
+        return [row[0] for row in self.session.query(Point.id).all()]
+
+    def iter_export(
+        self,
+        *,
+        category_id: Optional[int] = None,
+        bbox: Optional[Envelope] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Sequence[Row]]:
+        """
+        Batches of plain point rows, in id order, read through a server-side cursor.
+
+        Rows carry the point columns plus lng/lat; no ORM objects are built, so
+        memory stays flat however many rows are read.
+        """
+        query = select(
+            Point.id,
+            Point.name,
+            Point.description,
+            Point.category_id,
+            Point.created_at,
+            Point.updated_at,
+            func.ST_X(Point.geometry).label("lng"),
+            func.ST_Y(Point.geometry).label("lat"),
+        ).order_by(Point.id)
+        if category_id is not None:
+            query = query.where(Point.category_id == category_id)
+        if bbox is not None:
+            query = filter_by_envelopes(query, Point, bbox_envelopes(bbox))
+
+        result = self.session.execute(query.execution_options(yield_per=batch_size))
+        yield from result.partitions()
+
+    def bulk_create(self, *, items: List[Dict[str, Any]]) -> List[int]:
+        """
+        Insert many points with multi-row INSERT ... RETURNING.
+
+        Items carry latitude/longitude plus point columns; ids come back in
+        item order.
+        """
+        rows = []
+        for item in items:
+            row = {k: v for k, v in item.items() if k not in ("latitude", "longitude")}
+            row["geometry"] = from_shape(
+                ShapelyPoint(item["longitude"], item["latitude"]),
+                srid=SpatialRefSys.WGS84,
+            )
+            # ORM bulk inserts skip @validates, so the geography is set here
+            row["geog"] = geometry_to_geography(row["geometry"])
+            rows.append(row)
+
+        statement = insert(Point).returning(Point.id, sort_by_parameter_order=True)
+        return list(self.session.scalars(statement, rows))
+
+    def bulk_update(self, *, items: List[Dict[str, Any]]) -> int:
+        """
+        Update many points with UPDATE ... FROM (VALUES ...).
+
+        Each item has an id plus the fields to set, latitude and longitude
+        together. Items setting the same fields share one statement. Returns
+        the number of rows updated.
+        """
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for item in items:
+            fields = tuple(sorted(k for k in item if k != "id"))
+            groups.setdefault(fields, []).append(item)
+
+        updated = 0
+        for fields, group in groups.items():
+            if not fields:
+                continue
+            names = ("id",) + fields
+            updates = values(
+                *(column(name, BULK_UPDATE_TYPES[name]) for name in names),
+                name="updates",
+            ).data([tuple(item[name] for name in names) for item in group])
+
+            # Cast each column: untyped NULLs in VALUES would otherwise be text
+            assignments = {
+                name: cast(updates.c[name], BULK_UPDATE_TYPES[name])
+                for name in fields
+                if name not in ("latitude", "longitude")
+            }
+            if "latitude" in fields:
+                geometry = func.ST_SetSRID(
+                    func.ST_MakePoint(
+                        cast(updates.c.longitude, Float),
+                        cast(updates.c.latitude, Float),
+                    ),
+                    SpatialRefSys.WGS84,
+                )
+                assignments["geometry"] = geometry
+                assignments["geog"] = cast(geometry, GEOGRAPHY_POINT)
+
+            statement = (
+                update(Point)
+                .where(Point.id == updates.c.id)
+                .values(**assignments)
+                .execution_options(synchronize_session=False)
+            )
+            updated += self.session.execute(statement).rowcount
+        return updated
+
+    def bulk_delete(
+        self, *, ids: List[int]
+    ) -> List[Tuple[int, float, float, Optional[int]]]:
+        """
+        DELETE ... WHERE id = ANY(...).
+
+        Returns (id, lat, lng, category_id) of each deleted point.
+        """
+        statement = (
+            delete(Point)
+            .where(Point.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+            .returning(
+                Point.id,
+                func.ST_Y(Point.geometry),
+                func.ST_X(Point.geometry),
+                Point.category_id,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return [tuple(row) for row in self.session.execute(statement)]
+
+    def create_upload_staging(self) -> None:
+        """Temporary table holding uploaded rows until they are merged"""
+        self.session.execute(
+            text(
+                f"CREATE TEMP TABLE {UPLOAD_STAGING_TABLE} ("
+                "upload_row integer, name varchar(100), description text, "
+                "lng double precision, lat double precision, category_id integer"
+                ") ON COMMIT DROP"
+            )
+        )
+
+    def copy_to_upload_staging(self, *, rows: List[Tuple]) -> None:
+        """COPY validated rows into the staging table, inside the session's transaction"""
+        connection = self.session.connection().connection.driver_connection
+        if self.session.get_bind().dialect.driver == "asyncpg":
+            await_only(
+                connection.copy_records_to_table(
+                    UPLOAD_STAGING_TABLE,
+                    records=rows,
+                    columns=list(UPLOAD_STAGING_COLUMNS),
                 )
             )
-            .limit(limit)
+            return
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {UPLOAD_STAGING_TABLE} ({', '.join(UPLOAD_STAGING_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+    def merge_upload_staging(self) -> int:
+        """Insert every staged row into points; returns the number inserted"""
+        staging = table(
+            UPLOAD_STAGING_TABLE, *(column(name) for name in UPLOAD_STAGING_COLUMNS)
+        )
+        geometry = func.ST_SetSRID(
+            func.ST_MakePoint(staging.c.lng, staging.c.lat), SpatialRefSys.WGS84
+        )
+        statement = insert(Point.__table__).from_select(
+            ["name", "description", "geometry", "geog", "category_id"],
+            select(
+                staging.c.name,
+                staging.c.description,
+                geometry,
+                cast(geometry, GEOGRAPHY_POINT),
+                staging.c.category_id,
+            ).order_by(staging.c.upload_row),
+        )
+        return self.session.execute(statement).rowcount
+
+    def get_index_rows(
+        self, *, updated_since: Optional[datetime] = None
+    ) -> List[Tuple[int, float, float, Optional[int], datetime]]:
+        """(id, lat, lng, category_id, updated_at) rows for the in-memory index"""
+        query = self.session.query(
+            Point.id,
+            func.ST_Y(Point.geometry),
+            func.ST_X(Point.geometry),
+            Point.category_id,
+            Point.updated_at,
+        )
+        if updated_since is not None:
+            query = query.filter(Point.updated_at >= updated_since)
+
+        return [tuple(row) for row in query.all()]
+
+    def get_tile(
+        self,
+        *,
+        z: int,
+        x: int,
+        y: int,
+        category_id: Optional[int] = None,
+        extent: int = 4096,
+        buffer: int = 64,
+        buffer_meters: float = 0.0,
+    ) -> bytes:
+        """Encode the points in tile z/x/y as a Mapbox Vector Tile layer"""
+        envelope = func.ST_TileEnvelope(z, x, y)
+
+        query = self.session.query(
+            func.ST_AsMVTGeom(
+                func.ST_Transform(Point.geometry, SpatialRefSys.WEB_MERCATOR),
+                envelope,
+                extent,
+                buffer,
+                True,
+            ).label("geom"),
+            Point.id,
+            Point.name,
+            Point.category_id,
+        ).filter(
+            # Tile plus buffer, in lat/lng so the geometry GiST index is used
+            Point.geometry.op("&&")(
+                func.ST_Transform(
+                    func.ST_Expand(envelope, buffer_meters), SpatialRefSys.WGS84
+                )
+            )
+        )
+        if category_id is not None:
+            query = query.filter(Point.category_id == category_id)
+
+        features = query.subquery("features")
+        tile = self.session.query(
+            func.ST_AsMVT(features.table_valued(), "points", extent, "geom", "id")
+        ).scalar()
+
+        return bytes(tile) if tile is not None else b""
+
+    def get_grid_clusters(
+        self,
+        *,
+        min_lng: float,
+        min_lat: float,
+        max_lng: float,
+        max_lat: float,
+        cell_size: float,
+        category_id: Optional[int] = None,
+    ) -> List[Tuple[float, float, Optional[int], int, float, float]]:
+        """
+        Snap points in a bbox to a Web Mercator grid and count them per cell.
+
+        Returns (cell_x, cell_y, category_id, count, avg_lng, avg_lat) rows,
+        where cell_x/cell_y is the centre of the cell in EPSG:3857.
+        """
+        # Cells are aligned to the tile grid's corner; offsetting the origin by
+        # half a cell snaps each point to the centre of its cell
+        origin = -WEB_MERCATOR_HALF_WIDTH + cell_size / 2
+        cell = func.ST_SnapToGrid(
+            func.ST_Transform(Point.geometry, SpatialRefSys.WEB_MERCATOR),
+            origin,
+            origin,
+            cell_size,
+            cell_size,
+        )
+        query = self.session.query(
+            func.ST_X(cell).label("cell_x"),
+            func.ST_Y(cell).label("cell_y"),
+            Point.category_id.label("category_id"),
+            func.ST_X(Point.geometry).label("lng"),
+            func.ST_Y(Point.geometry).label("lat"),
+        ).filter(
+            Point.geometry.op("&&")(
+                func.ST_MakeEnvelope(
+                    min_lng, min_lat, max_lng, max_lat, SpatialRefSys.WGS84
+                )
+            )
+        )
+        if category_id is not None:
+            query = query.filter(Point.category_id == category_id)
+
+        snapped = query.subquery("snapped")
+        rows = (
+            self.session.query(
+                snapped.c.cell_x,
+                snapped.c.cell_y,
+                snapped.c.category_id,
+                func.count(),
+                func.avg(snapped.c.lng),
+                func.avg(snapped.c.lat),
+            )
+            .group_by(snapped.c.cell_x, snapped.c.cell_y, snapped.c.category_id)
             .all()
         )
+        return [tuple(row) for row in rows]
 
     def count_by_category(self, *, category_id: int) -> int:
         return (
@@ -143,3 +805,43 @@ class PointRepository:
             .filter(Point.category_id == category_id)
             .scalar()
         )
+
+    def count_by_categories(self) -> Dict[Optional[int], int]:
+        """Point count of every category, None for points without one"""
+        return dict(
+            self.session.query(Point.category_id, func.count(Point.id))
+            .group_by(Point.category_id)
+            .all()
+        )
+
+    def estimate_count(self, *, category_id: Optional[int] = None) -> int:
+        """
+        Planner estimate of the point count, without scanning the table.
+
+        The whole table is sized from pg_class.reltuples; a category filter is
+        sized by the row estimate of its plan. Accuracy depends on how recently
+        the table was analyzed.
+        """
+        if category_id is None:
+            reltuples = self.session.execute(
+                text(
+                    "SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"
+                ),
+                {"table": Point.__tablename__},
+            ).scalar()
+            # -1 until the table is first vacuumed or analyzed
+            if reltuples is not None and reltuples >= 0:
+                return int(reltuples)
+
+        query = select(Point.id)
+        if category_id is not None:
+            query = query.where(Point.category_id == category_id)
+        # Rendered inline: EXPLAIN can't take bind parameters on every driver
+        sql = query.compile(
+            dialect=self.session.get_bind().dialect,
+            compile_kwargs={"literal_binds": True},
+        )
+        plan = self.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
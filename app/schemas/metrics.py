@@ -0,0 +1,29 @@
+from typing import Dict
+
+from pydantic import BaseModel, Field
+
+
+class PoolStats(BaseModel):
+    """Live state and cumulative counters of a connection pool"""
+
+    size: int = Field(..., description="Configured pool size")
+    checked_out: int = Field(..., description="Connections currently in use")
+    checked_in: int = Field(..., description="Idle connections in the pool")
+    overflow: int = Field(..., description="Current overflow connections")
+    connects: int = Field(..., description="New DBAPI connections opened")
+    checkouts: int = Field(..., description="Connections handed out")
+    checkins: int = Field(..., description="Connections returned")
+    invalidations: int = Field(..., description="Connections invalidated")
+    timeouts: int = Field(..., description="Checkouts that hit the pool timeout")
+    saturated: int = Field(
+        ..., description="Checkouts that found the pool fully in use"
+    )
+    avg_wait_ms: float = Field(..., description="Average checkout wait")
+    max_wait_ms: float = Field(..., description="Longest checkout wait")
+
+
+class DatabasePoolStats(BaseModel):
+    """Pool statistics for both database engines"""
+
+    mode: str = Field(..., description="Active database mode (async or sync)")
+    pools: Dict[str, PoolStats]
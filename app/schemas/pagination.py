@@ -1,7 +1,14 @@
-from typing import Generic, List, Optional, TypeVar
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
 
 from pydantic import BaseModel, Field, field_validator
 
+from app.core.constants import PAGE_ORDER_KEYS, CountStrategy, PageOrder
+from app.core.exceptions import BadRequestException
+
 T = TypeVar("T")
 
 
@@ -18,6 +25,13 @@ class PageParams(BaseModel):
         description="Items per page (max 100)",
         json_schema_extra={"example": 20},
     )
+    cursor: Optional[str] = Field(
+        None, description="meta.next_cursor of the previous page; overrides page"
+    )
+    order: PageOrder = Field(PageOrder.ID, description="Sort order")
+    count_strategy: CountStrategy = Field(
+        CountStrategy.EXACT, description="How the total is counted"
+    )
 
     @field_validator("page")
     def validate_page(cls, v):
@@ -33,21 +47,75 @@ class PageParams(BaseModel):
             raise ValueError("Limit must be less than or equal to 100")
         return v
 
+    @property
+    def skip(self) -> int:
+        return (self.page - 1) * self.limit
+
+    def keyset(self) -> Tuple[PageOrder, Optional[Tuple]]:
+        """Sort order, and the sort key to continue after when given a cursor"""
+        if self.cursor is None:
+            return self.order, None
+        return decode_cursor(self.cursor)
+
+
+def encode_cursor(order: PageOrder, row: Any) -> str:
+    """Opaque cursor for the page after `row` in `order`"""
+    key = [getattr(row, name) for name in PAGE_ORDER_KEYS[order]]
+    key = [v.isoformat() if isinstance(v, datetime) else v for v in key]
+    raw = json.dumps([order.value, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[PageOrder, Tuple]:
+    """(order, sort key) of a cursor made by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        order, *key = json.loads(raw)
+        order = PageOrder(order)
+        if len(key) != len(PAGE_ORDER_KEYS[order]) or type(key[-1]) is not int:
+            raise ValueError
+        if order is PageOrder.CREATED_AT:
+            key[0] = datetime.fromisoformat(key[0])
+    except (binascii.Error, TypeError, ValueError):
+        raise BadRequestException(detail="Invalid pagination cursor")
+    return order, tuple(key)
+
+
+def next_page_cursor(
+    items: Sequence[Any], order: PageOrder, limit: int
+) -> Optional[str]:
+    """Cursor for the page after `items`, or None when it was the last page"""
+    if len(items) < limit:
+        return None
+    return encode_cursor(order, items[-1])
+
 
 class PageMetadata(BaseModel):
     """Pagination metadata"""
 
-    total: int = Field(
-        ..., description="Total number of items", json_schema_extra={"example": 42}
+    total: Optional[int] = Field(
+        ...,
+        description="Total number of items; null when not counted",
+        json_schema_extra={"example": 42},
     )
-    page: int = Field(
-        ..., description="Current page number", json_schema_extra={"example": 1}
+    count_strategy: CountStrategy = Field(
+        CountStrategy.EXACT, description="How total was counted"
+    )
+    page: Optional[int] = Field(
+        None,
+        description="Current page number; null for cursor pages",
+        json_schema_extra={"example": 1},
     )
     limit: int = Field(
         ..., description="Items per page", json_schema_extra={"example": 20}
     )
-    pages: int = Field(
-        ..., description="Total number of pages", json_schema_extra={"example": 3}
+    pages: Optional[int] = Field(
+        None,
+        description="Total number of pages; null for cursor pages or no total",
+        json_schema_extra={"example": 3},
+    )
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as cursor to get the next page; null on the last page"
     )
 
 
@@ -59,8 +127,66 @@ class PagedResponse(BaseModel, Generic[T]):
     error: Optional[str] = Field(None, description="Error message")
 
     @classmethod
-    def create(cls, items: List[T], total: int, page: int, limit: int):
+    def create(
+        cls,
+        items: List[T],
+        total: Optional[int],
+        page: int,
+        limit: int,
+        next_cursor: Optional[str] = None,
+        count_strategy: CountStrategy = CountStrategy.EXACT,
+    ):
         """Create a paged response"""
-        pages = (total + limit - 1) // limit if limit > 0 else 0
-        meta = PageMetadata(total=total, page=page, limit=limit, pages=pages)
+        pages = None
+        if total is not None:
+            pages = (total + limit - 1) // limit if limit > 0 else 0
+        meta = PageMetadata(
+            total=total,
+            count_strategy=count_strategy,
+            page=page,
+            limit=limit,
+            pages=pages,
+            next_cursor=next_cursor,
+        )
         return cls(data=items, meta=meta)
+
+    @classmethod
+    def create_keyset(
+        cls,
+        items: List[T],
+        total: Optional[int],
+        limit: int,
+        next_cursor: Optional[str],
+        count_strategy: CountStrategy = CountStrategy.EXACT,
+    ):
+        """Create a cursor-paged response, which has no page numbers"""
+        meta = PageMetadata(
+            total=total,
+            count_strategy=count_strategy,
+            limit=limit,
+            next_cursor=next_cursor,
+        )
+        return cls(data=items, meta=meta)
+
+    @classmethod
+    def from_params(
+        cls,
+        items: List[T],
+        total: Optional[int],
+        page_params: PageParams,
+        next_cursor: Optional[str],
+        count_strategy: CountStrategy = CountStrategy.EXACT,
+    ):
+        """Create whichever kind of page `page_params` asked for"""
+        if page_params.cursor is not None:
+            return cls.create_keyset(
+                items, total, page_params.limit, next_cursor, count_strategy
+            )
+        return cls.create(
+            items,
+            total,
+            page_params.page,
+            page_params.limit,
+            next_cursor,
+            count_strategy,
+        )
@@ -1,9 +1,16 @@
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, List, Literal, Optional, Tuple
 
 from geojson_pydantic import Point as GeoJSONPoint
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter, field_serializer, model_validator
+from typing_extensions import TypedDict
 
+from app.core.constants import (
+    MAX_BATCH_ORIGINS,
+    MAX_BULK_POINTS,
+    MAX_MATRIX_POINTS,
+    DistanceMethod,
+)
 from app.schemas.category import Category
 
 
@@ -59,10 +66,164 @@ class PointInDBBase(PointBase):
     updated_at: datetime
 
 
+class GeoJSONPointOut(TypedDict):
+    type: Literal["Point"]
+    coordinates: Tuple[float, float]
+
+
 class Point(PointInDBBase):
     coordinates: GeoJSONPoint
     category: Optional[Category] = None
 
+    @field_serializer("coordinates")
+    def serialize_coordinates(self, coordinates: GeoJSONPoint) -> GeoJSONPointOut:
+        """
+        The GeoJSON point as plain values, the same in every output format.
+
+        geojson_pydantic only drops a null bbox when writing JSON, and its
+        wrap serializer costs a Python round trip per point.
+        """
+        return {"type": "Point", "coordinates": coordinates.coordinates}
+
+    @classmethod
+    def from_row(cls, row, **extra):
+        """
+        Build from a PointRow without validating it.
+
+        Rows come straight from the database with the types the schema
+        declares, so model_construct only has to place them.
+        """
+        category = None
+        if row.category_name is not None:
+            category = Category.model_construct(
+                id=row.category_id,
+                name=row.category_name,
+                description=row.category_description,
+                color=row.category_color,
+            )
+        return cls.model_construct(
+            id=row.id,
+            name=row.name,
+            description=row.description,
+            category_id=row.category_id,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            coordinates=GeoJSONPoint.model_construct(
+                type="Point", coordinates=(row.lng, row.lat)
+            ),
+            category=category,
+            **extra,
+        )
+
 
 class NearbyPoint(Point):
     distance: float
+
+
+class ClusterCategory(BaseModel):
+    category_id: Optional[int] = None
+    count: int
+
+
+class PointCluster(BaseModel):
+    coordinates: GeoJSONPoint = Field(
+        ..., description="Centroid of the clustered points"
+    )
+    count: int = Field(..., description="Number of points in the cluster")
+    categories: List[ClusterCategory] = Field(
+        ..., description="Point counts per category, largest first"
+    )
+
+
+class NearestBatchOrigin(BaseModel):
+    lat: float = Field(..., ge=-90.0, le=90.0, description="Latitude coordinate")
+    lng: float = Field(..., ge=-180.0, le=180.0, description="Longitude coordinate")
+    k: int = Field(5, ge=1, le=100, description="Maximum number of results")
+    radius: Optional[float] = Field(
+        None,
+        gt=0,
+        le=100000,
+        description="Search radius in meters; omit for the k nearest at any distance",
+    )
+
+
+class NearestBatchRequest(BaseModel):
+    origins: List[NearestBatchOrigin] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_ORIGINS
+    )
+
+
+class NearestBatchResult(BaseModel):
+    index: int = Field(..., description="Position of the origin in the request")
+    lat: float
+    lng: float
+    points: List[NearbyPoint]
+
+
+Longitude = Annotated[float, Field(ge=-180.0, le=180.0)]
+Latitude = Annotated[float, Field(ge=-90.0, le=90.0)]
+
+
+class PointSet(BaseModel):
+    ids: Optional[List[int]] = Field(
+        None, min_length=1, max_length=MAX_MATRIX_POINTS, description="Point IDs"
+    )
+    coordinates: Optional[List[Tuple[Longitude, Latitude]]] = Field(
+        None,
+        min_length=1,
+        max_length=MAX_MATRIX_POINTS,
+        description="[lng, lat] pairs",
+    )
+
+    @model_validator(mode="after")
+    def one_kind(self) -> "PointSet":
+        if (self.ids is None) == (self.coordinates is None):
+            raise ValueError("Give either ids or coordinates")
+        return self
+
+
+class DistanceMatrixRequest(BaseModel):
+    sources: PointSet
+    destinations: PointSet
+    method: DistanceMethod = DistanceMethod.GEODESIC
+
+
+class PointUploadError(BaseModel):
+    row: int = Field(..., description="1-based position of the record in the upload")
+    error: str
+
+
+class PointUploadSummary(BaseModel):
+    received: int = Field(..., description="Records read from the upload")
+    inserted: int = Field(..., description="Points created")
+    failed: int = Field(..., description="Records rejected")
+    errors: List[PointUploadError] = Field(
+        ..., description="Why records were rejected; the first few only"
+    )
+
+
+class PointBulkUpdate(PointUpdate):
+    id: int = Field(..., description="ID of the point to update")
+
+
+class PointBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_POINTS)
+
+
+class PointBulkDeleteResult(BaseModel):
+    deleted: List[int]
+
+
+# Bulk bodies are validated straight from JSON, in one pass per request
+PointCreateList = TypeAdapter(
+    Annotated[List[PointCreate], Field(min_length=1, max_length=MAX_BULK_POINTS)]
+)
+PointBulkUpdateList = TypeAdapter(
+    Annotated[List[PointBulkUpdate], Field(min_length=1, max_length=MAX_BULK_POINTS)]
+)
+
+# Response serializers for lists of already-built schemas
+PointList = TypeAdapter(List[Point])
+NearbyPointList = TypeAdapter(List[NearbyPoint])
+NearestBatchResultList = TypeAdapter(List[NearestBatchResult])
+PointClusterList = TypeAdapter(List[PointCluster])
@@ -0,0 +1,31 @@
+from typing import Any, Generic, TypeVar
+
+from app.database import AsyncSessionRunner, SyncSessionRunner
+
+S = TypeVar("S")
+
+
+class AsyncServiceAdapter(Generic[S]):
+    """
+    Expose a service's public methods as coroutines.
+
+    Each call is handed to the request's session runner, so the same service
+    code serves both the async (asyncpg) and sync (psycopg2) database modes.
+    Endpoints annotate it as ``AsyncServiceAdapter[PointService]``: every
+    public method of the service, awaited.
+    """
+
+    def __init__(self, service: S, runner: AsyncSessionRunner | SyncSessionRunner):
+        self.service = service
+        self.runner = runner
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.service, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self.runner.run(attr, *args, **kwargs)
+
+        call.__name__ = name
+        return call
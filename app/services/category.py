@@ -1,38 +1,59 @@
 # app/services/category_service.py
 from typing import List, Optional
 
+from sqlalchemy.exc import IntegrityError
+
+from app.core.constants import CacheEntity, SQLState
 from app.core.exceptions import BadRequestException, NotFoundException
+from app.core.utils import sqlstate
 from app.repositories.category import CategoryRepository
 from app.schemas.category import Category as CategorySchema
 from app.schemas.category import CategoryCreate, CategoryUpdate
-from app.schemas.pagination import PagedResponse, PageParams
+from app.schemas.pagination import PagedResponse, PageParams, next_page_cursor
+from app.services.counts import PointCounts
+from app.services.invalidation import FLUSH, ChangeEvent, publish
+from app.services.query_cache import QueryCache
+from app.spatial.point_index import PointIndex
+from app.spatial.tiles import TileCache
 
 
 class CategoryService:
 
-    def __init__(self, category_repository: CategoryRepository):
+    def __init__(
+        self,
+        category_repository: CategoryRepository,
+        query_cache: Optional[QueryCache] = None,
+        tile_cache: Optional[TileCache] = None,
+        cluster_cache: Optional[TileCache] = None,
+        point_counts: Optional[PointCounts] = None,
+        point_index: Optional[PointIndex] = None,
+    ):
         self.category_repository = category_repository
+        self.query_cache = query_cache
+        self.tile_cache = tile_cache
+        self.cluster_cache = cluster_cache
+        self.point_counts = point_counts
+        self.point_index = point_index
 
     def create_category(self, *, category_in: CategoryCreate) -> CategorySchema:
         try:
-            if self.category_repository.name_exists(name=category_in.name):
-                raise BadRequestException(
-                    detail=f"Category with name '{category_in.name}' already exists"
-                )
-
             if category_in.color and not self._is_valid_hex_color(category_in.color):
                 raise BadRequestException(
                     detail="Color must be a valid hex color code (e.g., #FF5733)"
                 )
 
-            category = self.category_repository.create(
+            category = self.category_repository.insert_category(
                 obj_data=category_in.model_dump()
             )
-
+            # Built before commit, which would expire the RETURNING values
+            category_schema = self._category_to_schema(category)
+            self._publish(category_schema.id)
             self.category_repository.session.commit()
-            self.category_repository.session.refresh(category)
 
-            return self._category_to_schema(category)
+            return category_schema
+        except IntegrityError as e:
+            self.category_repository.session.rollback()
+            raise self._write_error(e, name=category_in.name)
         except Exception as e:
             self.category_repository.session.rollback()
             raise e
@@ -47,79 +68,104 @@ class CategoryService:
     def get_categories(
         self, *, page_params: PageParams
     ) -> PagedResponse[CategorySchema]:
-        # Calculate pagination offset
-        skip = (page_params.page - 1) * page_params.limit
+        # Offset page, or the page after the cursor
+        order, after = page_params.keyset()
 
         # Get total count and items
         total = self.category_repository.count()
         categories = self.category_repository.get_multi(
-            skip=skip, limit=page_params.limit
+            skip=page_params.skip, limit=page_params.limit, order=order, after=after
         )
 
         # Transform to schemas
         category_schemas = [self._category_to_schema(c) for c in categories]
 
         # Create paginated response
-        return PagedResponse.create(
+        return PagedResponse.from_params(
             items=category_schemas,
             total=total,
-            page=page_params.page,
-            limit=page_params.limit,
+            page_params=page_params,
+            next_cursor=next_page_cursor(categories, order, page_params.limit),
         )
 
     def update_category(
         self, *, category_id: int, category_in: CategoryUpdate
     ) -> CategorySchema:
         try:
-            category = self.category_repository.get(id=category_id)
-            if not category:
-                raise NotFoundException(
-                    detail=f"Category with ID {category_id} not found"
-                )
-
-            if category_in.name and category_in.name != category.name:
-                if self.category_repository.name_exists(
-                    name=category_in.name, exclude_id=category_id
-                ):
-                    raise BadRequestException(
-                        detail=f"Category with name '{category_in.name}' already exists"
-                    )
-
             if category_in.color and not self._is_valid_hex_color(category_in.color):
                 raise BadRequestException(
                     detail="Color must be a valid hex color code (e.g., #FF5733)"
                 )
 
-            update_data = category_in.model_dump(exclude_unset=True)
-            category = self.category_repository.update(
-                db_obj=category, obj_data=update_data
+            category = self.category_repository.update_category(
+                id=category_id, obj_data=category_in.model_dump(exclude_unset=True)
             )
-
+            if not category:
+                raise NotFoundException(
+                    detail=f"Category with ID {category_id} not found"
+                )
+            category_schema = self._category_to_schema(category)
+            self._publish(category_id)
             self.category_repository.session.commit()
-            self.category_repository.session.refresh(category)
-
-            return self._category_to_schema(category)
+        except IntegrityError as e:
+            self.category_repository.session.rollback()
+            raise self._write_error(e, name=category_in.name)
         except Exception as e:
             self.category_repository.session.rollback()
             raise e
 
+        # Cached point results carry the category's name, description and color
+        if self.query_cache is not None:
+            self.query_cache.clear()
+        return category_schema
+
     def delete_category(self, *, category_id: int) -> CategorySchema:
         try:
-            category = self.category_repository.get(id=category_id)
+            category = self.category_repository.delete_category(id=category_id)
             if not category:
                 raise NotFoundException(
                     detail=f"Category with ID {category_id} not found"
                 )
-
-            category = self.category_repository.delete(id=category_id)
-
+            category_schema = self._category_to_schema(category)
+            # Its points lose their category in the same transaction, which
+            # touches every point-derived cache: have all workers flush
+            publish(self.category_repository.session, [FLUSH])
             self.category_repository.session.commit()
-
-            return self._category_to_schema(category)
         except Exception as e:
             self.category_repository.session.rollback()
             raise e
 
+        self._invalidate_points()
+        return category_schema
+
+    def _publish(self, category_id: int) -> None:
+        """Tell other workers the category changed, once the write commits"""
+        publish(
+            self.category_repository.session,
+            [ChangeEvent(CacheEntity.CATEGORY, category_id)],
+        )
+
+    def _invalidate_points(self) -> None:
+        """Drop this worker's cached point data, after points changed category"""
+        for cache in (
+            self.query_cache,
+            self.tile_cache,
+            self.cluster_cache,
+            self.point_counts,
+        ):
+            if cache is not None:
+                cache.clear()
+        if self.point_index is not None:
+            self.point_index.mark_stale()
+
+    def _write_error(self, error: IntegrityError, *, name: Optional[str]) -> Exception:
+        """The client error behind a failed category write, else the error itself"""
+        if sqlstate(error) == SQLState.UNIQUE_VIOLATION:
+            return BadRequestException(
+                detail=f"Category with name '{name}' already exists"
+            )
+        return error
+
     def _category_to_schema(self, category) -> CategorySchema:
         return CategorySchema(
             id=category.id,
@@ -0,0 +1,220 @@
+"""
+Columnar point output: Arrow IPC streams and GeoParquet.
+
+Rows go into Arrow record batches a column at a time, straight from the
+database rows, with no per-row schema objects. Arrow streams carry lng/lat
+as float64 columns; GeoParquet carries a WKB geometry column built with
+NumPy, and the "geo" metadata that GeoPandas and DuckDB read.
+"""
+
+import json
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.core.constants import ExportFormat
+from app.core.encoders import ENCODERS, accepted_media_types
+from app.core.exceptions import BadRequestException
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - columnar output is optional
+    pa = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+TABLE_FORMATS = (ExportFormat.ARROW, ExportFormat.PARQUET)
+TABLE_MEDIA_TYPES = {
+    ExportFormat.ARROW: ARROW_MEDIA_TYPE,
+    ExportFormat.PARQUET: PARQUET_MEDIA_TYPE,
+}
+# Accept header values for each format
+_ACCEPTED_TABLE_TYPES = {
+    ARROW_MEDIA_TYPE: ExportFormat.ARROW,
+    "application/vnd.apache.arrow.file": ExportFormat.ARROW,
+    PARQUET_MEDIA_TYPE: ExportFormat.PARQUET,
+    "application/x-parquet": ExportFormat.PARQUET,
+}
+
+# One little-endian WKB Point: byte order, geometry type, x, y (21 bytes)
+_WKB_POINT = np.dtype([("order", "u1"), ("type", "<u4"), ("x", "<f8"), ("y", "<f8")])
+
+# GeoParquet column metadata; no crs means OGC:CRS84, i.e. lng/lat on WGS84
+GEO_METADATA = {
+    "version": "1.1.0",
+    "primary_column": "geometry",
+    "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"]}},
+}
+
+
+class PointTable(NamedTuple):
+    """Encoded columnar points, with the paging the JSON body would carry"""
+
+    content: bytes
+    media_type: str
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+def check_available() -> None:
+    if pa is None:
+        raise BadRequestException(
+            detail="Arrow and Parquet output are not available on this server"
+        )
+
+
+def table_format_for(accept: Optional[str]) -> Optional[ExportFormat]:
+    """
+    The columnar format an Accept header asks for, if it prefers one.
+
+    A columnar type has to outrank the JSON and MessagePack types in the
+    same header; otherwise the response stays a schema response.
+    """
+    if pa is None:
+        return None
+    best, best_q = None, 0.0
+    for media_type, q in accepted_media_types(accept):
+        if q > best_q and (
+            media_type in _ACCEPTED_TABLE_TYPES or media_type in ENCODERS
+        ):
+            best, best_q = _ACCEPTED_TABLE_TYPES.get(media_type), q
+    return best
+
+
+def point_schema(*, geometry: bool = False, distance: bool = False) -> "pa.Schema":
+    """
+    Arrow schema of exported points.
+
+    With `geometry` the position is a WKB column described by GeoParquet
+    metadata, otherwise lng and lat float64 columns.
+    """
+    fields = [
+        pa.field("id", pa.int32(), nullable=False),
+        pa.field("name", pa.string(), nullable=False),
+        pa.field("description", pa.string()),
+        pa.field("category_id", pa.int32()),
+        pa.field("created_at", pa.timestamp("us", tz="UTC")),
+        pa.field("updated_at", pa.timestamp("us", tz="UTC")),
+    ]
+    if geometry:
+        fields.append(pa.field("geometry", pa.binary(), nullable=False))
+    else:
+        fields.append(pa.field("lng", pa.float64(), nullable=False))
+        fields.append(pa.field("lat", pa.float64(), nullable=False))
+    if distance:
+        fields.append(pa.field("distance", pa.float64(), nullable=False))
+
+    schema = pa.schema(fields)
+    if geometry:
+        schema = schema.with_metadata({"geo": json.dumps(GEO_METADATA)})
+    return schema
+
+
+def format_schema(table_format: ExportFormat, *, distance: bool = False):
+    return point_schema(
+        geometry=table_format == ExportFormat.PARQUET, distance=distance
+    )
+
+
+def _wkb_points(lngs: Sequence[float], lats: Sequence[float]) -> "pa.Array":
+    """WKB Points as one binary array, without a Python object per point"""
+    count = len(lngs)
+    wkb = np.empty(count, dtype=_WKB_POINT)
+    wkb["order"] = 1
+    wkb["type"] = 1
+    wkb["x"] = lngs
+    wkb["y"] = lats
+    offsets = np.arange(0, (count + 1) * _WKB_POINT.itemsize, _WKB_POINT.itemsize)
+    return pa.Array.from_buffers(
+        pa.binary(),
+        count,
+        [None, pa.py_buffer(offsets.astype(np.int32)), pa.py_buffer(wkb)],
+    )
+
+
+def point_batch(
+    rows: Sequence,
+    schema: "pa.Schema",
+    distances: Optional[Sequence[float]] = None,
+) -> "pa.RecordBatch":
+    """
+    Rows with named point columns (PointRow or export rows) as a record batch.
+
+    The rows are transposed once and each column is converted in one call.
+    """
+    columns = dict(zip(rows[0]._fields, zip(*rows))) if rows else {}
+    arrays = []
+    for field in schema:
+        if field.name == "geometry":
+            arrays.append(_wkb_points(columns.get("lng", ()), columns.get("lat", ())))
+        elif field.name == "distance":
+            arrays.append(pa.array(distances or (), type=field.type))
+        else:
+            arrays.append(pa.array(columns.get(field.name, ()), type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Chunks:
+    """Write-only file object that collects what pyarrow writes to it"""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class TableWriter:
+    """
+    Arrow IPC or Parquet output written a batch at a time.
+
+    write() returns the bytes the batch produced, so a response can stream
+    them; close() returns the rest (the Parquet footer, or the end of stream
+    marker).
+    """
+
+    def __init__(self, table_format: ExportFormat, schema: "pa.Schema"):
+        check_available()
+        self.schema = schema
+        self._sink = _Chunks()
+        if table_format == ExportFormat.PARQUET:
+            self._writer = pq.ParquetWriter(self._sink, schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_stream(self._sink, schema)
+
+    def write(self, batch: "pa.RecordBatch") -> bytes:
+        if batch.num_rows:
+            self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def encode_points(
+    rows: Sequence,
+    table_format: ExportFormat,
+    *,
+    distances: Optional[Sequence[float]] = None,
+    total: Optional[int] = None,
+    next_cursor: Optional[str] = None,
+) -> PointTable:
+    """A complete Arrow stream or GeoParquet file of `rows`"""
+    schema = format_schema(table_format, distance=distances is not None)
+    writer = TableWriter(table_format, schema)
+    content = writer.write(point_batch(rows, schema, distances)) + writer.close()
+    return PointTable(content, TABLE_MEDIA_TYPES[table_format], total, next_cursor)
@@ -0,0 +1,58 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.config import settings
+
+# Point totals keyed by category_id, None for points without a category
+CategoryCounts = Dict[Optional[int], int]
+
+
+class PointCounts:
+    """
+    Per-worker point totals by category, for the cached count strategy.
+
+    Loaded with one GROUP BY and adjusted in place by this worker's writes;
+    the TTL bounds how long writes made by other workers can go unseen.
+    """
+
+    def __init__(self, *, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counts: Optional[CategoryCounts] = None
+        self._expires = 0.0
+
+    def get(
+        self, category_id: Optional[int], load: Callable[[], CategoryCounts]
+    ) -> int:
+        """Points in `category_id` (all points for None), loading counts if stale"""
+        with self._lock:
+            counts = self._counts if self._expires > time.monotonic() else None
+        if counts is None:
+            counts = load()
+            with self._lock:
+                self._counts = counts
+                self._expires = time.monotonic() + self.ttl
+        if category_id is None:
+            return sum(counts.values())
+        return counts.get(category_id, 0)
+
+    def add(self, category_id: Optional[int], delta: int = 1) -> None:
+        """Apply a committed insert (delta 1) or delete (delta -1)"""
+        with self._lock:
+            if self._counts is not None:
+                self._counts[category_id] = self._counts.get(category_id, 0) + delta
+
+    def move(self, old: Optional[int], new: Optional[int]) -> None:
+        """Apply a committed change of one point's category"""
+        if old != new:
+            self.add(old, -1)
+            self.add(new, 1)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts = None
+
+
+# One set of counters per worker process
+point_counts = PointCounts(ttl=settings.POINT_COUNT_CACHE_TTL)
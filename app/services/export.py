@@ -0,0 +1,162 @@
+"""Streamed exports of the whole points table"""
+
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Sequence
+
+from sqlalchemy.engine import Row
+
+from app.config import settings
+from app.core.constants import ExportFormat
+from app.core.exceptions import BadRequestException
+from app.repositories.point import PointRepository
+from app.services.columnar import (
+    TABLE_FORMATS,
+    TABLE_MEDIA_TYPES,
+    TableWriter,
+    check_available,
+    format_schema,
+    point_batch,
+)
+from app.spatial.queries import Envelope
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.GEOJSON: "application/geo+json",
+    **TABLE_MEDIA_TYPES,
+}
+
+# One read-only snapshot for the whole export, however long it streams
+EXPORT_TRANSACTION = {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+
+
+def export_bbox(
+    min_lng: Optional[float],
+    min_lat: Optional[float],
+    max_lng: Optional[float],
+    max_lat: Optional[float],
+) -> Optional[Envelope]:
+    """The export bbox, if any; min_lng > max_lng crosses the antimeridian"""
+    bounds = (min_lng, min_lat, max_lng, max_lat)
+    if all(v is None for v in bounds):
+        return None
+    if any(v is None for v in bounds):
+        raise BadRequestException(detail="Give all four bbox edges or none")
+    if min_lat >= max_lat:
+        raise BadRequestException(detail="min_lat must be below max_lat")
+    return bounds
+
+
+def export_media_type(export_format: ExportFormat) -> str:
+    """Content-Type of an export, once it is known the format can be written"""
+    if export_format in TABLE_FORMATS:
+        check_available()
+    return EXPORT_MEDIA_TYPES[export_format]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value: Dict[str, Any]) -> str:
+    return json.dumps(value, default=_json_default, separators=(",", ":"))
+
+
+def point_record(row: Row) -> Dict[str, Any]:
+    """An exported row shaped like the Point schema, without the nested category"""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "description": row.description,
+        "category_id": row.category_id,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "coordinates": {"type": "Point", "coordinates": [row.lng, row.lat]},
+    }
+
+
+def point_feature(row: Row) -> Dict[str, Any]:
+    """An exported row as a GeoJSON Feature"""
+    return {
+        "type": "Feature",
+        "id": row.id,
+        "geometry": {"type": "Point", "coordinates": [row.lng, row.lat]},
+        "properties": {
+            "name": row.name,
+            "description": row.description,
+            "category_id": row.category_id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+        },
+    }
+
+
+def encode_batch(
+    rows: Sequence[Row], export_format: ExportFormat, first: bool
+) -> bytes:
+    """One batch of rows as a chunk of the response body"""
+    if export_format == ExportFormat.GEOJSON:
+        body = ",".join(_dumps(point_feature(row)) for row in rows)
+        return (body if first else "," + body).encode()
+    return "".join(_dumps(point_record(row)) + "\n" for row in rows).encode()
+
+
+def _next_chunk(
+    batches: Iterator[Sequence[Row]],
+    export_format: ExportFormat,
+    first: bool,
+    writer: Optional[TableWriter],
+) -> Optional[bytes]:
+    rows = next(batches, None)
+    if rows is None:
+        return None
+    if writer is not None:
+        return writer.write(point_batch(rows, writer.schema))
+    return encode_batch(rows, export_format, first)
+
+
+async def stream_points(
+    open_runner: Callable,
+    *,
+    export_format: ExportFormat = ExportFormat.NDJSON,
+    category_id: Optional[int] = None,
+    bbox: Optional[Envelope] = None,
+    batch_size: int = settings.EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Encode every matching point as the body is sent.
+
+    The export reads from one REPEATABLE READ, read-only transaction, so rows
+    written while it streams are neither skipped nor duplicated. Each batch is
+    fetched and encoded on the session runner, one batch at a time; Arrow and
+    Parquet exports write each batch as a record batch or row group.
+    """
+    writer = None
+    if export_format in TABLE_FORMATS:
+        writer = TableWriter(export_format, format_schema(export_format))
+    async with open_runner(**EXPORT_TRANSACTION) as runner:
+        batches = PointRepository(runner.session).iter_export(
+            category_id=category_id, bbox=bbox, batch_size=batch_size
+        )
+        try:
+            if export_format == ExportFormat.GEOJSON:
+                yield b'{"type":"FeatureCollection","features":['
+            first = True
+            while True:
+                chunk = await runner.run(
+                    _next_chunk, batches, export_format, first, writer
+                )
+                if chunk is None:
+                    break
+                if chunk:
+                    yield chunk
+                first = False
+            if export_format == ExportFormat.GEOJSON:
+                yield b"]}"
+            if writer is not None:
+                yield await runner.run(writer.close)
+        finally:
+            # Releases the server-side cursor, also when the client disconnects
+            await runner.run(batches.close)
@@ -0,0 +1,262 @@
+"""
+Cross-worker cache invalidation over PostgreSQL LISTEN/NOTIFY.
+
+Services publish ChangeEvents with NOTIFY inside their write transaction, so
+other workers hear of a write only once it commits, and never of one that
+rolls back. Each worker listens on one connection and hands the events to
+the handlers registered for their entity. Notifications sent while a worker
+is not listening are lost, so every (re)connect runs the flush handlers.
+
+Publishing also bumps the written tables' data versions, which the HTTP
+ETags of read routes are derived from.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.constants import CacheEntity
+from app.models.category import Category
+from app.models.point import Point
+from app.repositories.data_version import DataVersionRepository
+from app.services.counts import PointCounts
+from app.services.query_cache import QueryCache
+from app.spatial.point_index import PointIndex
+from app.spatial.tiles import TileCache
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+# Tells this worker's own notifications apart; it invalidated locally already
+WORKER_ID = uuid.uuid4().hex
+
+# Seconds between reconnect attempts, doubling up to the maximum
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+# Seconds between checks that the listening connection is still alive
+HEALTH_CHECK_INTERVAL = 10.0
+
+Coords = Tuple[float, float]  # (lat, lng)
+
+# Tables whose data versions each entity's events bump
+VERSIONED_TABLES: Dict[CacheEntity, str] = {
+    CacheEntity.POINT: Point.__tablename__,
+    CacheEntity.CATEGORY: Category.__tablename__,
+}
+
+
+class ChangeEvent(NamedTuple):
+    """One committed change; coordinates are None where a point does not exist"""
+
+    entity: CacheEntity
+    id: Optional[int] = None
+    old: Optional[Coords] = None
+    new: Optional[Coords] = None
+    category_id: Optional[int] = None
+
+
+FLUSH = ChangeEvent(CacheEntity.ALL)
+
+
+def encode_events(events: Iterable[ChangeEvent]) -> Iterator[str]:
+    """NOTIFY payloads carrying `events`, each under MAX_PAYLOAD_BYTES"""
+    prefix = f'{{"origin":"{WORKER_ID}","events":['
+    batch: List[str] = []
+    size = len(prefix) + 2
+    for event in events:
+        item = json.dumps(
+            [event.entity.value, event.id, event.old, event.new, event.category_id],
+            separators=(",", ":"),
+        )
+        if batch and size + len(item) + 1 > MAX_PAYLOAD_BYTES:
+            yield prefix + ",".join(batch) + "]}"
+            batch, size = [], len(prefix) + 2
+        batch.append(item)
+        size += len(item) + 1
+    if batch:
+        yield prefix + ",".join(batch) + "]}"
+
+
+def decode_payload(payload: str) -> Tuple[str, List[ChangeEvent]]:
+    """(origin worker id, events) of a NOTIFY payload"""
+    message = json.loads(payload)
+    events = [
+        ChangeEvent(
+            CacheEntity(entity),
+            id,
+            tuple(old) if old is not None else None,
+            tuple(new) if new is not None else None,
+            category_id,
+        )
+        for entity, id, old, new, category_id in message["events"]
+    ]
+    return message["origin"], events
+
+
+def publish(session: Session, events: Iterable[ChangeEvent]) -> None:
+    """
+    NOTIFY other workers of `events` and bump their tables' data versions,
+    both taking effect when `session` commits.
+    """
+    events = list(events)
+    entities = {event.entity for event in events}
+    if CacheEntity.ALL in entities:
+        entities = set(VERSIONED_TABLES)
+    DataVersionRepository(session).bump(
+        VERSIONED_TABLES[entity] for entity in entities if entity in VERSIONED_TABLES
+    )
+
+    if not settings.CACHE_INVALIDATION_ENABLED:
+        return
+    for payload in encode_events(events):
+        session.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+class InvalidationBus:
+    """Fans change events out to the cache handlers registered for them"""
+
+    def __init__(self):
+        self._handlers: Dict[CacheEntity, List[Callable[[ChangeEvent], None]]] = {}
+        self._flush_handlers: List[Callable[[], None]] = []
+
+    def subscribe(
+        self, entity: CacheEntity, handler: Callable[[ChangeEvent], None]
+    ) -> None:
+        self._handlers.setdefault(entity, []).append(handler)
+
+    def on_flush(self, handler: Callable[[], None]) -> None:
+        """Run `handler` whenever events may have been missed"""
+        self._flush_handlers.append(handler)
+
+    def dispatch(self, event: ChangeEvent) -> None:
+        if event.entity is CacheEntity.ALL:
+            self.flush()
+            return
+        for handler in self._handlers.get(event.entity, ()):
+            try:
+                handler(event)
+            except Exception as exc:
+                logger.exception(f"Cache invalidation handler failed: {str(exc)}")
+
+    def flush(self) -> None:
+        for handler in self._flush_handlers:
+            try:
+                handler()
+            except Exception as exc:
+                logger.exception(f"Cache flush handler failed: {str(exc)}")
+
+    def handle_payload(self, payload: str) -> None:
+        """Dispatch a NOTIFY payload, unless this worker sent it"""
+        try:
+            origin, events = decode_payload(payload)
+        except (ValueError, KeyError, TypeError) as exc:
+            # Can't tell what changed, so assume anything did
+            logger.warning(f"Unreadable invalidation payload: {str(exc)}")
+            self.flush()
+            return
+        if origin == WORKER_ID:
+            return
+        for event in events:
+            self.dispatch(event)
+
+
+def listener_dsn() -> str:
+    """
+    Where to LISTEN: CACHE_INVALIDATION_DSN, else the application database.
+
+    LISTEN needs a session of its own, so behind PgBouncer in transaction
+    pooling mode CACHE_INVALIDATION_DSN has to point at PostgreSQL directly.
+    """
+    if settings.CACHE_INVALIDATION_DSN:
+        return settings.CACHE_INVALIDATION_DSN
+    url = make_url(settings.DATABASE_URI).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+async def run_invalidation_listener(bus: InvalidationBus, dsn: str) -> None:
+    """Listen for change events for the life of the worker"""
+
+    def on_notify(connection, pid: int, channel: str, payload: str) -> None:
+        bus.handle_payload(payload)
+
+    delay = RECONNECT_DELAY
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(CHANNEL, on_notify)
+            # Whatever committed while we were not listening went unheard
+            bus.flush()
+            delay = RECONNECT_DELAY
+            while True:
+                await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+                await connection.fetchval("SELECT 1")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning(
+                f"Cache invalidation listener disconnected, retrying in "
+                f"{delay:.0f}s: {str(exc)}"
+            )
+        finally:
+            if connection is not None and not connection.is_closed():
+                connection.terminate()
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def register_caches(
+    bus: InvalidationBus,
+    *,
+    tile_caches: Iterable[TileCache],
+    query_cache: QueryCache,
+    point_counts: PointCounts,
+    point_index: Optional[PointIndex] = None,
+) -> None:
+    """Keep this worker's caches in step with writes made by other workers"""
+    tile_caches = list(tile_caches)
+
+    def on_point(event: ChangeEvent) -> None:
+        for coords in {event.old, event.new} - {None}:
+            for cache in (*tile_caches, query_cache):
+                cache.invalidate_point(*coords)
+        if event.old is None:
+            point_counts.add(event.category_id, 1)
+        elif event.new is None:
+            point_counts.add(event.category_id, -1)
+        else:
+            # The previous category isn't in the event
+            point_counts.clear()
+        if point_index is not None:
+            if event.new is None:
+                point_index.remove(event.id)
+            else:
+                point_index.upsert(event.id, *event.new, event.category_id)
+
+    def on_flush() -> None:
+        for cache in (*tile_caches, query_cache, point_counts):
+            cache.clear()
+        if point_index is not None:
+            point_index.mark_stale()
+
+    bus.subscribe(CacheEntity.POINT, on_point)
+    # Cached point rows carry category names and colors; deletes, which also
+    # detach the category's points, are published as FLUSH instead
+    bus.subscribe(CacheEntity.CATEGORY, lambda event: query_cache.clear())
+    bus.on_flush(on_flush)
+
+
+# One bus per worker process
+invalidation_bus = InvalidationBus()
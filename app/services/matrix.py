@@ -0,0 +1,37 @@
+"""Geodesic distance matrices streamed as PostGIS computes them"""
+
+from typing import AsyncIterator, Callable, Iterator, List, Tuple
+
+from app.repositories.point import PointRepository
+from app.spatial.matrix import DistanceMatrix, block_rows, row_blocks
+
+
+async def stream_geodesic_matrix(
+    open_runner: Callable,
+    sources: List[Tuple[float, float]],
+    destinations: List[Tuple[float, float]],
+    encode: Callable[[DistanceMatrix], Iterator[bytes]],
+) -> AsyncIterator[bytes]:
+    """
+    Encode a geodesic matrix one block of rows at a time.
+
+    Each block is one query and is encoded on the session runner as soon as it
+    arrives, so the body starts with the first block and only one is held.
+    """
+    async with open_runner() as runner:
+        batches = PointRepository(runner.session).get_distance_matrix(
+            sources=sources,
+            destinations=destinations,
+            batch_rows=block_rows(len(destinations)),
+        )
+        chunks = encode(
+            DistanceMatrix(len(sources), len(destinations), row_blocks(batches))
+        )
+        try:
+            while True:
+                chunk = await runner.run(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await runner.run(chunks.close)
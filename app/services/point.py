@@ -1,167 +1,798 @@
 # app/services/point_service.py
-from typing import List, Optional, Tuple
+from typing import IO, Callable, Hashable, Iterable, List, Optional, Tuple, TypeVar
 
 from fastapi import HTTPException, status
-
+from sqlalchemy.exc import IntegrityError
+
+from app.core.constants import (
+    MAX_MATRIX_CELLS,
+    CacheEntity,
+    CountStrategy,
+    ExportFormat,
+    NearbyStrategy,
+    PageOrder,
+    SQLState,
+    UploadFormat,
+)
 from app.core.exceptions import BadRequestException, NotFoundException
-from app.core.utils import point_to_geojson
+from app.core.utils import point_to_geojson, run_blocking, sqlstate
 from app.repositories.category import CategoryRepository
-from app.repositories.point import PointRepository
-from app.schemas.pagination import PagedResponse, PageParams
-from app.schemas.point import NearbyPoint
+from app.repositories.point import PointRepository, PointRow
+from app.schemas.pagination import (
+    PagedResponse,
+    PageParams,
+    decode_cursor,
+    next_page_cursor,
+)
+from app.schemas.point import (
+    NearbyPoint,
+    NearestBatchOrigin,
+    NearestBatchResult,
+)
 from app.schemas.point import Point as PointSchema
-from app.schemas.point import PointCreate, PointUpdate
+from app.schemas.point import (
+    PointBulkUpdate,
+    PointCluster,
+    PointCreate,
+    PointSet,
+    PointUpdate,
+    PointUploadError,
+    PointUploadSummary,
+)
+from app.services.columnar import PointTable, encode_points
+from app.services.counts import PointCounts
+from app.services.invalidation import FLUSH, ChangeEvent, Coords, publish
+from app.services.query_cache import (
+    WORLD,
+    QueryCache,
+    normalize_coords,
+    polygon_area,
+)
+from app.services.upload import MAX_UPLOAD_ERRORS, RECORD_READERS, read_upload_chunk
+from app.spatial.clusters import (
+    DEFAULT_CLUSTER_RADIUS_PX,
+    MAX_CLUSTER_TILES,
+    assemble_clusters,
+    cells_per_tile,
+    cluster_cell_size,
+)
+from app.spatial.point_index import PointIndex, parse_polygon
+from app.spatial.queries import Envelope, radius_envelopes
+from app.spatial.tiles import (
+    TILE_BUFFER,
+    TILE_EXTENT,
+    Tile,
+    TileCache,
+    column_runs,
+    make_tile,
+    tile_buffer_meters,
+    tiles_for_bbox,
+)
+
+T = TypeVar("T")
 
 
 class PointService:
 
     def __init__(
-        self, point_repository: PointRepository, category_repository: CategoryRepository
+        self,
+        point_repository: PointRepository,
+        category_repository: CategoryRepository,
+        point_index: Optional[PointIndex] = None,
+        tile_cache: Optional[TileCache] = None,
+        cluster_cache: Optional[TileCache] = None,
+        point_counts: Optional[PointCounts] = None,
+        query_cache: Optional[QueryCache] = None,
     ):
         self.point_repository = point_repository
         self.category_repository = category_repository
+        self.point_index = point_index
+        self.tile_cache = tile_cache
+        self.cluster_cache = cluster_cache
+        self.point_counts = point_counts
+        self.query_cache = query_cache
 
     def create_point(self, *, point_in: PointCreate) -> PointSchema:
         try:
-            if point_in.category_id:
-                category = self.category_repository.get(id=point_in.category_id)
-                if not category:
-                    raise BadRequestException(
-                        detail=f"Category with ID {point_in.category_id} not found"
-                    )
-
-            point = self.point_repository.create_with_coordinates(
+            point = self.point_repository.insert_point(
                 name=point_in.name,
                 description=point_in.description,
                 latitude=point_in.latitude,
                 longitude=point_in.longitude,
                 category_id=point_in.category_id,
             )
-
+            # Built before commit, which would expire the RETURNING values
+            point_schema = self._point_to_schema(point)
+            self._publish([self._point_event(point_schema)])
             self.point_repository.session.commit()
-            self.point_repository.session.refresh(point)
+        except IntegrityError as e:
+            self.point_repository.session.rollback()
+            raise self._write_error(e, category_id=point_in.category_id)
+        except Exception as e:
+            self.point_repository.session.rollback()
+            raise e
 
-            return self._point_to_schema(point)
+        self._point_written(point_schema)
+        self._count_point(point_schema.category_id, 1)
+        return point_schema
+
+    def upload_points(
+        self, *, source: IO[bytes], upload_format: UploadFormat
+    ) -> PointUploadSummary:
+        """
+        Create every valid record of an upload in one transaction.
+
+        Invalid records are skipped and reported; an unreadable body rolls the
+        whole upload back. The point index picks new rows up on its next
+        refresh instead of taking them one by one.
+        """
+        categories = self.category_repository.get_id_map()
+        records = RECORD_READERS[upload_format](source)
+        received = 0
+        errors: List[PointUploadError] = []
+        failed = 0
+
+        try:
+            self.point_repository.create_upload_staging()
+            while True:
+                chunk = run_blocking(read_upload_chunk, records, categories)
+                if chunk is None:
+                    break
+                rows, chunk_errors = chunk
+                received += len(rows) + len(chunk_errors)
+                failed += len(chunk_errors)
+                errors.extend(chunk_errors[: MAX_UPLOAD_ERRORS - len(errors)])
+                if rows:
+                    self.point_repository.copy_to_upload_staging(rows=rows)
+
+            inserted = self.point_repository.merge_upload_staging()
+            if inserted:
+                # Too many points to list; other workers drop all their caches
+                self._publish([FLUSH])
+            self.point_repository.session.commit()
+        except ValueError as e:
+            self.point_repository.session.rollback()
+            raise BadRequestException(detail=f"Unreadable upload: {e}")
         except Exception as e:
             self.point_repository.session.rollback()
             raise e
 
+        if inserted:
+            for cache in (
+                self.tile_cache,
+                self.cluster_cache,
+                self.point_counts,
+                self.query_cache,
+            ):
+                if cache is not None:
+                    cache.clear()
+
+        return PointUploadSummary(
+            received=received, inserted=inserted, failed=failed, errors=errors
+        )
+
     def get_point(self, *, point_id: int) -> PointSchema:
-        point = self.point_repository.get(id=point_id)
-        if not point:
+        row = self.point_repository.get_row(id=point_id)
+        if not row:
             raise NotFoundException(detail=f"Point with ID {point_id} not found")
 
-        return self._point_to_schema(point)
+        return self._row_to_schema(row)
 
     def get_points(
         self, *, page_params: PageParams, category_id: Optional[int] = None
     ) -> PagedResponse[PointSchema]:
+        points, total, count_strategy, next_cursor = self._points_page(
+            page_params=page_params, category_id=category_id
+        )
+        point_schemas = [self._row_to_schema(p) for p in points]
 
-        skip = (page_params.page - 1) * page_params.limit
-
-        if category_id:
-            total = self.point_repository.count_by_category(category_id=category_id)
-        else:
-            total = self.point_repository.count()
-
-        if category_id:
-            points = self.point_repository.get_by_category(
-                category_id=category_id, skip=skip, limit=page_params.limit
-            )
-        else:
-            points = self.point_repository.get_multi(skip=skip, limit=page_params.limit)
-
-        point_schemas = [self._point_to_schema(p) for p in points]
-
-        return PagedResponse.create(
+        return PagedResponse.from_params(
             items=point_schemas,
             total=total,
-            page=page_params.page,
-            limit=page_params.limit,
+            page_params=page_params,
+            next_cursor=next_cursor,
+            count_strategy=count_strategy,
         )
 
+    def get_points_table(
+        self,
+        *,
+        page_params: PageParams,
+        table_format: ExportFormat,
+        category_id: Optional[int] = None,
+    ) -> PointTable:
+        points, total, _, next_cursor = self._points_page(
+            page_params=page_params, category_id=category_id
+        )
+        return encode_points(points, table_format, total=total, next_cursor=next_cursor)
+
     def update_point(self, *, point_id: int, point_in: PointUpdate) -> PointSchema:
         try:
-            point = self.point_repository.get(id=point_id)
-            if not point:
+            written = self.point_repository.update_point(
+                point_id=point_id,
+                values=point_in.model_dump(
+                    exclude={"latitude", "longitude"}, exclude_unset=True
+                ),
+                latitude=point_in.latitude,
+                longitude=point_in.longitude,
+            )
+            if written is None:
                 raise NotFoundException(detail=f"Point with ID {point_id} not found")
+            point, previous_lat, previous_lng, previous_category = written
 
-            if point_in.category_id is not None:
-                category = self.category_repository.get(id=point_in.category_id)
-                if not category and point_in.category_id is not None:
-                    raise BadRequestException(
-                        detail=f"Category with ID {point_in.category_id} not found"
-                    )
-
-            if point_in.latitude is not None and point_in.longitude is not None:
-                point = self.point_repository.update_coordinates(
-                    point_id=point_id,
-                    latitude=point_in.latitude,
-                    longitude=point_in.longitude,
-                )
-
-            update_data = point_in.model_dump(
-                exclude={"latitude", "longitude"}, exclude_unset=True
+            point_schema = self._point_to_schema(point)
+            self._publish(
+                [self._point_event(point_schema, (previous_lat, previous_lng))]
             )
-            if update_data:
-                point = self.point_repository.update(db_obj=point, obj_data=update_data)
-
             self.point_repository.session.commit()
-            self.point_repository.session.refresh(point)
-
-            return self._point_to_schema(point)
+        except IntegrityError as e:
+            self.point_repository.session.rollback()
+            raise self._write_error(e, category_id=point_in.category_id)
         except Exception as e:
             self.point_repository.session.rollback()
             raise e
 
+        self._point_written(point_schema, (previous_lat, previous_lng))
+        if self.point_counts is not None:
+            self.point_counts.move(previous_category, point_schema.category_id)
+        return point_schema
+
     def delete_point(self, *, point_id: int) -> PointSchema:
         try:
-            point = self.point_repository.get(id=point_id)
-            if not point:
+            point = self.point_repository.delete_point(point_id=point_id)
+            if point is None:
                 raise NotFoundException(detail=f"Point with ID {point_id} not found")
 
-            point = self.point_repository.delete(id=point_id)
+            point_schema = self._point_to_schema(point)
+            lng, lat = point_schema.coordinates.coordinates
+            self._publish(
+                [
+                    ChangeEvent(
+                        CacheEntity.POINT,
+                        point_id,
+                        (lat, lng),
+                        None,
+                        point_schema.category_id,
+                    )
+                ]
+            )
+            self.point_repository.session.commit()
+        except Exception as e:
+            self.point_repository.session.rollback()
+            raise e
+
+        if self.point_index is not None:
+            self.point_index.remove(point_id)
+        lng, lat = point_schema.coordinates.coordinates
+        self._invalidate_around((lat, lng))
+        self._count_point(point_schema.category_id, -1)
+        return point_schema
 
+    def bulk_create_points(self, *, points_in: List[PointCreate]) -> List[PointSchema]:
+        try:
+            self._check_categories(p.category_id for p in points_in)
+            ids = self.point_repository.bulk_create(
+                items=[p.model_dump() for p in points_in]
+            )
+            rows = self._points_by_ids(ids)
+            self._publish(self._row_event(row) for row in rows)
             self.point_repository.session.commit()
+        except Exception as e:
+            self.point_repository.session.rollback()
+            raise e
 
-            return self._point_to_schema(point)
+        point_schemas = [self._row_to_schema(row) for row in rows]
+        for point_schema in point_schemas:
+            self._point_written(point_schema)
+            self._count_point(point_schema.category_id, 1)
+        return point_schemas
+
+    def bulk_update_points(
+        self, *, points_in: List[PointBulkUpdate]
+    ) -> List[PointSchema]:
+        ids = [p.id for p in points_in]
+        self._check_unique(ids)
+        try:
+            previous_coords = self.point_repository.get_coordinates(ids=ids)
+            missing = sorted(set(ids) - previous_coords.keys())
+            if missing:
+                raise NotFoundException(detail=f"Points not found: {missing}")
+            self._check_categories(p.category_id for p in points_in)
+
+            items = []
+            for point_in in points_in:
+                item = point_in.model_dump(exclude_unset=True)
+                # As with single updates, coordinates only move as a pair
+                if point_in.latitude is None or point_in.longitude is None:
+                    item.pop("latitude", None)
+                    item.pop("longitude", None)
+                items.append(item)
+            self.point_repository.bulk_update(items=items)
+            rows = self._points_by_ids(ids)
+            self._publish(self._row_event(row, previous_coords[row.id]) for row in rows)
+            self.point_repository.session.commit()
         except Exception as e:
             self.point_repository.session.rollback()
             raise e
 
+        point_schemas = [self._row_to_schema(row) for row in rows]
+        for point_schema in point_schemas:
+            self._point_written(point_schema, previous_coords[point_schema.id])
+        # Previous categories aren't known here; recount on the next cached read
+        if self.point_counts is not None and any(
+            "category_id" in p.model_fields_set for p in points_in
+        ):
+            self.point_counts.clear()
+        return point_schemas
+
+    def bulk_delete_points(self, *, ids: List[int]) -> List[int]:
+        self._check_unique(ids)
+        try:
+            deleted = self.point_repository.bulk_delete(ids=ids)
+            missing = sorted(set(ids) - {row[0] for row in deleted})
+            if missing:
+                raise NotFoundException(detail=f"Points not found: {missing}")
+            self._publish(
+                ChangeEvent(CacheEntity.POINT, point_id, (lat, lng), None, category_id)
+                for point_id, lat, lng, category_id in deleted
+            )
+            self.point_repository.session.commit()
+        except Exception as e:
+            self.point_repository.session.rollback()
+            raise e
+
+        for point_id, lat, lng, category_id in deleted:
+            if self.point_index is not None:
+                self.point_index.remove(point_id)
+            self._invalidate_around((lat, lng))
+            self._count_point(category_id, -1)
+        return ids
+
     def get_nearby_points(
-        self, *, lat: float, lng: float, radius: float, limit: int = 100
+        self,
+        *,
+        lat: float,
+        lng: float,
+        radius: float,
+        limit: int = 100,
+        strategy: NearbyStrategy = NearbyStrategy.GEOGRAPHY,
     ) -> List[NearbyPoint]:
-        # Todo: enforcing max radius limits
-
-        point_distance_tuples = self.point_repository.get_nearby(
-            lat=lat, lng=lng, radius=radius, limit=limit
+        rows = self._nearby_rows(
+            lat=lat, lng=lng, radius=radius, limit=limit, strategy=strategy
         )
-
-        return [self._point_tuple_to_nearby_schema(t) for t in point_distance_tuples]
+        return [self._row_to_nearby_schema(row, distance) for row, distance in rows]
+
+    def get_nearby_table(
+        self,
+        *,
+        lat: float,
+        lng: float,
+        radius: float,
+        table_format: ExportFormat,
+        limit: int = 100,
+        strategy: NearbyStrategy = NearbyStrategy.GEOGRAPHY,
+    ) -> PointTable:
+        rows = self._nearby_rows(
+            lat=lat, lng=lng, radius=radius, limit=limit, strategy=strategy
+        )
+        return self._encode_with_distances(rows, table_format)
 
     def get_nearest_points(
         self, *, lat: float, lng: float, limit: int = 5
     ) -> List[NearbyPoint]:
-        point_distance_tuples = self.point_repository.get_nearest(
-            lat=lat, lng=lng, limit=limit
-        )
+        rows = self._nearest_rows(lat=lat, lng=lng, limit=limit)
+        return [self._row_to_nearby_schema(row, distance) for row, distance in rows]
+
+    def get_nearest_table(
+        self, *, lat: float, lng: float, table_format: ExportFormat, limit: int = 5
+    ) -> PointTable:
+        rows = self._nearest_rows(lat=lat, lng=lng, limit=limit)
+        return self._encode_with_distances(rows, table_format)
+
+    def get_nearest_batch(
+        self, *, origins: List[NearestBatchOrigin]
+    ) -> List[NearestBatchResult]:
+        """
+        Nearest points for many origins at once, grouped per origin.
+
+        Each origin gets its `k` nearest points, limited to `radius` meters
+        when one is given.
+        """
+        point_index = self._fresh_index()
+        if point_index is not None:
+            pairs_per_origin = [
+                (
+                    point_index.nearest(lat=o.lat, lng=o.lng, limit=o.k)
+                    if o.radius is None
+                    else point_index.nearby(
+                        lat=o.lat, lng=o.lng, radius=o.radius, limit=o.k
+                    )
+                )
+                for o in origins
+            ]
+            points = {
+                p.id: p
+                for p in self._points_by_ids(
+                    list({i for pairs in pairs_per_origin for i, _ in pairs})
+                )
+            }
+            grouped = [
+                [
+                    self._row_to_nearby_schema(points[i], distance)
+                    for i, distance in pairs
+                    if i in points
+                ]
+                for pairs in pairs_per_origin
+            ]
+        else:
+            grouped = [[] for _ in origins]
+            rows = self.point_repository.get_nearest_batch(
+                origins=[(o.lat, o.lng, o.k, o.radius) for o in origins]
+            )
+            for index, row, distance in rows:
+                grouped[index].append(self._row_to_nearby_schema(row, distance))
 
-        return [self._point_tuple_to_nearby_schema(t) for t in point_distance_tuples]
+        return [
+            NearestBatchResult.model_construct(
+                index=i, lat=o.lat, lng=o.lng, points=points
+            )
+            for i, (o, points) in enumerate(zip(origins, grouped))
+        ]
+
+    def get_matrix_coordinates(
+        self, *, sources: PointSet, destinations: PointSet
+    ) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+        """(lat, lng) of both sides of a distance matrix, within the size limit"""
+        src = self._point_set_coords(sources)
+        dst = self._point_set_coords(destinations)
+        if len(src) * len(dst) > MAX_MATRIX_CELLS:
+            raise BadRequestException(
+                detail=f"Distance matrices are limited to {MAX_MATRIX_CELLS} cells"
+            )
+        return src, dst
 
     def get_points_within_polygon(
-        self, *, polygon_wkt: str, limit: int = 100
+        self, *, polygon_wkt: str, limit: int = 100, cursor: Optional[str] = None
     ) -> List[PointSchema]:
+        points = self._within_rows(polygon_wkt=polygon_wkt, limit=limit, cursor=cursor)
+        return [self._row_to_schema(p) for p in points]
+
+    def get_within_polygon_table(
+        self,
+        *,
+        polygon_wkt: str,
+        table_format: ExportFormat,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> PointTable:
+        points = self._within_rows(polygon_wkt=polygon_wkt, limit=limit, cursor=cursor)
+        return encode_points(
+            points,
+            table_format,
+            next_cursor=next_page_cursor(points, PageOrder.ID, limit),
+        )
+
+    def get_tile(
+        self, *, z: int, x: int, y: int, category_id: Optional[int] = None
+    ) -> Tile:
+        if x >= 2**z or y >= 2**z:
+            raise BadRequestException(detail=f"Tile {z}/{x}/{y} does not exist")
+
+        if self.tile_cache is not None:
+            tile = self.tile_cache.get((z, x, y), category_id)
+            if tile is not None:
+                return tile
+
+        tile = make_tile(
+            self.point_repository.get_tile(
+                z=z,
+                x=x,
+                y=y,
+                category_id=category_id,
+                extent=TILE_EXTENT,
+                buffer=TILE_BUFFER,
+                buffer_meters=tile_buffer_meters(z),
+            )
+        )
+
+        if self.tile_cache is not None:
+            self.tile_cache.put((z, x, y), category_id, tile)
+        return tile
+
+    def get_clusters(
+        self,
+        *,
+        min_lng: float,
+        min_lat: float,
+        max_lng: float,
+        max_lat: float,
+        zoom: int,
+        radius: int = DEFAULT_CLUSTER_RADIUS_PX,
+        category_id: Optional[int] = None,
+    ) -> List[PointCluster]:
+        if min_lat >= max_lat:
+            raise BadRequestException(detail="min_lat must be less than max_lat")
+
+        tiles = tiles_for_bbox((min_lng, min_lat, max_lng, max_lat), zoom)
+        if len(tiles) > MAX_CLUSTER_TILES:
+            raise BadRequestException(
+                detail=f"Bounding box spans {len(tiles)} tiles at zoom {zoom}; "
+                f"zoom out or narrow it to at most {MAX_CLUSTER_TILES}"
+            )
+
+        variant = (category_id, cells_per_tile(radius))
+        clusters = {}
+        missing = []
+        for tile in tiles:
+            cached = (
+                self.cluster_cache.get(tile, variant)
+                if self.cluster_cache is not None
+                else None
+            )
+            if cached is None:
+                missing.append(tile)
+            else:
+                clusters[tile] = cached
+
+        # One query per run of adjacent uncached columns; a single bbox over
+        # all of them would span the whole world across the antimeridian
+        for run, (west, south, east, north) in column_runs(missing):
+            rows = self.point_repository.get_grid_clusters(
+                min_lng=west,
+                min_lat=south,
+                max_lng=east,
+                max_lat=north,
+                cell_size=cluster_cell_size(zoom, radius),
+                category_id=category_id,
+            )
+            # Points on a run's edge come back in both runs; each run keeps
+            # only the cells of its own tiles
+            computed = assemble_clusters(rows, zoom, radius)
+            for tile in run:
+                clusters[tile] = computed.get(tile, [])
+                if self.cluster_cache is not None:
+                    self.cluster_cache.put(tile, variant, clusters[tile])
+
+        return [cluster for tile in tiles for cluster in clusters[tile]]
+
+    def _points_page(
+        self, *, page_params: PageParams, category_id: Optional[int]
+    ) -> Tuple[List[PointRow], Optional[int], CountStrategy, Optional[str]]:
+        """(rows, total, count strategy used, next cursor) of one listing page"""
+        order, after = page_params.keyset()
+        page = dict(
+            skip=page_params.skip, limit=page_params.limit, order=order, after=after
+        )
+
+        total, count_strategy = self._count_points(
+            strategy=page_params.count_strategy, category_id=category_id
+        )
+
+        if category_id:
+            points = self.point_repository.get_by_category(
+                category_id=category_id, **page
+            )
+        else:
+            points = self.point_repository.get_multi(**page)
+
+        next_cursor = next_page_cursor(points, order, page_params.limit)
+        return points, total, count_strategy, next_cursor
+
+    def _nearby_rows(
+        self,
+        *,
+        lat: float,
+        lng: float,
+        radius: float,
+        limit: int,
+        strategy: NearbyStrategy,
+    ) -> List[Tuple[PointRow, float]]:
+        # Todo: enforcing max radius limits
+
+        def load() -> List[Tuple[PointRow, float]]:
+            point_index = self._fresh_index()
+            if point_index is not None:
+                return self._rows_from_index(
+                    point_index.nearby(lat=lat, lng=lng, radius=radius, limit=limit)
+                )
+            return self.point_repository.get_nearby(
+                lat=lat, lng=lng, radius=radius, limit=limit, strategy=strategy
+            )
+
+        return self._cached(
+            ("nearby", *normalize_coords(lat, lng), radius, limit, strategy),
+            load,
+            lambda rows: radius_envelopes(lat, lng, radius),
+        )
+
+    def _nearest_rows(
+        self, *, lat: float, lng: float, limit: int
+    ) -> List[Tuple[PointRow, float]]:
+        def load() -> List[Tuple[PointRow, float]]:
+            point_index = self._fresh_index()
+            if point_index is not None:
+                return self._rows_from_index(
+                    point_index.nearest(lat=lat, lng=lng, limit=limit)
+                )
+            return self.point_repository.get_nearest(lat=lat, lng=lng, limit=limit)
+
+        def area(rows: List[Tuple[PointRow, float]]) -> List[Envelope]:
+            # Short of `limit`, any new point anywhere joins the result
+            if len(rows) < limit:
+                return [WORLD]
+            return radius_envelopes(lat, lng, rows[-1][1])
+
+        return self._cached(("nearest", *normalize_coords(lat, lng), limit), load, area)
+
+    def _within_rows(
+        self, *, polygon_wkt: str, limit: int, cursor: Optional[str]
+    ) -> List[PointRow]:
         if not polygon_wkt.startswith("POLYGON"):
             raise BadRequestException(detail="Invalid polygon WKT format")
+        after_id = None
+        if cursor is not None:
+            order, key = decode_cursor(cursor)
+            if order is not PageOrder.ID:
+                raise BadRequestException(detail="Invalid pagination cursor")
+            (after_id,) = key
+
+        def load() -> List[PointRow]:
+            point_index = self._fresh_index()
+            polygon = parse_polygon(polygon_wkt) if point_index is not None else None
+            if polygon is not None:
+                ids = point_index.within_polygon(
+                    polygon=polygon, limit=limit, after_id=after_id
+                )
+                return self._points_by_ids(ids)
+            return self.point_repository.get_within_polygon(
+                polygon_wkt=polygon_wkt, limit=limit, after_id=after_id
+            )
+
+        return self._cached(
+            ("within", " ".join(polygon_wkt.split()), limit, after_id),
+            load,
+            lambda rows: polygon_area(polygon_wkt),
+        )
 
-        points = self.point_repository.get_within_polygon(
-            polygon_wkt=polygon_wkt, limit=limit
+    def _encode_with_distances(
+        self, rows: List[Tuple[PointRow, float]], table_format: ExportFormat
+    ) -> PointTable:
+        return encode_points(
+            [row for row, _ in rows],
+            table_format,
+            distances=[distance for _, distance in rows],
         )
 
-        return [self._point_to_schema(p) for p in points]
+    def _cached(
+        self,
+        key: Hashable,
+        load: Callable[[], T],
+        area: Callable[[T], List[Envelope]],
+    ) -> T:
+        """The cached result for `key`, else `load()` cached over `area` of it"""
+        if self.query_cache is None:
+            return load()
+        value = self.query_cache.get(key)
+        if value is None:
+            generation = self.query_cache.generation
+            value = load()
+            self.query_cache.put(key, value, area(value), generation)
+        return value
+
+    def _fresh_index(self) -> Optional[PointIndex]:
+        """The in-memory index, unless it is disabled, warming up or stale"""
+        if self.point_index is not None and self.point_index.is_fresh():
+            return self.point_index
+        return None
+
+    def _point_written(
+        self, point: PointSchema, previous_coords: Optional[Tuple[float, float]] = None
+    ) -> None:
+        """Apply a committed write to this worker's index and caches"""
+        lng, lat = point.coordinates.coordinates
+        if self.point_index is not None:
+            self.point_index.upsert(point.id, lat, lng, point.category_id)
+        self._invalidate_around((lat, lng))
+        if previous_coords is not None and previous_coords != (lat, lng):
+            self._invalidate_around(previous_coords)
+
+    def _count_point(self, category_id: Optional[int], delta: int) -> None:
+        """Apply a committed insert (1) or delete (-1) to this worker's counters"""
+        if self.point_counts is not None:
+            self.point_counts.add(category_id, delta)
+
+    def _count_points(
+        self, *, strategy: CountStrategy, category_id: Optional[int]
+    ) -> Tuple[Optional[int], CountStrategy]:
+        """The point total under `strategy`, and the strategy actually used"""
+        category_id = category_id or None
+        if strategy is CountStrategy.NONE:
+            return None, strategy
+        if strategy is CountStrategy.ESTIMATED:
+            total = self.point_repository.estimate_count(category_id=category_id)
+            return total, strategy
+        if strategy is CountStrategy.CACHED and self.point_counts is not None:
+            total = self.point_counts.get(
+                category_id, self.point_repository.count_by_categories
+            )
+            return total, strategy
+
+        if category_id is not None:
+            total = self.point_repository.count_by_category(category_id=category_id)
+        else:
+            total = self.point_repository.count()
+        return total, CountStrategy.EXACT
+
+    def _publish(self, events: Iterable[ChangeEvent]) -> None:
+        """Tell other workers about this transaction's writes, once it commits"""
+        publish(self.point_repository.session, events)
+
+    def _point_event(
+        self, point: PointSchema, old: Optional[Coords] = None
+    ) -> ChangeEvent:
+        lng, lat = point.coordinates.coordinates
+        return ChangeEvent(
+            CacheEntity.POINT, point.id, old, (lat, lng), point.category_id
+        )
+
+    def _row_event(self, row: PointRow, old: Optional[Coords] = None) -> ChangeEvent:
+        return ChangeEvent(
+            CacheEntity.POINT, row.id, old, (row.lat, row.lng), row.category_id
+        )
+
+    def _invalidate_around(self, coords: Tuple[float, float]) -> None:
+        """Drop cached tiles, clusters and query results around a changed point"""
+        for cache in (self.tile_cache, self.cluster_cache, self.query_cache):
+            if cache is not None:
+                cache.invalidate_point(*coords)
+
+    def _check_categories(self, category_ids: Iterable[Optional[int]]) -> None:
+        """Raise if any of the given category ids does not exist"""
+        wanted = {category_id for category_id in category_ids if category_id}
+        missing = sorted(wanted - self.category_repository.get_existing_ids(ids=wanted))
+        if missing:
+            raise BadRequestException(detail=f"Categories not found: {missing}")
+
+    def _write_error(
+        self, error: IntegrityError, *, category_id: Optional[int]
+    ) -> Exception:
+        """The client error behind a failed point write, else the error itself"""
+        if sqlstate(error) == SQLState.FOREIGN_KEY_VIOLATION:
+            return BadRequestException(
+                detail=f"Category with ID {category_id} not found"
+            )
+        return error
+
+    def _check_unique(self, ids: List[int]) -> None:
+        if len(set(ids)) != len(ids):
+            raise BadRequestException(detail="Point IDs must not repeat")
+
+    def _point_set_coords(self, point_set: PointSet) -> List[Tuple[float, float]]:
+        """(lat, lng) of each member of a point set, in request order"""
+        if point_set.coordinates is not None:
+            return [(lat, lng) for lng, lat in point_set.coordinates]
+
+        coords = self.point_repository.get_coordinates(ids=list(set(point_set.ids)))
+        missing = sorted(set(point_set.ids) - coords.keys())
+        if missing:
+            raise NotFoundException(detail=f"Points not found: {missing}")
+        return [coords[point_id] for point_id in point_set.ids]
+
+    def _points_by_ids(self, ids: List[int]) -> List[PointRow]:
+        """Load points by primary key, keeping the order of `ids`"""
+        by_id = {p.id: p for p in self.point_repository.get_by_ids(ids=ids)}
+        # Points deleted since the index last synced are skipped
+        return [by_id[point_id] for point_id in ids if point_id in by_id]
+
+    def _rows_from_index(
+        self, pairs: List[Tuple[int, float]]
+    ) -> List[Tuple[PointRow, float]]:
+        distances = dict(pairs)
+        points = self._points_by_ids([point_id for point_id, _ in pairs])
+        return [(p, distances[p.id]) for p in points]
 
     def _point_to_schema(self, point) -> PointSchema:
+        """Schema of a Point loaded through the ORM, as the write paths return"""
         data = {
             "id": point.id,
             "name": point.name,
@@ -182,15 +813,8 @@ class PointService:
 
         return PointSchema(**data)
 
-    def _point_tuple_to_nearby_schema(self, point_tuple) -> NearbyPoint:
-        """Convert a (Point, distance) tuple to a NearbyPoint schema"""
-        point, distance = point_tuple
-
-        # First convert to standard point schema
-        point_data = self._point_to_schema(point).model_dump()
-
-        # Add distance
-        point_data["distance"] = distance
+    def _row_to_schema(self, row: PointRow) -> PointSchema:
+        return PointSchema.from_row(row)
 
-        # Create NearbyPoint
-        return NearbyPoint(**point_data)
+    def _row_to_nearby_schema(self, row: PointRow, distance: float) -> NearbyPoint:
+        return NearbyPoint.from_row(row, distance=distance)
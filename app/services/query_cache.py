@@ -0,0 +1,179 @@
+"""
+Per-worker cache of spatial query results.
+
+Entries are keyed by normalized query parameters and record the area their
+result depends on, as lng/lat envelopes: the search circle for nearby, the
+polygon's bbox for within, and the circle out to the furthest result for
+nearest. A write evicts only the entries whose area contains the point's old
+or new position; the TTL bounds how long writes made by other workers can go
+unseen.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+import shapely
+from shapely.errors import ShapelyError
+
+from app.config import settings
+from app.spatial.queries import Envelope
+
+# Coordinates are snapped to this many decimals (about 0.1 m) before querying,
+# so requests that differ only in noise share one entry
+COORD_DECIMALS = 6
+
+WORLD: Envelope = (-180.0, -90.0, 180.0, 90.0)
+
+# Side of the grid cells entries are indexed by, in degrees
+_CELL_DEGREES = 1.0
+# Entries spanning more cells than this are checked on every write instead
+_MAX_CELLS = 64
+
+Cell = Tuple[int, int]
+# (value, expiry, area, grid cells or None for wide entries)
+_Entry = Tuple[Any, float, List[Envelope], Optional[Set[Cell]]]
+
+
+def normalize_coords(lat: float, lng: float) -> Tuple[float, float]:
+    """lat/lng as rounded for a cache key; queries keep the exact values"""
+    return round(lat, COORD_DECIMALS) + 0.0, round(lng, COORD_DECIMALS) + 0.0
+
+
+def polygon_area(polygon_wkt: str) -> List[Envelope]:
+    """The bbox of a WKT polygon, or the whole world when it can't be read"""
+    try:
+        polygon = shapely.from_wkt(polygon_wkt)
+    except (ShapelyError, ValueError):
+        return [WORLD]
+    if polygon.is_empty:
+        return [WORLD]
+    return [polygon.bounds]
+
+
+def _cell(lng: float, lat: float) -> Cell:
+    cells_x = int(360 / _CELL_DEGREES)
+    cells_y = int(180 / _CELL_DEGREES)
+    return (
+        min(int(math.floor((lng + 180) / _CELL_DEGREES)), cells_x - 1),
+        min(int(math.floor((lat + 90) / _CELL_DEGREES)), cells_y - 1),
+    )
+
+
+def _cells(area: List[Envelope]) -> Optional[Set[Cell]]:
+    """Grid cells an area touches, or None when there are too many to index"""
+    cells: Set[Cell] = set()
+    for min_lng, min_lat, max_lng, max_lat in area:
+        x_lo, y_lo = _cell(min_lng, min_lat)
+        x_hi, y_hi = _cell(max_lng, max_lat)
+        if len(cells) + (x_hi - x_lo + 1) * (y_hi - y_lo + 1) > _MAX_CELLS:
+            return None
+        cells.update(
+            (x, y) for x in range(x_lo, x_hi + 1) for y in range(y_lo, y_hi + 1)
+        )
+    return cells
+
+
+def _contains(area: List[Envelope], lat: float, lng: float) -> bool:
+    return any(
+        min_lng <= lng <= max_lng and min_lat <= lat <= max_lat
+        for min_lng, min_lat, max_lng, max_lat in area
+    )
+
+
+class QueryCache:
+    """
+    Count-bounded LRU of query results with a TTL.
+
+    `generation` changes on every eviction by a write; a result loaded before
+    a write is not stored after it (see put).
+    """
+
+    def __init__(self, *, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._by_cell: Dict[Cell, Set[Hashable]] = {}
+        # Entries too large for the grid, checked against every write
+        self._wide: Set[Hashable] = set()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(
+        self, key: Hashable, value: Any, area: List[Envelope], generation: int
+    ) -> None:
+        """
+        Store `value`, which depends on the points inside `area`.
+
+        `generation` is the one read before the query ran; if a write has
+        evicted since, the value may predate it and is dropped.
+        """
+        cells = _cells(area)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._discard(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, area, cells)
+            if cells is None:
+                self._wide.add(key)
+            else:
+                for cell in cells:
+                    self._by_cell.setdefault(cell, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_point(self, lat: float, lng: float) -> None:
+        """Drop cached results whose area contains a point at lat/lng"""
+        with self._lock:
+            self.generation += 1
+            candidates = self._by_cell.get(_cell(lng, lat), set()) | self._wide
+            for key in candidates:
+                if _contains(self._entries[key][2], lat, lng):
+                    self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_cell.clear()
+            self._wide.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, key: Hashable) -> None:
+        """Remove one entry; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        cells = entry[3]
+        if cells is None:
+            self._wide.discard(key)
+            return
+        for cell in cells:
+            keys = self._by_cell[cell]
+            keys.discard(key)
+            if not keys:
+                del self._by_cell[cell]
+
+
+# One cache per worker process
+query_cache = QueryCache(
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES, ttl=settings.QUERY_CACHE_TTL
+)
@@ -0,0 +1,365 @@
+"""
+Bulk point uploads.
+
+The request body is spooled (decompressing gzip on the fly), parsed into
+records, validated a chunk at a time with NumPy and handed to the repository,
+which COPYs each chunk into a staging table and merges it into points.
+"""
+
+import codecs
+import csv
+import io
+import itertools
+import json
+import tempfile
+import zlib
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from fastapi import Request
+
+from app.config import settings
+from app.core.constants import UploadFormat
+from app.core.exceptions import (
+    BadRequestException,
+    PayloadTooLargeException,
+    UnsupportedMediaTypeException,
+)
+from app.schemas.point import PointUploadError
+
+# Records validated and COPYed per round trip
+UPLOAD_CHUNK_ROWS = 10000
+# Uploads larger than this are spooled to disk instead of memory
+UPLOAD_SPOOL_BYTES = 16 * 1024 * 1024
+# Rejected records listed in the summary; the rest are only counted
+MAX_UPLOAD_ERRORS = 100
+
+_READ_SIZE = 64 * 1024
+_GZIP_MAGIC = b"\x1f\x8b"
+
+UPLOAD_MEDIA_TYPES = {
+    "text/csv": UploadFormat.CSV,
+    "application/x-ndjson": UploadFormat.NDJSON,
+    "application/geo+json": UploadFormat.GEOJSON,
+    "application/json": UploadFormat.GEOJSON,
+}
+
+# (row, fields) for a readable record, (row, reason) for one that is not
+Record = Tuple[int, Union[Dict[str, Any], str]]
+# (upload_row, name, description, lng, lat, category_id), as staged
+StagedRow = Tuple[int, str, Optional[str], float, float, Optional[int]]
+
+
+def upload_format_for(content_type: Optional[str]) -> UploadFormat:
+    """The upload format named by a Content-Type header"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in UPLOAD_MEDIA_TYPES:
+        raise UnsupportedMediaTypeException(
+            detail="Send text/csv, application/x-ndjson or application/geo+json, "
+            "or pass ?format="
+        )
+    return UPLOAD_MEDIA_TYPES[media_type]
+
+
+class _GzipDecoder:
+    """Incremental gunzip of a body of one or more gzip members"""
+
+    def __init__(self, max_output: int):
+        self.max_output = max_output
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        # Stop once the output passes max_output, so a gzip bomb can't outgrow it
+        output = bytearray()
+        while data and len(output) <= self.max_output:
+            if self._decompressor.eof:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            output += self._decompressor.decompress(
+                data, self.max_output + 1 - len(output)
+            )
+            if self._decompressor.eof:
+                data = self._decompressor.unused_data
+            else:
+                data = self._decompressor.unconsumed_tail
+        return bytes(output)
+
+    def finish(self) -> None:
+        if not self._decompressor.eof:
+            raise zlib.error("incomplete or truncated stream")
+
+
+async def spool_upload(request: Request) -> IO[bytes]:
+    """
+    Copy the request body to a spooled temporary file, gunzipping it if needed.
+
+    Bodies are gzip-decoded when sent with Content-Encoding: gzip or when their
+    first bytes are the gzip magic number.
+    """
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    if encoding not in ("identity", "gzip"):
+        raise UnsupportedMediaTypeException(
+            detail=f"Unsupported Content-Encoding {encoding}"
+        )
+
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    decoder = None
+    started = False
+    size = 0
+    try:
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            if not started:
+                # Only the start of the body says whether it is gzip
+                started = True
+                if encoding == "gzip" or chunk.startswith(_GZIP_MAGIC):
+                    decoder = _GzipDecoder(settings.UPLOAD_MAX_BYTES)
+            if decoder is not None:
+                chunk = decoder.decompress(chunk)
+            size += len(chunk)
+            if size > settings.UPLOAD_MAX_BYTES:
+                raise PayloadTooLargeException(
+                    detail=f"Uploads are limited to {settings.UPLOAD_MAX_BYTES} bytes"
+                )
+            spool.write(chunk)
+        if decoder is not None:
+            decoder.finish()
+    except zlib.error as e:
+        spool.close()
+        raise BadRequestException(detail=f"Invalid gzip body: {e}")
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iter_csv_records(source: IO[bytes]) -> Iterator[Record]:
+    """Records of a CSV upload with a header row"""
+    reader = csv.DictReader(io.TextIOWrapper(source, encoding="utf-8-sig", newline=""))
+    missing = {"name", "latitude", "longitude"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV header is missing {', '.join(sorted(missing))}")
+    try:
+        for row, fields in enumerate(reader, start=1):
+            # Empty cells mean "not given"
+            yield row, {key: value for key, value in fields.items() if value != ""}
+    except csv.Error as e:
+        raise ValueError(f"CSV line {reader.line_num}: {e}") from None
+
+
+def iter_ndjson_records(source: IO[bytes]) -> Iterator[Record]:
+    """Records of a newline-delimited JSON upload; blank lines are skipped"""
+    row = 0
+    for line in source:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            yield row, "invalid JSON"
+            continue
+        yield row, fields if isinstance(fields, dict) else "expected a JSON object"
+
+
+class _JsonStream:
+    """Just enough of an incremental JSON reader to walk a FeatureCollection"""
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, source: IO[bytes]):
+        self.source = source
+        self.text = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.source.read(_READ_SIZE)
+        self.eof = not data
+        self.buffer = self.buffer[self.pos :] + self.text.decode(data, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or "" at the end of the input"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} in GeoJSON")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise ValueError("truncated or invalid GeoJSON") from None
+            # A number may continue past the end of the buffer
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_geojson_records(source: IO[bytes]) -> Iterator[Record]:
+    """Records of a FeatureCollection, read one feature at a time"""
+    stream = _JsonStream(source)
+    stream.expect("{")
+    has_features = False
+    while stream.peek() != "}":
+        key = stream.value()
+        stream.expect(":")
+        if key == "features":
+            has_features = True
+            stream.expect("[")
+            row = 0
+            while stream.peek() != "]":
+                row += 1
+                yield row, _feature_fields(stream.value())
+                if stream.peek() == ",":
+                    stream.pos += 1
+            stream.pos += 1
+        elif stream.value() != "FeatureCollection" and key == "type":
+            raise ValueError("expected a GeoJSON FeatureCollection")
+        if stream.peek() == ",":
+            stream.pos += 1
+    stream.expect("}")
+    if not has_features:
+        raise ValueError("GeoJSON has no features")
+
+
+def _feature_fields(feature: Any) -> Union[Dict[str, Any], str]:
+    if not isinstance(feature, dict) or feature.get("type") != "Feature":
+        return "expected a GeoJSON Feature"
+    geometry = feature.get("geometry") or {}
+    coordinates = geometry.get("coordinates")
+    if (
+        geometry.get("type") != "Point"
+        or not isinstance(coordinates, list)
+        or len(coordinates) < 2
+    ):
+        return "geometry must be a Point"
+    fields = dict(feature.get("properties") or {})
+    fields["longitude"], fields["latitude"] = coordinates[:2]
+    return fields
+
+
+RECORD_READERS = {
+    UploadFormat.CSV: iter_csv_records,
+    UploadFormat.NDJSON: iter_ndjson_records,
+    UploadFormat.GEOJSON: iter_geojson_records,
+}
+
+
+def _floats(values: List[Any]) -> np.ndarray:
+    """Values as float64, NaN where they are missing or not numbers"""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError, OverflowError):
+        out = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError, OverflowError):
+                pass
+        return out
+
+
+def _category_ids(
+    fields: List[Dict[str, Any]], categories: Dict[str, int]
+) -> np.ndarray:
+    """category_id, or the id of the named category; 0 when absent, -1 when invalid"""
+    ids = np.zeros(len(fields), dtype=np.int64)
+    for i, record in enumerate(fields):
+        if record.get("category_id") is not None:
+            try:
+                ids[i] = int(record["category_id"])
+            except (TypeError, ValueError, OverflowError):
+                ids[i] = -1
+        elif record.get("category") is not None:
+            ids[i] = categories.get(record["category"], -1)
+    return ids
+
+
+def validate_records(
+    records: List[Record], categories: Dict[str, int]
+) -> Tuple[List[StagedRow], List[PointUploadError]]:
+    """Split a chunk of records into rows to stage and per-record errors"""
+    rows = [row for row, _ in records]
+    fields = [r if isinstance(r, dict) else {} for _, r in records]
+    names = [f.get("name") for f in fields]
+    descriptions = [f.get("description") for f in fields]
+    lats = _floats([f.get("latitude") for f in fields])
+    lngs = _floats([f.get("longitude") for f in fields])
+    category_ids = _category_ids(fields, categories)
+
+    name_lengths = np.fromiter(
+        (len(n) if isinstance(n, str) else -1 for n in names), np.int64, len(names)
+    )
+    known_ids = np.fromiter(categories.values(), np.int64, len(categories))
+    checks = [
+        (name_lengths < 1, "name must be a non-empty string"),
+        (name_lengths > 100, "name must be at most 100 characters"),
+        (
+            np.fromiter(
+                (d is not None and not isinstance(d, str) for d in descriptions),
+                bool,
+                len(descriptions),
+            ),
+            "description must be a string",
+        ),
+        (~(np.abs(lats) <= 90), "latitude must be a number between -90 and 90"),
+        (~(np.abs(lngs) <= 180), "longitude must be a number between -180 and 180"),
+        (
+            (category_ids != 0) & ~np.isin(category_ids, known_ids),
+            "unknown category",
+        ),
+    ]
+
+    # Index of the first failed check per record, -1 when all pass
+    failed = np.full(len(records), -1)
+    for index in reversed(range(len(checks))):
+        failed[checks[index][0]] = index
+
+    staged, errors = [], []
+    for i, (row, record) in enumerate(records):
+        if isinstance(record, str):
+            errors.append(PointUploadError(row=row, error=record))
+        elif failed[i] >= 0:
+            errors.append(PointUploadError(row=row, error=checks[failed[i]][1]))
+        else:
+            staged.append(
+                (
+                    rows[i],
+                    names[i],
+                    descriptions[i] or None,
+                    float(lngs[i]),
+                    float(lats[i]),
+                    int(category_ids[i]) or None,
+                )
+            )
+    return staged, errors
+
+
+def read_upload_chunk(
+    records: Iterator[Record], categories: Dict[str, int]
+) -> Optional[Tuple[List[StagedRow], List[PointUploadError]]]:
+    """Parse and validate the next chunk of records; None when there are no more"""
+    chunk = list(itertools.islice(records, UPLOAD_CHUNK_ROWS))
+    if not chunk:
+        return None
+    return validate_records(chunk, categories)
@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from typing import List, Optional
 
 from app.config import settings
+from app.core.constants import CacheEntity
 from app.core.exceptions import (
     AuthenticationException,
     BadRequestException,
@@ -15,6 +16,7 @@ from app.schemas.pagination import PagedResponse, PageParams
 from app.schemas.user import Token, TokenData
 from app.schemas.user import User as UserSchema
 from app.schemas.user import UserCreate, UserUpdate
+from app.services.invalidation import ChangeEvent, publish
 
 
 class UserService:
@@ -39,6 +41,9 @@ class UserService:
                     user_in.is_superuser if user_in.is_superuser is not None else False
                 ),
             )
+            # Assigns the id the event carries
+            self.user_repository.session.flush()
+            self._publish(user.id)
 
             self.user_repository.session.commit()
             self.user_repository.session.refresh(user)
@@ -103,6 +108,7 @@ class UserService:
                 # Todo: Password update implementation will need to be added to UserRepository
                 pass
 
+            self._publish(user_id)
             self.user_repository.session.commit()
             self.user_repository.session.refresh(user)
 
@@ -118,6 +124,7 @@ class UserService:
                 raise NotFoundException(detail=f"User with ID {user_id} not found")
 
             user = self.user_repository.delete(id=user_id)
+            self._publish(user_id)
 
             self.user_repository.session.commit()
 
@@ -152,6 +159,10 @@ class UserService:
         blacklist_token(token_str)
         return True
 
+    def _publish(self, user_id: int) -> None:
+        """Tell other workers the user changed, once the write commits"""
+        publish(self.user_repository.session, [ChangeEvent(CacheEntity.USER, user_id)])
+
     def _user_to_schema(self, user) -> UserSchema:
         """Convert a User model to a User schema"""
         return UserSchema(
@@ -0,0 +1,36 @@
+"""
+Canonical /points/nearby circles, so near-identical GPS queries share a URL.
+
+The center is snapped to a lat/lng grid, and the radius grows by however far
+the center moved and is then rounded up to a bucket. The canonical circle
+therefore covers the requested one. Its result holds every point the exact
+query would return, unless `limit` cuts it short. The edge or the client
+filters that result back down to the exact circle.
+"""
+
+from typing import Iterable, Tuple
+
+from app.spatial.point_index import haversine
+
+Circle = Tuple[float, float, float]  # (lat, lng, radius in meters)
+
+# Haversine runs on a sphere and PostGIS on the spheroid; pad the distance
+# the center moved so the canonical circle still covers the exact one
+_SPHEROID_MARGIN = 1.01
+
+
+def canonical_circle(
+    lat: float, lng: float, radius: float, *, decimals: int, buckets: Iterable[float]
+) -> Circle:
+    """
+    The shared circle covering lat/lng/radius. If no bucket is large enough,
+    the circle is returned as it was given.
+    """
+    canonical_lat = round(lat, decimals) + 0.0
+    canonical_lng = round(lng, decimals) + 0.0
+    moved = float(haversine(lat, lng, canonical_lat, canonical_lng))
+    needed = radius + moved * _SPHEROID_MARGIN
+    for bucket in sorted(buckets):
+        if bucket >= needed:
+            return canonical_lat, canonical_lng, float(bucket)
+    return lat, lng, radius
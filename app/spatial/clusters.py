@@ -0,0 +1,82 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from geojson_pydantic import Point as GeoJSONPoint
+
+from app.config import settings
+from app.schemas.point import ClusterCategory, PointCluster
+from app.spatial.tiles import (
+    TILE_SIZE_PX,
+    WEB_MERCATOR_HALF_WIDTH,
+    TileCache,
+    TileKey,
+    tile_size_meters,
+)
+
+# Default cluster radius in screen pixels
+DEFAULT_CLUSTER_RADIUS_PX = 64
+
+# Most tiles a single /points/clusters request may span
+MAX_CLUSTER_TILES = 64
+
+# (cell_x, cell_y, category_id, count, avg_lng, avg_lat); cell_x/cell_y are the
+# Web Mercator centre of the grid cell the points were snapped to
+ClusterRow = Tuple[float, float, Optional[int], int, float, float]
+
+
+def cells_per_tile(radius_px: int) -> int:
+    """Grid cells along one tile edge, so cells never straddle two tiles"""
+    return max(1, round(TILE_SIZE_PX / radius_px))
+
+
+def cluster_cell_size(zoom: int, radius_px: int) -> float:
+    """Grid cell width in Web Mercator meters"""
+    return tile_size_meters(zoom) / cells_per_tile(radius_px)
+
+
+def assemble_clusters(
+    rows: Iterable[ClusterRow], zoom: int, radius_px: int
+) -> Dict[TileKey, List[PointCluster]]:
+    """Merge per-category cell rows into clusters, grouped by the tile of each cell"""
+    cell_size = cluster_cell_size(zoom, radius_px)
+    per_tile = cells_per_tile(radius_px)
+
+    cells: Dict[Tuple[int, int], List[ClusterRow]] = {}
+    for row in rows:
+        # Cell index from the top-left corner, the same orientation as tiles
+        ix = math.floor((row[0] + WEB_MERCATOR_HALF_WIDTH) / cell_size)
+        iy = math.floor((WEB_MERCATOR_HALF_WIDTH - row[1]) / cell_size)
+        cells.setdefault((ix, iy), []).append(row)
+
+    clusters: Dict[TileKey, List[PointCluster]] = {}
+    for (ix, iy), cell_rows in sorted(cells.items()):
+        count = sum(row[3] for row in cell_rows)
+        lng = sum(row[4] * row[3] for row in cell_rows) / count
+        lat = sum(row[5] * row[3] for row in cell_rows) / count
+        categories = sorted(
+            (ClusterCategory(category_id=row[2], count=row[3]) for row in cell_rows),
+            key=lambda c: (-c.count, c.category_id is None, c.category_id or 0),
+        )
+
+        tile = (zoom, ix // per_tile, iy // per_tile)
+        clusters.setdefault(tile, []).append(
+            PointCluster(
+                coordinates=GeoJSONPoint(type="Point", coordinates=[lng, lat]),
+                count=count,
+                categories=categories,
+            )
+        )
+    return clusters
+
+
+def clusters_sizeof(clusters: List[PointCluster]) -> int:
+    """Rough memory footprint of a cached tile of clusters"""
+    return 64 + sum(200 + 60 * len(c.categories) for c in clusters)
+
+
+# One cache per worker process, keyed by tile and (category_id, cells_per_tile)
+cluster_cache = TileCache(
+    max_bytes=settings.TILE_CACHE_MAX_BYTES,
+    ttl=settings.TILE_CACHE_TTL,
+    sizeof=clusters_sizeof,
+)
@@ -0,0 +1,67 @@
+"""
+Distance matrices between two point sets.
+
+Matrices are produced as blocks of whole rows and encoded as they stream, so
+the response never holds more than one encoded block at a time.
+"""
+
+import json
+from typing import Iterable, Iterator, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from app.spatial.point_index import haversine
+
+MATRIX_MEDIA_TYPE = "application/octet-stream"
+
+# Cells computed and encoded per block
+MATRIX_BLOCK_CELLS = 1 << 18
+
+
+class DistanceMatrix(NamedTuple):
+    rows: int
+    columns: int
+    blocks: Iterable[np.ndarray]  # float64 row blocks in row-major order
+
+
+def block_rows(columns: int) -> int:
+    """Number of rows per block for a matrix `columns` wide"""
+    return max(MATRIX_BLOCK_CELLS // max(columns, 1), 1)
+
+
+def haversine_matrix(
+    sources: Sequence[Tuple[float, float]],
+    destinations: Sequence[Tuple[float, float]],
+) -> Iterator[np.ndarray]:
+    """Great-circle distances in meters between (lat, lng) pairs, by row block"""
+    src = np.asarray(sources, dtype=np.float64).reshape(-1, 2)
+    dst = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    step = block_rows(len(dst))
+    for start in range(0, len(src), step):
+        block = src[start : start + step]
+        yield haversine(block[:, :1], block[:, 1:], dst[:, 0], dst[:, 1])
+
+
+def row_blocks(batches: Iterable[Sequence[Sequence[float]]]) -> Iterator[np.ndarray]:
+    """Row blocks of a matrix read as batches of rows, one batch at a time"""
+    for rows in batches:
+        yield np.asarray(rows, dtype=np.float64)
+
+
+def encode_json(matrix: DistanceMatrix) -> Iterator[bytes]:
+    """{"rows", "columns", "distances": [[...], ...]} with centimeter precision"""
+    yield (f'{{"rows":{matrix.rows},"columns":{matrix.columns},"distances":['.encode())
+    first = True
+    for block in matrix.blocks:
+        if not len(block):
+            continue
+        body = json.dumps(np.round(block, 2).tolist(), separators=(",", ":"))[1:-1]
+        yield (body if first else "," + body).encode()
+        first = False
+    yield b"]}"
+
+
+def encode_binary(matrix: DistanceMatrix) -> Iterator[bytes]:
+    """Little-endian float64 distances in meters, row-major"""
+    for block in matrix.blocks:
+        yield np.ascontiguousarray(block, dtype="<f8").tobytes()
@@ -0,0 +1,447 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import shapely
+from shapely.errors import ShapelyError
+from shapely.geometry.base import BaseGeometry
+
+from app.config import settings
+from app.repositories.point import PointRepository
+from app.spatial.queries import radius_envelopes
+from app.spatial.snapshot import (
+    NO_CATEGORY,
+    PointSnapshot,
+    grid_cell_keys,
+    grid_cell_range,
+    grid_columns,
+)
+
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius (IUGG), used for haversine distances
+MEAN_EARTH_RADIUS_M = 6371008.8
+HALF_EARTH_CIRCUMFERENCE_M = np.pi * MEAN_EARTH_RADIUS_M
+
+# Above this many grid cells a query scans every live slot instead
+MAX_SCAN_CELLS = 4096
+
+# Start radius for the expanding nearest-neighbour search
+NEAREST_START_RADIUS_M = 1000.0
+
+# Rows updated this long before the last watermark are re-read on refresh, so
+# transactions that committed late (older updated_at) are not missed
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+IndexRow = Tuple[int, float, float, Optional[int]]  # (id, lat, lng, category_id)
+
+
+def haversine(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distance in meters from one point to many"""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lngs - lng)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * MEAN_EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class PointIndex:
+    """
+    In-memory mirror of point ids, coordinates and categories.
+
+    Coordinates live in NumPy arrays addressed by slot; a uniform lat/lng grid
+    maps each cell to the slots inside it. Reads are answered with vectorized
+    haversine distances, so they agree with PostGIS geography results to
+    within the sphere/spheroid difference (about 0.3%).
+
+    With `snapshot_path` set, the bulk of the points comes from a shared
+    memory-mapped PointSnapshot and the mutable arrays only hold writes made
+    since it was published; snapshot rows for those ids are shadowed.
+    """
+
+    def __init__(
+        self,
+        *,
+        cell_size: float = 0.05,
+        max_staleness: float = 30.0,
+        snapshot_path: Optional[str] = None,
+    ):
+        self.cell_size = cell_size
+        self.max_staleness = max_staleness
+        self.snapshot_path = snapshot_path
+        self.snapshot: Optional[PointSnapshot] = None
+        self._cols = grid_columns(cell_size)
+        self._lock = threading.RLock()
+        self._reset(capacity=0)
+        self.ready = False
+        self.synced_at: Optional[float] = None
+        self.watermark: Optional[datetime] = None
+
+    def _reset(self, capacity: int) -> None:
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._lats = np.zeros(capacity, dtype=np.float64)
+        self._lngs = np.zeros(capacity, dtype=np.float64)
+        self._categories = np.full(capacity, NO_CATEGORY, dtype=np.int64)
+        self._cell_of = np.zeros(capacity, dtype=np.int64)
+        self._slots: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._cells: Dict[int, Set[int]] = {}
+        self._size = 0
+        # Snapshot ids overridden by the mutable arrays or deleted
+        self._shadowed: Set[int] = set()
+        self._shadowed_array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            count = len(self._slots)
+            if self.snapshot is not None:
+                shadowed = np.isin(self._shadowed_ids(), self.snapshot.ids)
+                count += self.snapshot.count - int(shadowed.sum())
+            return count
+
+    def is_fresh(self) -> bool:
+        """Warm, and synced with the database within max_staleness seconds"""
+        return (
+            self.ready
+            and self.synced_at is not None
+            and time.monotonic() - self.synced_at <= self.max_staleness
+        )
+
+    def mark_synced(self, watermark: Optional[datetime] = None) -> None:
+        if watermark is not None and (
+            self.watermark is None or watermark > self.watermark
+        ):
+            self.watermark = watermark
+        self.synced_at = time.monotonic()
+        self.ready = True
+
+    def mark_stale(self) -> None:
+        """Send reads to PostGIS until the next refresh succeeds"""
+        self.synced_at = None
+
+    def _cell_key(self, lat: float, lng: float) -> int:
+        return int(grid_cell_keys(np.array([lat]), np.array([lng]), self.cell_size)[0])
+
+    def _shadow(self, point_id: int) -> None:
+        if self.snapshot is not None:
+            self._shadowed.add(point_id)
+            self._shadowed_array = None
+
+    def _shadowed_ids(self) -> np.ndarray:
+        if self._shadowed_array is None:
+            self._shadowed_array = np.fromiter(self._shadowed, dtype=np.int64)
+        return self._shadowed_array
+
+    def use_snapshot(self, snapshot: PointSnapshot) -> None:
+        """Serve from `snapshot`; writes made after it are re-read from the DB"""
+        with self._lock:
+            self._reset(capacity=0)
+            self.snapshot = snapshot
+            self.watermark = snapshot.watermark
+            self.ready = False
+
+    def open_snapshot(self) -> bool:
+        """Map the file at snapshot_path if it was (re)published; True if so"""
+        try:
+            stat = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return False
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self.snapshot is not None and self.snapshot.file_id == file_id:
+            return False
+        # The previous mapping is released once no query holds a view of it
+        self.use_snapshot(PointSnapshot(self.snapshot_path))
+        return True
+
+    # Writes
+
+    def load(self, rows: Iterable[IndexRow]) -> None:
+        """Replace the whole mirror with `rows`"""
+        rows = list(rows)
+        n = len(rows)
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        lats = np.fromiter((r[1] for r in rows), dtype=np.float64, count=n)
+        lngs = np.fromiter((r[2] for r in rows), dtype=np.float64, count=n)
+        categories = np.fromiter(
+            (NO_CATEGORY if r[3] is None else r[3] for r in rows),
+            dtype=np.int64,
+            count=n,
+        )
+        keys = grid_cell_keys(lats, lngs, self.cell_size)
+
+        # Group slots by cell: sort once, then split at key boundaries
+        order = np.argsort(keys, kind="stable")
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        cells = {
+            int(key): set(group.tolist())
+            for key, group in zip(unique_keys, np.split(order, starts[1:]))
+        }
+
+        with self._lock:
+            self._ids = ids
+            self._lats = lats
+            self._lngs = lngs
+            self._categories = categories
+            self._cell_of = keys
+            self._slots = {int(point_id): slot for slot, point_id in enumerate(ids)}
+            self._free = []
+            self._cells = cells if n else {}
+            self._size = n
+            self._shadowed = set()
+            self._shadowed_array = None
+            self.snapshot = None
+
+    def upsert(
+        self, point_id: int, lat: float, lng: float, category_id: Optional[int]
+    ) -> None:
+        """Insert a point or move it to new coordinates/category"""
+        key = self._cell_key(lat, lng)
+        with self._lock:
+            slot = self._slots.get(point_id)
+            if slot is None:
+                slot = self._allocate()
+                self._slots[point_id] = slot
+                self._shadow(point_id)
+            else:
+                self._cells[int(self._cell_of[slot])].discard(slot)
+
+            self._ids[slot] = point_id
+            self._lats[slot] = lat
+            self._lngs[slot] = lng
+            self._categories[slot] = NO_CATEGORY if category_id is None else category_id
+            self._cell_of[slot] = key
+            self._cells.setdefault(key, set()).add(slot)
+
+    def remove(self, point_id: int) -> None:
+        with self._lock:
+            self._shadow(point_id)
+            slot = self._slots.pop(point_id, None)
+            if slot is None:
+                return
+            self._cells[int(self._cell_of[slot])].discard(slot)
+            self._free.append(slot)
+
+    def retain(self, point_ids: np.ndarray) -> None:
+        """Drop every point whose id is not in `point_ids`"""
+        with self._lock:
+            keep = set(point_ids.tolist())
+            for point_id in [i for i in self._slots if i not in keep]:
+                self.remove(point_id)
+            if self.snapshot is not None:
+                for point_id in np.setdiff1d(self.snapshot.ids, point_ids).tolist():
+                    self._shadow(point_id)
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._ids):
+            capacity = max(1024, 2 * len(self._ids))
+            self._ids = np.resize(self._ids, capacity)
+            self._lats = np.resize(self._lats, capacity)
+            self._lngs = np.resize(self._lngs, capacity)
+            self._categories = np.resize(self._categories, capacity)
+            self._cell_of = np.resize(self._cell_of, capacity)
+        self._size += 1
+        return self._size - 1
+
+    # Reads
+
+    def _candidate_slots(
+        self, min_lng: float, min_lat: float, max_lng: float, max_lat: float
+    ) -> np.ndarray:
+        """Live slots in every grid cell overlapping the box; caller holds the lock"""
+        row_lo, row_hi, col_lo, col_hi = grid_cell_range(
+            (min_lng, min_lat, max_lng, max_lat), self.cell_size
+        )
+
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > MAX_SCAN_CELLS:
+            return np.fromiter(self._slots.values(), dtype=np.int64)
+
+        groups = (
+            self._cells.get(row * self._cols + col, ())
+            for row in range(row_lo, row_hi + 1)
+            for col in range(col_lo, col_hi + 1)
+        )
+        return np.fromiter(chain.from_iterable(groups), dtype=np.int64)
+
+    def _gather(
+        self, boxes: List[Tuple[float, float, float, float]], category_id: Optional[int]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Copy ids and coordinates of the points inside `boxes`"""
+        with self._lock:
+            slots = np.concatenate(
+                [self._candidate_slots(*box) for box in boxes]
+                or [np.empty(0, dtype=np.int64)]
+            )
+            if len(boxes) > 1:
+                # Full scans of both antimeridian boxes return the same slots
+                slots = np.unique(slots)
+            if category_id is not None:
+                slots = slots[self._categories[slots] == category_id]
+            ids, lats, lngs = self._ids[slots], self._lats[slots], self._lngs[slots]
+            snapshot = self.snapshot
+            shadowed = self._shadowed_ids() if snapshot is not None else None
+
+        if snapshot is None:
+            return ids, lats, lngs
+
+        # Boxes from radius_envelopes never share grid cells, so no duplicates
+        rows = np.concatenate(
+            [snapshot.candidate_slots(box) for box in boxes]
+            or [np.empty(0, dtype=np.int64)]
+        )
+        keep = ~np.isin(snapshot.ids[rows], shadowed)
+        if category_id is not None:
+            keep &= snapshot.categories[rows] == category_id
+        rows = rows[keep]
+        return (
+            np.concatenate([ids, snapshot.ids[rows]]),
+            np.concatenate([lats, snapshot.lats[rows]]),
+            np.concatenate([lngs, snapshot.lngs[rows]]),
+        )
+
+    def nearby(
+        self,
+        *,
+        lat: float,
+        lng: float,
+        radius: float,
+        limit: int = 100,
+        category_id: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """(id, distance) pairs within `radius` meters, closest first"""
+        ids, lats, lngs = self._gather(radius_envelopes(lat, lng, radius), category_id)
+        distances = haversine(lat, lng, lats, lngs)
+
+        mask = distances <= radius
+        ids, distances = ids[mask], distances[mask]
+        order = np.lexsort((ids, distances))[:limit]
+        return list(zip(ids[order].tolist(), distances[order].tolist()))
+
+    def nearest(
+        self,
+        *,
+        lat: float,
+        lng: float,
+        limit: int = 5,
+        category_id: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """The `limit` closest (id, distance) pairs, closest first"""
+        # Every point within r is returned by nearby(r), so once it yields at
+        # least `limit` rows they are exactly the nearest ones
+        radius = NEAREST_START_RADIUS_M
+        while True:
+            pairs = self.nearby(
+                lat=lat, lng=lng, radius=radius, limit=limit, category_id=category_id
+            )
+            if len(pairs) >= limit or radius >= HALF_EARTH_CIRCUMFERENCE_M:
+                return pairs
+            radius = min(radius * 4, HALF_EARTH_CIRCUMFERENCE_M)
+
+    def within_polygon(
+        self, *, polygon: BaseGeometry, limit: int = 100, after_id: Optional[int] = None
+    ) -> List[int]:
+        """
+        Ids of points strictly inside `polygon` (planar, like ST_Within).
+
+        Ids are sorted and start after `after_id`, matching the database's pages.
+        """
+        ids, lats, lngs = self._gather([polygon.bounds], None)
+        ids = np.sort(ids[shapely.contains_xy(polygon, lngs, lats)])
+        if after_id is not None:
+            ids = ids[ids > after_id]
+        return ids[:limit].tolist()
+
+
+def parse_polygon(polygon_wkt: str) -> Optional[BaseGeometry]:
+    """Parse WKT for the index, or None so the caller falls back to PostGIS"""
+    try:
+        polygon = shapely.from_wkt(polygon_wkt)
+    except (ShapelyError, ValueError):
+        return None
+    if polygon.geom_type != "Polygon" or polygon.is_empty or not polygon.is_valid:
+        return None
+    return polygon
+
+
+def refresh_point_index(index: PointIndex, point_repository: PointRepository) -> None:
+    """
+    Bring the mirror up to date from the database.
+
+    A cold index is loaded in full. A warm one re-reads rows updated since the
+    last watermark; if the row count still disagrees (deletes made by other
+    workers) it is reloaded in full.
+
+    Snapshot-backed indexes never load in full: writes since the snapshot are
+    read into the overlay and deleted ids are found by comparing id lists.
+    """
+    if index.snapshot_path is not None and (
+        index.open_snapshot() or index.snapshot is not None
+    ):
+        rows = point_repository.get_index_rows(
+            updated_since=(
+                index.watermark - REFRESH_OVERLAP
+                if index.watermark is not None
+                else None
+            )
+        )
+        for point_id, lat, lng, category_id, _ in rows:
+            index.upsert(point_id, lat, lng, category_id)
+        if point_repository.count() != len(index):
+            index.retain(np.asarray(point_repository.get_ids(), dtype=np.int64))
+        index.mark_synced(max((row[4] for row in rows), default=None))
+        return
+
+    if index.ready and index.watermark is not None:
+        rows = point_repository.get_index_rows(
+            updated_since=index.watermark - REFRESH_OVERLAP
+        )
+        for point_id, lat, lng, category_id, _ in rows:
+            index.upsert(point_id, lat, lng, category_id)
+        if point_repository.count() == len(index):
+            index.mark_synced(max((row[4] for row in rows), default=None))
+            return
+
+    rows = point_repository.get_index_rows()
+    index.load(row[:4] for row in rows)
+    index.mark_synced(max((row[4] for row in rows), default=None))
+
+
+async def run_point_index_refresher(
+    index: PointIndex, session_factory, interval: float
+) -> None:
+    """Keep `index` warm for the life of the worker"""
+
+    def refresh() -> None:
+        with session_factory() as session:
+            refresh_point_index(index, PointRepository(session))
+
+    while True:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(refresh)
+        except Exception as exc:
+            # The index goes stale and reads fall back to PostGIS until the
+            # next refresh succeeds
+            logger.warning(f"Point index refresh failed: {str(exc)}")
+        else:
+            logger.debug(
+                f"Point index refreshed: {len(index)} points "
+                f"in {time.perf_counter() - started:.3f}s"
+            )
+        await asyncio.sleep(interval)
+
+
+# One mirror per worker process
+point_index = PointIndex(
+    cell_size=settings.SPATIAL_INDEX_CELL_SIZE,
+    max_staleness=settings.SPATIAL_INDEX_MAX_STALENESS,
+    snapshot_path=settings.SPATIAL_INDEX_SNAPSHOT_PATH,
+)
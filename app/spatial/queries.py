@@ -1,17 +1,29 @@
 # app/spatial/queries.py
-from typing import List, Tuple, TypeVar
+import math
+from typing import List, Tuple, TypeVar, Union
 
-from geoalchemy2.elements import WKBElement
-from geoalchemy2.shape import from_shape
+from geoalchemy2.elements import WKBElement, WKTElement
+from geoalchemy2.shape import from_shape, to_shape
 from geoalchemy2.types import Geography
 from shapely.geometry import Point as ShapelyPoint
-from sqlalchemy import cast, func
+from sqlalchemy import cast, func, literal, or_
 from sqlalchemy.orm import Query
+from sqlalchemy.sql.elements import ColumnElement
 
 from app.core.constants import SpatialRefSys
 
 ModelType = TypeVar("ModelType")
 
+GEOGRAPHY_POINT = Geography(geometry_type="POINT", srid=SpatialRefSys.GEOGRAPHY)
+
+# Smallest radius of curvature of the WGS84 ellipsoid (meridional, at the
+# equator). Converting meters to degrees with it overestimates the angular
+# extent of a circle anywhere on Earth, so envelopes never clip true matches.
+MIN_EARTH_RADIUS_M = 6335439.0
+ENVELOPE_MARGIN = 1.001
+
+Envelope = Tuple[float, float, float, float]  # (min_lng, min_lat, max_lng, max_lat)
+
 
 def point_to_ewkb(lat: float, lng: float):
     """Convert lat/lng to PostGIS EWKB format"""
@@ -19,40 +31,124 @@ def point_to_ewkb(lat: float, lng: float):
     return from_shape(shapely_point, srid=SpatialRefSys.WGS84)
 
 
-def add_distance_to_query(query: Query, model_class, point_geom: WKBElement) -> Query:
-    """
-    Add a distance calculation to a query using Geography type
-    """
+def point_to_geography(lat: float, lng: float) -> ColumnElement:
+    """Bind lat/lng as a single geography literal"""
+    ewkt = WKTElement(f"POINT({lng} {lat})", srid=SpatialRefSys.GEOGRAPHY)
+    return literal(ewkt, type_=GEOGRAPHY_POINT)
+
+
+def geometry_to_geography(value):
+    """Convert a geometry value into the matching geography value"""
+    if value is None:
+        return None
+    if isinstance(value, (WKBElement, WKTElement)):
+        srid = value.srid if value.srid > 0 else SpatialRefSys.GEOGRAPHY
+        return WKTElement(to_shape(value).wkt, srid=srid)
+    # SQL expressions are converted by the database at flush time
+    return cast(value, Geography)
 
-    # Ensure model's geometry is treated as Geography
-    model_geom_geog = cast(model_class.geometry, Geography)
 
-    # Cast the input point_geom to Geography
-    point_geom_geog = cast(func.ST_GeomFromEWKB(point_geom), Geography)
+def _as_geography(point: Union[WKBElement, ColumnElement]) -> ColumnElement:
+    """Accept an EWKB point (as from point_to_ewkb) or a geography expression"""
+    if isinstance(point, (WKBElement, WKTElement)):
+        return literal(geometry_to_geography(point), type_=GEOGRAPHY_POINT)
+    return point
+
+
+def add_distance_to_query(query: Query, model_class, point_geog) -> Query:
+    """
+    Add a geodesic distance (in meters) to a query using the stored geography
+    """
+    point_geog = _as_geography(point_geog)
 
     return query.add_columns(
-        func.ST_Distance(model_geom_geog, point_geom_geog).label("distance")
+        func.ST_Distance(model_class.geog, point_geog).label("distance")
     )
 
 
-def filter_by_distance(
-    query: Query, model_class, point_geom: WKBElement, radius: float
-) -> Query:
+def filter_by_distance(query: Query, model_class, point_geog, radius: float) -> Query:
     """
-    Filter a query by distance using ST_DWithin with Geography
+    Filter a query by distance using ST_DWithin on the stored geography
     """
-    model_geom_geog = cast(model_class.geometry, Geography)
-    point_geom_geog = cast(func.ST_GeomFromEWKB(point_geom), Geography)
+    point_geog = _as_geography(point_geog)
 
-    return query.filter(func.ST_DWithin(model_geom_geog, point_geom_geog, radius))
+    return query.filter(func.ST_DWithin(model_class.geog, point_geog, radius))
 
 
-def nearest_neighbor_query(query: Query, model_class, point_geom: WKBElement) -> Query:
+def nearest_neighbor_query(query: Query, model_class, point_geog) -> Query:
+    """
+    Optimize query for nearest neighbor search using KNN <-> on the geography index
+    """
+    point_geog = _as_geography(point_geog)
+
+    # The <-> operator is the KNN distance operator, here on geography
+    return query.order_by(model_class.geog.distance_centroid(point_geog))
+
+
+def bbox_envelopes(bbox: Envelope) -> List[Envelope]:
+    """Split a bbox whose min_lng > max_lng at the antimeridian"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if min_lng <= max_lng:
+        return [bbox]
+    return [(min_lng, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lng, max_lat)]
+
+
+def radius_envelopes(lat: float, lng: float, radius: float) -> List[Envelope]:
+    """
+    Conservative lat/lng boxes covering every point within `radius` meters.
+
+    Returns one box, or two when the circle crosses the antimeridian. A circle
+    that reaches a pole covers every longitude above that latitude.
+    """
+    delta = math.degrees(radius * ENVELOPE_MARGIN / MIN_EARTH_RADIUS_M)
+    min_lat = lat - delta
+    max_lat = lat + delta
+
+    if max_lat >= 90 or min_lat <= -90:
+        return [(-180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0))]
+
+    # Widest longitude offset of a spherical cap, reached off the centre latitude
+    ratio = math.sin(math.radians(delta)) / math.cos(math.radians(lat))
+    if ratio >= 1:
+        return [(-180.0, min_lat, 180.0, max_lat)]
+    delta_lng = math.degrees(math.asin(ratio))
+
+    min_lng = lng - delta_lng
+    max_lng = lng + delta_lng
+    if min_lng < -180:
+        return [
+            (min_lng + 360, min_lat, 180.0, max_lat),
+            (-180.0, min_lat, max_lng, max_lat),
+        ]
+    if max_lng > 180:
+        return [
+            (min_lng, min_lat, 180.0, max_lat),
+            (-180.0, min_lat, max_lng - 360, max_lat),
+        ]
+    return [(min_lng, min_lat, max_lng, max_lat)]
+
+
+def filter_by_envelopes(query: Query, model_class, envelopes: List[Envelope]) -> Query:
+    """
+    Planar prefilter: geometry && box, answered from the geometry GiST index
+    """
+    boxes = [
+        model_class.geometry.op("&&")(
+            func.ST_MakeEnvelope(*envelope, SpatialRefSys.WGS84)
+        )
+        for envelope in envelopes
+    ]
+    return query.filter(or_(*boxes))
+
+
+def filter_by_exact_distance(
+    query: Query, model_class, point_geog, radius: float
+) -> Query:
     """
-    Optimize query for nearest neighbor search using KNN <-> operator and Geography
+    Exact geodesic refinement, evaluated only on rows that survived a prefilter
     """
-    model_geom_geog = cast(model_class.geometry, Geography)
-    point_geom_geog = cast(func.ST_GeomFromEWKB(point_geom), Geography)
+    point_geog = _as_geography(point_geog)
 
-    # The <-> operator is the KNN distance operator, now on Geography
-    return query.order_by(model_geom_geog.distance_centroid(point_geom_geog))
+    # ST_Distance is not index-aware, so the planner keeps the geometry index
+    # scan from the prefilter instead of switching to the geography index
+    return query.filter(func.ST_Distance(model_class.geog, point_geog) <= radius)
@@ -0,0 +1,229 @@
+"""
+Columnar point snapshot shared by every worker through mmap.
+
+Publish a new snapshot with:
+
+    python -m app.spatial.snapshot --output /var/lib/geopoints/points.snap
+
+File layout (little-endian, every array 8-byte aligned):
+
+    header   magic, version, count, n_cells, cell_size, watermark, created_at
+    ids          int32[count]    sorted by grid cell, then id
+    categories   int32[count]    -1 for points without a category
+    lats         float64[count]
+    lngs         float64[count]
+    cell_keys    int64[n_cells]  sorted grid cells that contain points
+    cell_starts  int64[n_cells + 1]  offset of each cell's first point
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repositories.point import PointRepository
+
+MAGIC = b"GPSNAP\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sIIqqddd")
+HEADER_SIZE = 64  # HEADER.size rounded up so the arrays start 8-byte aligned
+
+NO_CATEGORY = -1
+
+Box = Tuple[float, float, float, float]  # (min_lng, min_lat, max_lng, max_lat)
+
+
+def grid_columns(cell_size: float) -> int:
+    return int(np.ceil(360.0 / cell_size)) + 1
+
+
+def grid_cell_keys(lats: np.ndarray, lngs: np.ndarray, cell_size: float) -> np.ndarray:
+    """Row-major cell number of each lat/lng on a `cell_size` degree grid"""
+    rows = np.floor((lats + 90.0) / cell_size).astype(np.int64)
+    cols = np.floor((lngs + 180.0) / cell_size).astype(np.int64)
+    return rows * grid_columns(cell_size) + cols
+
+
+def grid_cell_range(box: Box, cell_size: float) -> Tuple[int, int, int, int]:
+    """(row_lo, row_hi, col_lo, col_hi) of the grid cells overlapping `box`"""
+    min_lng, min_lat, max_lng, max_lat = box
+    lo, hi = grid_cell_keys(
+        np.array([max(min_lat, -90.0), min(max_lat, 90.0)]),
+        np.array([min_lng, max_lng]),
+        cell_size,
+    )
+    row_lo, col_lo = divmod(int(lo), grid_columns(cell_size))
+    row_hi, col_hi = divmod(int(hi), grid_columns(cell_size))
+    return row_lo, row_hi, col_lo, col_hi
+
+
+class PointSnapshot:
+    """Read-only NumPy views over a memory-mapped snapshot file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Identifies the published file; a new snapshot is a new inode
+        self.file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        magic, version, _, count, n_cells, cell_size, watermark, created_at = (
+            HEADER.unpack_from(self._mmap, 0)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} point snapshot")
+
+        self.count = count
+        self.cell_size = cell_size
+        self.cols = grid_columns(cell_size)
+        self.watermark = (
+            None
+            if np.isnan(watermark)
+            else datetime.fromtimestamp(watermark, tz=timezone.utc)
+        )
+        self.created_at = datetime.fromtimestamp(created_at, tz=timezone.utc)
+
+        offset = HEADER_SIZE
+        self.ids, offset = self._view(np.int32, count, offset)
+        self.categories, offset = self._view(np.int32, count, offset)
+        self.lats, offset = self._view(np.float64, count, offset)
+        self.lngs, offset = self._view(np.float64, count, offset)
+        self.cell_keys, offset = self._view(np.int64, n_cells, offset)
+        self.cell_starts, offset = self._view(np.int64, n_cells + 1, offset)
+
+    def _view(self, dtype, count: int, offset: int) -> Tuple[np.ndarray, int]:
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+        # Keep every array 8-byte aligned
+        size = array.nbytes + (-array.nbytes % 8)
+        return array, offset + size
+
+    def candidate_slots(self, box: Box) -> np.ndarray:
+        """Rows in the grid cells overlapping `box`"""
+        row_lo, row_hi, col_lo, col_hi = grid_cell_range(box, self.cell_size)
+
+        # Cells of one grid row are contiguous in key order, so each row of the
+        # box is a single run of points
+        rows = np.arange(row_lo, row_hi + 1, dtype=np.int64) * self.cols
+        first = np.searchsorted(self.cell_keys, rows + col_lo, side="left")
+        last = np.searchsorted(self.cell_keys, rows + col_hi, side="right")
+        starts = self.cell_starts[first]
+        stops = self.cell_starts[last]
+
+        runs = [np.arange(a, b) for a, b in zip(starts, stops) if b > a]
+        if not runs:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(runs)
+
+
+def write_snapshot(
+    path: str,
+    rows: Iterable[Tuple[int, float, float, Optional[int]]],
+    *,
+    cell_size: float,
+    watermark: Optional[datetime] = None,
+) -> int:
+    """
+    Write (id, lat, lng, category_id) rows as a snapshot and publish it.
+
+    The file is written next to `path` and renamed over it, so workers only
+    ever map a complete snapshot. Returns the number of points written.
+    """
+    rows = list(rows)
+    count = len(rows)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int32, count=count)
+    lats = np.fromiter((r[1] for r in rows), dtype=np.float64, count=count)
+    lngs = np.fromiter((r[2] for r in rows), dtype=np.float64, count=count)
+    categories = np.fromiter(
+        (NO_CATEGORY if r[3] is None else r[3] for r in rows),
+        dtype=np.int32,
+        count=count,
+    )
+
+    keys = grid_cell_keys(lats, lngs, cell_size)
+    order = np.lexsort((ids, keys))
+    keys = keys[order]
+    cell_keys, cell_first = np.unique(keys, return_index=True)
+    cell_starts = np.append(cell_first, count).astype(np.int64)
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        0,
+        count,
+        len(cell_keys),
+        cell_size,
+        watermark.timestamp() if watermark is not None else np.nan,
+        time.time(),
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".points-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\x00"))
+            for array in (
+                ids[order],
+                categories[order],
+                lats[order],
+                lngs[order],
+                cell_keys.astype(np.int64),
+                cell_starts,
+            ):
+                data = array.tobytes()
+                f.write(data + b"\x00" * (-len(data) % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+
+def dump_points(point_repository: PointRepository, path: str, cell_size: float) -> int:
+    """Snapshot the points table to `path`"""
+    rows = point_repository.get_index_rows()
+    watermark = max((row[4] for row in rows), default=None)
+    return write_snapshot(
+        path, (row[:4] for row in rows), cell_size=cell_size, watermark=watermark
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Publish a shared point snapshot")
+    parser.add_argument(
+        "--output",
+        default=settings.SPATIAL_INDEX_SNAPSHOT_PATH,
+        required=not settings.SPATIAL_INDEX_SNAPSHOT_PATH,
+        help="Snapshot path (default: SPATIAL_INDEX_SNAPSHOT_PATH)",
+    )
+    parser.add_argument(
+        "--cell-size",
+        type=float,
+        default=settings.SPATIAL_INDEX_CELL_SIZE,
+        help="Grid cell size in degrees (default: SPATIAL_INDEX_CELL_SIZE)",
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        count = dump_points(PointRepository(session), args.output, args.cell_size)
+    print(
+        f"Wrote {count} points to {args.output} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
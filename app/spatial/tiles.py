@@ -0,0 +1,250 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from app.config import settings
+from app.core.compression import STORED_LEVELS, compress
+
+# Mapbox Vector Tile defaults
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 22
+# Rendered size of a tile in pixels
+TILE_SIZE_PX = 256
+
+# Half the width of the Web Mercator square, in meters
+WEB_MERCATOR_HALF_WIDTH = 20037508.342789244
+# Latitude where Web Mercator is cut off
+WEB_MERCATOR_MAX_LAT = 85.0511287798066
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+TileKey = Tuple[int, int, int]  # (z, x, y)
+CacheKey = Tuple[TileKey, Hashable]  # (tile, variant such as a category filter)
+Bounds = Tuple[float, float, float, float]  # (min_lng, min_lat, max_lng, max_lat)
+
+
+class Tile(NamedTuple):
+    content: bytes
+    etag: str
+    # Compressed copies of content by Content-Encoding, made on first request
+    encoded: Dict[str, bytes]
+
+    def encode(self, encoding: Optional[str]) -> bytes:
+        """The tile body in `encoding`, compressed once per cached tile"""
+        if encoding is None:
+            return self.content
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = compress(
+                self.content, encoding, STORED_LEVELS
+            )
+        return body
+
+
+def make_tile(content: bytes) -> Tile:
+    """Wrap encoded tile bytes with a strong ETag over their content"""
+    etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+    return Tile(content, etag, {})
+
+
+def tile_size_meters(z: int) -> float:
+    """Width of one tile, in Web Mercator meters, at zoom `z`"""
+    return 2 * WEB_MERCATOR_HALF_WIDTH / 2**z
+
+
+def tile_buffer_meters(z: int) -> float:
+    """Width of the tile buffer, in Web Mercator meters, at zoom `z`"""
+    return tile_size_meters(z) * TILE_BUFFER / TILE_EXTENT
+
+
+def _unit_xy(lat: float, lng: float) -> Tuple[float, float]:
+    """Position on the unit Web Mercator square, origin top-left"""
+    lat = max(min(lat, WEB_MERCATOR_MAX_LAT), -WEB_MERCATOR_MAX_LAT)
+    fx = (lng + 180.0) / 360.0
+    fy = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2
+    return fx, fy
+
+
+def tile_bounds(z: int, x: int, y: int) -> Bounds:
+    """lng/lat bounds of tile z/x/y"""
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tiles_for_bbox(bounds: Bounds, z: int) -> List[TileKey]:
+    """
+    Tiles at zoom `z` covering a lng/lat bbox.
+
+    A bbox with min_lng > max_lng crosses the antimeridian.
+    """
+    min_lng, min_lat, max_lng, max_lat = bounds
+    n = 2**z
+    x_min = min(int(_unit_xy(min_lat, min_lng)[0] * n), n - 1)
+    x_max = min(int(_unit_xy(min_lat, max_lng)[0] * n), n - 1)
+    y_min = min(int(_unit_xy(max_lat, min_lng)[1] * n), n - 1)
+    y_max = min(int(_unit_xy(min_lat, min_lng)[1] * n), n - 1)
+
+    if x_min <= x_max:
+        xs = list(range(x_min, x_max + 1))
+    else:
+        xs = list(range(x_min, n)) + list(range(0, x_max + 1))
+    return [(z, x, y) for x in xs for y in range(y_min, y_max + 1)]
+
+
+def column_runs(tiles: List[TileKey]) -> List[Tuple[List[TileKey], Bounds]]:
+    """
+    Tiles grouped into runs of adjacent columns, each with the bounds it covers.
+
+    A run never wraps the antimeridian, so its bounds stay as narrow as its tiles.
+    """
+    runs: List[List[TileKey]] = []
+    for tile in sorted(tiles, key=lambda t: (t[1], t[2])):
+        if runs and tile[1] - runs[-1][-1][1] <= 1:
+            runs[-1].append(tile)
+        else:
+            runs.append([tile])
+
+    grouped = []
+    for run in runs:
+        bounds = [tile_bounds(*tile) for tile in run]
+        grouped.append(
+            (
+                run,
+                (
+                    min(b[0] for b in bounds),
+                    min(b[1] for b in bounds),
+                    max(b[2] for b in bounds),
+                    max(b[3] for b in bounds),
+                ),
+            )
+        )
+    return grouped
+
+
+def tiles_for_point(
+    lat: float, lng: float, max_zoom: int = MAX_ZOOM
+) -> Iterator[TileKey]:
+    """Every tile, buffer included, whose content can change with this point"""
+    fx, fy = _unit_xy(lat, lng)
+    margin = TILE_BUFFER / TILE_EXTENT
+
+    for z in range(max_zoom + 1):
+        n = 2**z
+        x_lo = max(int(math.floor(fx * n - margin)), 0)
+        x_hi = min(int(math.floor(fx * n + margin)), n - 1)
+        y_lo = max(int(math.floor(fy * n - margin)), 0)
+        y_hi = min(int(math.floor(fy * n + margin)), n - 1)
+        for x in range(x_lo, x_hi + 1):
+            for y in range(y_lo, y_hi + 1):
+                yield z, x, y
+
+
+class TileCache:
+    """
+    Size-bounded LRU of per-tile values with a TTL.
+
+    Entries are keyed by tile and a variant (e.g. the category filter). Writes
+    drop every cached variant of the tiles around the changed point; the TTL
+    bounds how long writes made by other workers can go unseen.
+
+    max_bytes bounds the values as `sizeof` measures them when put; for tiles
+    that is the uncompressed content, not the compressed copies added later.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int,
+        ttl: float,
+        sizeof: Callable[[Any], int] = lambda tile: len(tile.content),
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, Tuple[Any, float, int]]" = OrderedDict()
+        self._by_tile: Dict[TileKey, Set[Hashable]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tile: TileKey, variant: Hashable) -> Any:
+        key = (tile, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, tile: TileKey, variant: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        key = (tile, variant)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self._by_tile.setdefault(tile, set()).add(variant)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_point(self, lat: float, lng: float) -> None:
+        """Drop cached tiles that show, or could show, a point at lat/lng"""
+        with self._lock:
+            if not self._entries:
+                return
+            for tile in tiles_for_point(lat, lng):
+                for variant in list(self._by_tile.get(tile, ())):
+                    self._discard((tile, variant))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_tile.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, key: CacheKey) -> None:
+        """Remove one entry; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[2]
+        tile, variant = key
+        variants = self._by_tile[tile]
+        variants.discard(variant)
+        if not variants:
+            del self._by_tile[tile]
+
+
+# One cache per worker process for each kind of per-tile result
+tile_cache = TileCache(
+    max_bytes=settings.TILE_CACHE_MAX_BYTES, ttl=settings.TILE_CACHE_TTL
+)
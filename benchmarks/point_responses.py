@@ -0,0 +1,120 @@
+"""
+Cost of building and serializing nearby responses, per row count.
+
+Compares the validated path (Point schema, model_dump, NearbyPoint, then
+FastAPI's response_model pass and JSONResponse) with rows placed by
+model_construct and serialized once through a TypeAdapter. No database is
+needed; rows are synthetic.
+
+    python -m benchmarks.point_responses
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Tuple
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.repositories.point import PointRow
+from app.schemas.point import NearbyPoint, NearbyPointList
+from app.schemas.point import Point as PointSchema
+
+ROW_COUNTS = (10, 100, 1000)
+
+_response_field = create_model_field(
+    name="Response", type_=List[NearbyPoint], mode="serialization"
+)
+_loop = asyncio.new_event_loop()
+
+
+def make_rows(count: int) -> List[Tuple[PointRow, float]]:
+    now = datetime.now(timezone.utc)
+    return [
+        (
+            PointRow(
+                i,
+                f"Point {i}",
+                "A point of interest" if i % 2 else None,
+                i % 5 or None,
+                now,
+                now,
+                52.5 + i * 1e-5,
+                13.4 + i * 1e-5,
+                f"Category {i % 5}" if i % 5 else None,
+                None,
+                "#336699" if i % 5 else None,
+            ),
+            float(i),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def validated(rows: List[Tuple[PointRow, float]]) -> bytes:
+    """The response path before rows were trusted"""
+    points = []
+    for row, distance in rows:
+        data = {
+            "id": row.id,
+            "name": row.name,
+            "description": row.description,
+            "category_id": row.category_id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "coordinates": {"type": "Point", "coordinates": [row.lng, row.lat]},
+        }
+        if row.category_name is not None:
+            data["category"] = {
+                "id": row.category_id,
+                "name": row.category_name,
+                "description": row.category_description,
+                "color": row.category_color,
+            }
+        point_data = PointSchema(**data).model_dump()
+        point_data["distance"] = distance
+        points.append(NearbyPoint(**point_data))
+
+    content = _loop.run_until_complete(
+        serialize_response(field=_response_field, response_content=points)
+    )
+    return JSONResponse(content).body
+
+
+def constructed(rows: List[Tuple[PointRow, float]]) -> bytes:
+    """model_construct from the rows and one TypeAdapter serialization"""
+    return NearbyPointList.dump_json(
+        [NearbyPoint.from_row(row, distance=distance) for row, distance in rows]
+    )
+
+
+def best_of(fn: Callable, rows, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'validated':>12} {'constructed':>12} {'speedup':>8}")
+    for count in ROW_COUNTS:
+        rows = make_rows(count)
+        slow = best_of(validated, rows, args.repeat)
+        fast = best_of(constructed, rows, args.repeat)
+        print(
+            f"{count:>6} {slow * 1e6 / count:>9.1f} us {fast * 1e6 / count:>9.1f} us "
+            f"{slow / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
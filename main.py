@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 import uvicorn
@@ -6,10 +7,32 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import api_router
 from app.config import settings
+from app.core.caching import NO_STORE, CachePolicy
+from app.core.compression import (
+    DENSE_LEVELS,
+    FAST_LEVELS,
+    CompressionPolicy,
+)
+from app.core.encoders import EncodedResponse
 from app.core.error_handlers import add_exception_handlers
+from app.database import SessionLocal, async_engine
 from app.dependencies import init_db
+from app.middleware.caching import CacheControlMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.negotiation import ContentNegotiationMiddleware
 from app.middleware.query_monitor import QueryMonitorMiddleware
 from app.middleware.rate_limiting import RateLimitMiddleware
+from app.services.counts import point_counts
+from app.services.invalidation import (
+    invalidation_bus,
+    listener_dsn,
+    register_caches,
+    run_invalidation_listener,
+)
+from app.services.query_cache import query_cache
+from app.spatial.clusters import cluster_cache
+from app.spatial.point_index import point_index, run_point_index_refresher
+from app.spatial.tiles import tile_cache
 
 # Define rate limit tiers
 STANDARD_TIER = {"limit": 100, "window": 60}  # 100 requests per minute
@@ -17,13 +40,64 @@ INTENSIVE_TIER = {"limit": 20, "window": 60}  # 20 requests per minute
 WRITE_TIER = {"limit": 30, "window": 60}  # 30 requests per minute
 AUTH_TIER = {"limit": 5, "window": 60}  # 5 requests per minute
 
+# Define compression policies
+DEFAULT_COMPRESSION = CompressionPolicy(minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+# Point lists with limit up to 1000: large and very repetitive
+DENSE_COMPRESSION = CompressionPolicy(
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE, levels=DENSE_LEVELS
+)
+# Streamed exports: keep up with the cursor
+STREAM_COMPRESSION = CompressionPolicy(minimum_size=0, levels=FAST_LEVELS)
+
+# Define Cache-Control policies; reads carry version ETags, so a stale copy
+# costs one 304 to revalidate
+READ_CACHE = CachePolicy(
+    max_age=settings.READ_CACHE_MAX_AGE,
+    stale_while_revalidate=settings.READ_CACHE_STALE_WHILE_REVALIDATE,
+)
+QUERY_CACHE = CachePolicy(
+    max_age=settings.QUERY_CACHE_MAX_AGE,
+    stale_while_revalidate=settings.QUERY_CACHE_STALE_WHILE_REVALIDATE,
+)
+TILE_CACHE = CachePolicy(max_age=settings.TILE_CACHE_MAX_AGE)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if not settings.TESTING:
         init_db()
+
+    refresher = None
+    if settings.SPATIAL_INDEX_ENABLED:
+        # Warms the index in the background; reads use PostGIS until it is ready
+        refresher = asyncio.create_task(
+            run_point_index_refresher(
+                point_index, SessionLocal, settings.SPATIAL_INDEX_REFRESH_INTERVAL
+            )
+        )
+
+    listener = None
+    if settings.CACHE_INVALIDATION_ENABLED and not settings.TESTING:
+        # Drop this worker's cached results when other workers write
+        register_caches(
+            invalidation_bus,
+            tile_caches=(tile_cache, cluster_cache),
+            query_cache=query_cache,
+            point_counts=point_counts,
+            point_index=point_index if settings.SPATIAL_INDEX_ENABLED else None,
+        )
+        listener = asyncio.create_task(
+            run_invalidation_listener(invalidation_bus, listener_dsn())
+        )
+
     yield
 
+    if listener is not None:
+        listener.cancel()
+    if refresher is not None:
+        refresher.cancel()
+    await async_engine.dispose()
+
 
 # Create FastAPI application
 app = FastAPI(
@@ -42,8 +116,43 @@ app = FastAPI(
     },
     debug=settings.DEBUG,
     lifespan=lifespan,
+    # orjson or MessagePack, as the Accept header asks
+    default_response_class=EncodedResponse,
 )
 
+# Compress responses as Accept-Encoding allows, with path-specific policies;
+# innermost, so it sees bodies before BaseHTTPMiddleware re-streams them
+app.add_middleware(
+    CompressionMiddleware,
+    default=DEFAULT_COMPRESSION,
+    path_policies={
+        f"{settings.API_V1_STR}/points/nearby": DENSE_COMPRESSION,
+        f"{settings.API_V1_STR}/points/within": DENSE_COMPRESSION,
+        f"{settings.API_V1_STR}/points/nearest/batch": DENSE_COMPRESSION,
+        f"{settings.API_V1_STR}/points/export": STREAM_COMPRESSION,
+    },
+)
+
+# Cache-Control per route (everything else is no-store), plus the ETags
+# chosen by the read routes' conditional GET dependencies
+app.add_middleware(
+    CacheControlMiddleware,
+    default=NO_STORE,
+    route_policies={
+        f"{settings.API_V1_STR}/points/": READ_CACHE,
+        f"{settings.API_V1_STR}/points/{{point_id}}": READ_CACHE,
+        f"{settings.API_V1_STR}/points/nearby": QUERY_CACHE,
+        f"{settings.API_V1_STR}/points/nearest": QUERY_CACHE,
+        f"{settings.API_V1_STR}/points/clusters": QUERY_CACHE,
+        f"{settings.API_V1_STR}/points/tiles/{{z}}/{{x}}/{{y}}.mvt": TILE_CACHE,
+        f"{settings.API_V1_STR}/categories/": READ_CACHE,
+        f"{settings.API_V1_STR}/categories/{{category_id}}": READ_CACHE,
+    },
+)
+
+# Choose each request's response encoder
+app.add_middleware(ContentNegotiationMiddleware)
+
 # Add query monitoring middleware
 app.add_middleware(QueryMonitorMiddleware)
 
@@ -57,6 +166,12 @@ app.add_middleware(
         f"{settings.API_V1_STR}/points/nearby": INTENSIVE_TIER,
         f"{settings.API_V1_STR}/points/within": INTENSIVE_TIER,
         f"{settings.API_V1_STR}/points/nearest": INTENSIVE_TIER,
+        f"{settings.API_V1_STR}/points/nearest/batch": INTENSIVE_TIER,
+        f"{settings.API_V1_STR}/points/distance-matrix": INTENSIVE_TIER,
+        f"{settings.API_V1_STR}/points/export": INTENSIVE_TIER,
+        f"{settings.API_V1_STR}/points/upload": WRITE_TIER,
+        f"{settings.API_V1_STR}/points/bulk": WRITE_TIER,
+        f"{settings.API_V1_STR}/points/clusters": INTENSIVE_TIER,
         # Write operations (POST, PUT, DELETE handled in middleware)
         f"{settings.API_V1_STR}/points": WRITE_TIER,
         f"{settings.API_V1_STR}/categories": WRITE_TIER,
@@ -77,9 +192,9 @@ if settings.backend_cors_origins:
         CORSMiddleware,
         allow_origins=[origin.strip() for origin in settings.backend_cors_origins],
         allow_credentials=True,
-        allow_methods=["GET", "POST", "PUT", "DELETE"],
+        allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
         allow_headers=["Authorization", "Content-Type"],
-        expose_headers=["X-Total-Count"],
+        expose_headers=["X-Total-Count", "Link", "ETag", "Content-Location"],
         max_age=600,  # 10 minutes cache for preflight requests
     )
 
@@ -1,5 +1,6 @@
 import os
 import sys
+from contextlib import asynccontextmanager
 
 os.environ["TESTING"] = "true"
 os.environ["POSTGRES_SERVER"] = "localhost"
@@ -99,6 +100,7 @@ def test_db_engine():
                 name VARCHAR(100) NOT NULL,
                 description TEXT,
                 geometry GEOMETRY(Point, 4326) NOT NULL,
+                geog GEOGRAPHY(Point, 4326) NOT NULL,
                 category_id INTEGER REFERENCES categories(id),
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
@@ -107,12 +109,29 @@ def test_db_engine():
             )
         )
 
+        # Create data_versions table, bumped by every point/category write
+        conn.execute(
+            text(
+                """
+            CREATE TABLE data_versions (
+                name VARCHAR(50) PRIMARY KEY,
+                version BIGINT NOT NULL
+            )
+        """
+            )
+        )
+
         # Create spatial indexes
         conn.execute(
             text(
                 "CREATE INDEX IF NOT EXISTS idx_points_geometry ON points USING GIST (geometry)"
             )
         )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS idx_points_geog ON points USING GIST (geog)"
+            )
+        )
         conn.execute(
             text(
                 "CREATE INDEX IF NOT EXISTS idx_points_name ON points USING btree (name)"
@@ -159,18 +178,51 @@ def db_session(test_db_engine):
         # connection.close() # potentially redundant, but safe to keep
 
 
+def override_caches():
+    """Fresh caches per test so tiles never outlive the data they were built from"""
+    from app.api.deps import (
+        get_cluster_cache,
+        get_point_counts,
+        get_query_cache,
+        get_tile_cache,
+    )
+    from app.services.counts import PointCounts
+    from app.services.query_cache import QueryCache
+    from app.spatial.clusters import clusters_sizeof
+    from app.spatial.tiles import TileCache
+
+    tile_cache = TileCache(max_bytes=1024 * 1024, ttl=60)
+    cluster_cache = TileCache(max_bytes=1024 * 1024, ttl=60, sizeof=clusters_sizeof)
+    app.dependency_overrides[get_tile_cache] = lambda: tile_cache
+    app.dependency_overrides[get_cluster_cache] = lambda: cluster_cache
+    point_counts = PointCounts(ttl=60)
+    app.dependency_overrides[get_point_counts] = lambda: point_counts
+    query_cache = QueryCache(max_entries=256, ttl=60)
+    app.dependency_overrides[get_query_cache] = lambda: query_cache
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """Create a test client with patched dependencies."""
 
     # Override the dependencies in the FastAPI app
-    from app.api.deps import get_db
+    from app.api.deps import get_session_runner, get_session_runner_factory
+    from app.database import SyncSessionRunner
 
     # Store original dependencies
     original_dependencies = app.dependency_overrides.copy()
 
-    # Override dependency to use our test session
-    app.dependency_overrides[get_db] = lambda: db_session
+    # Override dependency to run services on our test session
+    app.dependency_overrides[get_session_runner] = lambda: SyncSessionRunner(db_session)
+
+    # Streamed responses read the test session too, inside its open transaction
+    @asynccontextmanager
+    async def open_test_runner(**execution_options):
+        yield SyncSessionRunner(db_session)
+
+    app.dependency_overrides[get_session_runner_factory] = lambda: open_test_runner
+
+    override_caches()
 
     # Create test client
     with TestClient(app) as test_client:
@@ -180,6 +232,58 @@ def client(db_session):
     app.dependency_overrides = original_dependencies
 
 
+@pytest.fixture(scope="function")
+def async_client(test_db_engine):
+    """
+    A test client whose services run on AsyncSessionRunner over asyncpg, as
+    with the default DATABASE_MODE.
+
+    asyncpg connections can't join the sync test transaction, so requests
+    commit for real and the tables are emptied afterwards.
+    """
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.api.deps import get_session_runner, get_session_runner_factory
+    from app.database import AsyncSessionRunner
+
+    original_dependencies = app.dependency_overrides.copy()
+
+    # No pooling, since TestClient runs the app on an event loop of its own
+    async_engine = create_async_engine(
+        test_db_engine.url.set(drivername="postgresql+asyncpg"), poolclass=NullPool
+    )
+    AsyncTestingSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def get_async_test_runner():
+        async with AsyncTestingSessionLocal() as session:
+            yield AsyncSessionRunner(session)
+
+    @asynccontextmanager
+    async def open_async_test_runner(**execution_options):
+        bind = async_engine.execution_options(**execution_options)
+        async with AsyncTestingSessionLocal(bind=bind) as session:
+            yield AsyncSessionRunner(session)
+
+    app.dependency_overrides[get_session_runner] = get_async_test_runner
+    app.dependency_overrides[get_session_runner_factory] = (
+        lambda: open_async_test_runner
+    )
+    override_caches()
+
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        app.dependency_overrides = original_dependencies
+        with test_db_engine.begin() as conn:
+            conn.execute(
+                text("TRUNCATE points, categories, users, data_versions CASCADE")
+            )
+
+
 @pytest.fixture(scope="function")
 def point_repository(db_session):
     """Return a PointRepository instance with the test database session."""
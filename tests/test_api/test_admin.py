@@ -0,0 +1,28 @@
+def test_read_db_pool_stats(client, admin_token):
+    """Test reading connection pool statistics as a superuser."""
+    response = client.get(
+        "/api/v1/admin/db-pool", headers={"Authorization": f"Bearer {admin_token}"}
+    )
+
+    # Verify response
+    assert response.status_code == 200
+    data = response.json()
+
+    # Both engines are reported
+    assert data["mode"] in ("async", "sync")
+    assert set(data["pools"]) == {"sync", "async"}
+
+    for stats in data["pools"].values():
+        assert stats["checked_out"] >= 0
+        assert stats["timeouts"] >= 0
+        assert stats["max_wait_ms"] >= stats["avg_wait_ms"] >= 0
+
+
+def test_read_db_pool_stats_not_admin(client, user_token):
+    """Test that a regular user cannot read pool statistics."""
+    response = client.get(
+        "/api/v1/admin/db-pool", headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    # Verify response - should be forbidden
+    assert response.status_code == 403
@@ -209,3 +209,69 @@ def test_delete_category_not_admin(client, test_categories, user_token):
 
     # Verify response - should be forbidden
     assert response.status_code == 403
+
+
+def test_read_categories_cursor(client, test_categories):
+    """Test walking the categories with cursors."""
+    response = client.get("/api/v1/categories/", params={"limit": 2})
+    first = response.json()
+    assert first["meta"]["next_cursor"] is not None
+
+    response = client.get(
+        "/api/v1/categories/",
+        params={"limit": 2, "cursor": first["meta"]["next_cursor"]},
+    )
+
+    assert response.status_code == 200
+    second = response.json()
+    assert second["meta"]["page"] is None
+    assert second["meta"]["next_cursor"] is None
+    ids = [c["id"] for c in first["data"] + second["data"]]
+    assert ids == sorted(c.id for c in test_categories)
+
+
+def test_create_category_duplicate_name(client, test_categories, admin_token):
+    """Test that a unique violation is reported as a bad request."""
+    response = client.post(
+        "/api/v1/categories/",
+        json={"name": test_categories[0].name},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+
+    assert response.status_code == 400
+    assert "already exists" in response.json()["error"]
+
+
+def test_read_categories_not_modified(client, test_categories, admin_token):
+    """Test that category reads answer 304 until a category is written."""
+    response = client.get("/api/v1/categories/")
+    etag = response.headers["etag"]
+
+    not_modified = client.get("/api/v1/categories/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    client.put(
+        f"/api/v1/categories/{test_categories[0].id}",
+        json={"color": "#000000"},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    response = client.get("/api/v1/categories/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_delete_category_drops_cached_point_results(client, test_points, admin_token):
+    """Test that cached nearby results stop showing a deleted category."""
+    url = "/api/v1/points/nearby?lat=52.5163&lng=13.3777&radius=100"
+    before = client.get(url).json()
+    assert before[0]["category"] is not None
+
+    response = client.delete(
+        f"/api/v1/categories/{test_points[0].category_id}",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+
+    after = client.get(url).json()
+    assert after[0]["id"] == before[0]["id"]
+    assert after[0]["category"] is None
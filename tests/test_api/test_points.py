@@ -1,3 +1,27 @@
+import gzip
+import io
+import json
+import math
+import struct
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.core.caching import NO_STORE, CachePolicy
+from app.core.compression import CompressionPolicy, negotiate_encoding
+from app.core.constants import MAX_BATCH_ORIGINS, MAX_MATRIX_POINTS
+from app.core.encoders import negotiate
+from app.middleware.caching import CacheControlMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.repositories.point import PointRow
+from app.schemas.point import NearbyPoint, NearbyPointList
+from app.services.columnar import encode_points, table_format_for
+from app.services.upload import iter_geojson_records, validate_records
+from app.spatial import matrix as matrix_module
+
+
 def test_read_points(client, test_points):
     """Test getting all points."""
     response = client.get("/api/v1/points/")
@@ -217,6 +241,356 @@ def test_nearest_points(client, test_points):
     assert distances == sorted(distances), "Results are not ordered by distance"
 
 
+def test_nearest_points_batch(client, test_points):
+    """Test nearest points for several origins in one request."""
+    origins = [
+        {"lat": 52.5200, "lng": 13.4050, "k": 3},
+        {"lat": 52.5163, "lng": 13.3777, "k": 10, "radius": 1500},
+        {"lat": 48.8584, "lng": 2.2945, "radius": 1000},
+    ]
+
+    response = client.post("/api/v1/points/nearest/batch", json={"origins": origins})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["index"] for r in data] == [0, 1, 2]
+
+    # Same answer as the single-origin endpoint
+    single = client.get("/api/v1/points/nearest?lat=52.52&lng=13.405&limit=3").json()
+    assert [p["id"] for p in data[0]["points"]] == [p["id"] for p in single]
+
+    distances = [p["distance"] for p in data[1]["points"]]
+    assert distances == sorted(distances)
+    assert distances and all(d <= 1500 for d in distances)
+
+    # Nothing within 1 km of the Eiffel Tower
+    assert data[2]["points"] == []
+
+
+def test_nearest_points_batch_validation(client):
+    """Test that empty and oversized batches are rejected."""
+    response = client.post("/api/v1/points/nearest/batch", json={"origins": []})
+    assert response.status_code == 422
+
+    origins = [{"lat": 0, "lng": 0}] * (MAX_BATCH_ORIGINS + 1)
+    response = client.post("/api/v1/points/nearest/batch", json={"origins": origins})
+    assert response.status_code == 422
+
+
+def test_distance_matrix(client, test_points):
+    """Test a distance matrix between stored points and coordinates."""
+    ids = [p.id for p in test_points[:3]]
+    body = {
+        "sources": {"ids": ids},
+        "destinations": {"coordinates": [[13.3777, 52.5163], [2.2945, 48.8584]]},
+    }
+
+    response = client.post("/api/v1/points/distance-matrix", json=body)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["rows"] == 3 and data["columns"] == 2
+    # Brandenburg Gate to itself, and Berlin to Paris (roughly 880 km)
+    assert data["distances"][0][0] == pytest.approx(0.0, abs=0.01)
+    assert all(850000 < row[1] < 900000 for row in data["distances"])
+
+    haversine = client.post(
+        "/api/v1/points/distance-matrix", json={**body, "method": "haversine"}
+    ).json()
+    for geodesic_row, haversine_row in zip(data["distances"], haversine["distances"]):
+        # Sphere and spheroid agree to within 0.5%
+        assert haversine_row == pytest.approx(geodesic_row, rel=5e-3, abs=0.01)
+
+
+def test_distance_matrix_binary(client, test_points):
+    """Test that the matrix can be streamed as raw float64 values."""
+    ids = [p.id for p in test_points]
+    response = client.post(
+        "/api/v1/points/distance-matrix",
+        json={"sources": {"ids": ids}, "destinations": {"ids": ids[:2]}},
+        headers={"Accept": "application/octet-stream"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-matrix-rows"] == str(len(ids))
+    assert response.headers["x-matrix-columns"] == "2"
+    values = struct.unpack(f"<{len(ids) * 2}d", response.content)
+    assert values[0] == 0.0 and values[3] == 0.0
+
+
+def test_distance_matrix_streams_blocks(client, test_points, monkeypatch):
+    """Test that a geodesic matrix streamed in several blocks is unchanged."""
+    ids = [p.id for p in test_points]
+    body = {"sources": {"ids": ids}, "destinations": {"ids": ids[:2]}}
+    whole = client.post("/api/v1/points/distance-matrix", json=body).json()
+
+    # Two rows per block, so three queries for five sources
+    monkeypatch.setattr(matrix_module, "MATRIX_BLOCK_CELLS", 4)
+    response = client.post("/api/v1/points/distance-matrix", json=body)
+
+    assert response.status_code == 200
+    assert response.json() == whole
+    assert len(whole["distances"]) == len(ids)
+
+
+def test_distance_matrix_errors(client, test_points):
+    """Test unknown ids, malformed sets and oversized matrices."""
+    url = "/api/v1/points/distance-matrix"
+    ids = [p.id for p in test_points]
+
+    response = client.post(
+        url, json={"sources": {"ids": [999999]}, "destinations": {"ids": ids}}
+    )
+    assert response.status_code == 404
+
+    response = client.post(
+        url,
+        json={
+            "sources": {"ids": ids, "coordinates": [[0, 0]]},
+            "destinations": {"ids": ids},
+        },
+    )
+    assert response.status_code == 422
+
+    coordinates = [[0, 0]] * MAX_MATRIX_POINTS
+    response = client.post(
+        url,
+        json={
+            "sources": {"coordinates": coordinates},
+            "destinations": {"coordinates": coordinates},
+            "method": "haversine",
+        },
+    )
+    assert response.status_code == 400
+
+
+def test_export_points_ndjson(client, test_points):
+    """Test streaming every point as newline-delimited JSON."""
+    response = client.get("/api/v1/points/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["id"] for r in records] == sorted(p.id for p in test_points)
+    assert records[0]["coordinates"]["type"] == "Point"
+
+
+def test_export_points_geojson(client, test_points, test_categories):
+    """Test exporting one category as a GeoJSON FeatureCollection."""
+    category_id = test_categories[1].id
+    response = client.get(
+        f"/api/v1/points/export?format=geojson&category_id={category_id}"
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    data = response.json()
+    assert data["type"] == "FeatureCollection"
+    assert sorted(f["properties"]["name"] for f in data["features"]) == [
+        "Berlin TV Tower",
+        "Checkpoint Charlie",
+    ]
+    assert all(f["properties"]["category_id"] == category_id for f in data["features"])
+
+
+def test_export_points_bbox(client, test_points):
+    """Test exporting the points inside a bbox, and rejecting partial ones."""
+    response = client.get(
+        "/api/v1/points/export?min_lng=13.3&min_lat=52.5&max_lng=13.38&max_lat=52.52"
+    )
+
+    assert response.status_code == 200
+    names = [json.loads(line)["name"] for line in response.text.splitlines()]
+    assert sorted(names) == ["Brandenburg Gate", "Tiergarten"]
+
+    response = client.get("/api/v1/points/export?min_lng=13.3")
+    assert response.status_code == 400
+
+
+def test_upload_points_csv_gzip(client, test_categories, user_token):
+    """Test a gzip-compressed CSV upload, with one rejected row."""
+    body = (
+        "name,latitude,longitude,description,category\n"
+        "Reichstag,52.5186,13.3761,Parliament,Museum\n"
+        '"Potsdamer Platz, Berlin",52.5096,13.3760,,\n'
+        "Nowhere,95,13.4,,\n"
+    )
+
+    response = client.post(
+        "/api/v1/points/upload",
+        content=gzip.compress(body.encode()),
+        headers={
+            "Authorization": f"Bearer {user_token}",
+            "Content-Type": "text/csv",
+            "Content-Encoding": "gzip",
+        },
+    )
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["received"] == 3
+    assert summary["inserted"] == 2
+    assert summary["failed"] == 1
+    assert summary["errors"] == [
+        {"row": 3, "error": "latitude must be a number between -90 and 90"}
+    ]
+
+    nearby = client.get("/api/v1/points/nearby?lat=52.5186&lng=13.3761&radius=10")
+    assert [p["name"] for p in nearby.json()] == ["Reichstag"]
+    assert nearby.json()[0]["category_id"] == test_categories[1].id
+
+
+def test_upload_points_multi_member_gzip(client, test_categories, user_token):
+    """Test a gzip body of several members, and one that is not gzip at all."""
+    headers = {"Authorization": f"Bearer {user_token}", "Content-Type": "text/csv"}
+    header = "name,latitude,longitude,description,category\n"
+    body = gzip.compress(
+        (header + "Reichstag,52.5186,13.3761,,\n").encode()
+    ) + gzip.compress(b"Tiergarten,52.5145,13.3501,,\n")
+
+    response = client.post("/api/v1/points/upload", content=body, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 2
+
+    response = client.post(
+        "/api/v1/points/upload",
+        content=b"\x1f\x8bnot really gzip",
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+
+def test_upload_points_ndjson_and_geojson(client, test_categories, user_token):
+    """Test NDJSON and GeoJSON uploads."""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    records = [
+        {"name": "Reichstag", "latitude": 52.5186, "longitude": 13.3761},
+        {"name": "Bad category", "latitude": 1, "longitude": 2, "category_id": 999},
+    ]
+    response = client.post(
+        "/api/v1/points/upload",
+        content="\n".join(json.dumps(r) for r in records),
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+    assert response.json()["errors"] == [{"row": 2, "error": "unknown category"}]
+
+    collection = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [13.3761, 52.5096]},
+                "properties": {"name": "Potsdamer Platz"},
+            }
+        ],
+    }
+    response = client.post(
+        "/api/v1/points/upload?format=geojson", json=collection, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+
+
+def test_upload_points_oversized_numbers(client, test_categories, user_token):
+    """Test that numbers too large for float64 or bigint fail only their record."""
+    records = [
+        {"name": "Far away", "latitude": 10**400, "longitude": 13.4},
+        {"name": "Big id", "latitude": 1, "longitude": 2, "category_id": 10**20},
+        {"name": "Reichstag", "latitude": 52.5186, "longitude": 13.3761},
+    ]
+
+    response = client.post(
+        "/api/v1/points/upload",
+        content="\n".join(json.dumps(r) for r in records),
+        headers={
+            "Authorization": f"Bearer {user_token}",
+            "Content-Type": "application/x-ndjson",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+    assert response.json()["errors"] == [
+        {"row": 1, "error": "latitude must be a number between -90 and 90"},
+        {"row": 2, "error": "unknown category"},
+    ]
+
+
+def test_upload_points_rejected(client, user_token):
+    """Test uploads that are refused as a whole."""
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    response = client.post(
+        "/api/v1/points/upload",
+        content=b"name,lat\nA,1\n",
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/v1/points/upload",
+        content=b"A,1,2",
+        headers={**headers, "Content-Type": "text/plain"},
+    )
+    assert response.status_code == 415
+
+    response = client.post(
+        "/api/v1/points/upload",
+        content=b"name,latitude,longitude\n",
+        headers={"Content-Type": "text/csv"},
+    )
+    assert response.status_code == 401
+
+
+def test_upload_geojson_records_streamed():
+    """Test that features are read one at a time from small reads."""
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [13.0 + i, 52.0]},
+            "properties": {"name": f"p{i}"},
+        }
+        for i in range(50)
+    ]
+    body = json.dumps(
+        {"features": features, "bbox": [13, 52, 63, 52], "type": "FeatureCollection"}
+    )
+
+    with patch("app.services.upload._READ_SIZE", 16):
+        records = list(iter_geojson_records(io.BytesIO(body.encode())))
+
+    assert [row for row, _ in records] == list(range(1, 51))
+    assert records[-1][1] == {"name": "p49", "latitude": 52.0, "longitude": 62.0}
+
+
+def test_upload_validate_records():
+    """Test that each record is staged or gets the first reason it fails."""
+    records = [
+        (1, {"name": "A", "latitude": "52.5", "longitude": "13.4", "category": "Park"}),
+        (2, {"name": "", "latitude": 1, "longitude": 2}),
+        (3, {"name": "B", "latitude": "north", "longitude": 2}),
+        (4, {"name": "C", "latitude": 1, "longitude": 200}),
+        (5, {"name": "D", "latitude": 1, "longitude": 2, "category_id": "7"}),
+        (6, "invalid JSON"),
+    ]
+
+    staged, errors = validate_records(records, {"Park": 3})
+
+    assert staged == [(1, "A", None, 13.4, 52.5, 3)]
+    assert [(e.row, e.error) for e in errors] == [
+        (2, "name must be a non-empty string"),
+        (3, "latitude must be a number between -90 and 90"),
+        (4, "longitude must be a number between -180 and 180"),
+        (5, "unknown category"),
+        (6, "invalid JSON"),
+    ]
+
+
 def test_within_polygon(client, test_points):
     """Test finding points within a polygon."""
     # Create a WKT polygon covering central Berlin
@@ -264,3 +638,824 @@ def test_filter_points_by_category(client, test_points, test_categories):
     # All returned points should have the requested category
     for point in data["data"]:
         assert point["category_id"] == park_category_id
+
+
+def test_nearby_points_bbox_strategy(client, test_points):
+    """Test that the bbox strategy gives the same nearby results."""
+    lat, lng = 52.5163, 13.3777  # Brandenburg Gate
+
+    response_default = client.get(
+        f"/api/v1/points/nearby?lat={lat}&lng={lng}&radius=3000"
+    )
+    response_bbox = client.get(
+        f"/api/v1/points/nearby?lat={lat}&lng={lng}&radius=3000&strategy=bbox"
+    )
+
+    # Verify responses
+    assert response_default.status_code == 200
+    assert response_bbox.status_code == 200
+
+    default_ids = [point["id"] for point in response_default.json()]
+    bbox_ids = [point["id"] for point in response_bbox.json()]
+    assert bbox_ids == default_ids
+
+
+def test_nearby_points_invalid_strategy(client):
+    """Test that an unknown nearby strategy is rejected."""
+    response = client.get(
+        "/api/v1/points/nearby?lat=52.5&lng=13.4&radius=500&strategy=magic"
+    )
+
+    assert response.status_code == 422
+
+
+def tile_url(lat, lng, z):
+    """URL of the tile containing lat/lng at zoom z."""
+    n = 2**z
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return f"/api/v1/points/tiles/{z}/{x}/{y}.mvt"
+
+
+def test_get_point_tile(client, test_points):
+    """Test that a vector tile contains the points inside it."""
+    url = tile_url(52.5163, 13.3777, 12)  # Brandenburg Gate
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    assert response.headers["etag"]
+    # MVT stores attribute values as plain UTF-8 strings
+    assert b"Brandenburg Gate" in response.content
+    assert b"Eiffel Tower" not in response.content
+
+
+def test_get_point_tile_category_filter(client, test_points, test_categories):
+    """Test that tiles can be filtered by category."""
+    url = tile_url(52.5163, 13.3777, 12)
+    other_category = next(
+        c.id for c in test_categories if c.id != test_points[0].category_id
+    )
+
+    response = client.get(f"{url}?category_id={test_points[0].category_id}")
+    filtered = client.get(f"{url}?category_id={other_category}")
+
+    assert test_points[0].name.encode() in response.content
+    assert test_points[0].name.encode() not in filtered.content
+
+
+def test_get_point_tile_not_modified(client, test_points):
+    """Test conditional tile requests."""
+    url = tile_url(52.5163, 13.3777, 12)
+    etag = client.get(url).headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+def test_get_point_tile_invalidated_on_write(client, test_points, admin_token):
+    """Test that writes drop the cached tiles they touch."""
+    url = tile_url(52.5163, 13.3777, 12)
+    before = client.get(url)
+    assert b"Brandenburg Gate" in before.content
+
+    response = client.delete(
+        f"/api/v1/points/{test_points[0].id}",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+
+    after = client.get(url, headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert b"Brandenburg Gate" not in after.content
+
+
+def test_get_point_tile_out_of_range(client):
+    """Test that tile coordinates outside the zoom level are rejected."""
+    response = client.get("/api/v1/points/tiles/2/4/0.mvt")
+
+    assert response.status_code == 400
+
+
+BERLIN_BBOX = "min_lng=13.30&min_lat=52.48&max_lng=13.46&max_lat=52.54"
+
+
+def test_get_point_clusters(client, test_points, test_categories):
+    """Test that a zoomed-out view returns one cluster for all Berlin points."""
+    response = client.get(
+        "/api/v1/points/clusters?min_lng=-10&min_lat=35&max_lng=30&max_lat=60&zoom=3"
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+
+    cluster = data[0]
+    assert cluster["count"] == len(test_points)
+    lng, lat = cluster["coordinates"]["coordinates"]
+    assert 13.3 < lng < 13.5
+    assert 52.4 < lat < 52.6
+
+    breakdown = {c["category_id"]: c["count"] for c in cluster["categories"]}
+    assert breakdown == {
+        test_categories[0].id: 1,
+        test_categories[1].id: 2,
+        test_categories[2].id: 2,
+    }
+
+
+def test_get_point_clusters_zoomed_in(client, test_points):
+    """Test that zooming in splits clusters without losing points."""
+    response = client.get(f"/api/v1/points/clusters?{BERLIN_BBOX}&zoom=13")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) > 1
+    assert sum(c["count"] for c in data) == len(test_points)
+
+
+def test_get_point_clusters_category_filter(client, test_points, test_categories):
+    """Test that clusters can be restricted to one category."""
+    response = client.get(
+        f"/api/v1/points/clusters?{BERLIN_BBOX}&zoom=5"
+        f"&category_id={test_categories[1].id}"
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert sum(c["count"] for c in data) == 2
+
+
+def test_get_point_clusters_refreshed_after_write(client, test_points, user_token):
+    """Test that creating a point invalidates the cached clusters around it."""
+    url = f"/api/v1/points/clusters?{BERLIN_BBOX}&zoom=5"
+    assert sum(c["count"] for c in client.get(url).json()) == len(test_points)
+
+    response = client.post(
+        "/api/v1/points/",
+        json={"name": "Museum Island", "latitude": 52.5169, "longitude": 13.4019},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 201
+
+    assert sum(c["count"] for c in client.get(url).json()) == len(test_points) + 1
+
+
+def test_get_point_clusters_bbox_too_large(client):
+    """Test that a bbox spanning too many tiles for the zoom is rejected."""
+    response = client.get(
+        "/api/v1/points/clusters?min_lng=-180&min_lat=-80&max_lng=180&max_lat=80&zoom=10"
+    )
+
+    assert response.status_code == 400
+
+
+def test_bulk_create_points(client, test_categories, user_token):
+    """Test creating many points in one request."""
+    points = [
+        {
+            "name": f"Bulk Point {i}",
+            "latitude": 52.5 + i / 1000,
+            "longitude": 13.4,
+            "category_id": test_categories[i % 3].id,
+        }
+        for i in range(50)
+    ]
+
+    response = client.post(
+        "/api/v1/points/bulk",
+        json=points,
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert [p["name"] for p in data] == [p["name"] for p in points]
+    assert data[7]["latitude"] == pytest.approx(52.507)
+    assert data[7]["category_id"] == test_categories[1].id
+
+
+def test_bulk_create_points_invalid(client, test_categories, user_token):
+    """Test that one bad item or unknown category rejects the whole batch."""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    good = {"name": "Good", "latitude": 52.5, "longitude": 13.4}
+
+    response = client.post(
+        "/api/v1/points/bulk",
+        json=[good, {**good, "latitude": 91}],
+        headers=headers,
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", 1, "latitude"]
+
+    response = client.post(
+        "/api/v1/points/bulk",
+        json=[good, {**good, "category_id": 999999}],
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert client.get("/api/v1/points/").json()["meta"]["total"] == 0
+
+
+def test_bulk_update_points(client, test_points, test_categories, user_token):
+    """Test updating many points, each with its own set of fields."""
+    response = client.patch(
+        "/api/v1/points/bulk",
+        json=[
+            {"id": test_points[0].id, "name": "Renamed Gate"},
+            {"id": test_points[1].id, "latitude": 48.8584, "longitude": 2.2945},
+            {"id": test_points[2].id, "category_id": None},
+        ],
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [p["id"] for p in data] == [p.id for p in test_points[:3]]
+    assert data[0]["name"] == "Renamed Gate"
+    assert (data[1]["latitude"], data[1]["longitude"]) == pytest.approx(
+        (48.8584, 2.2945)
+    )
+    assert data[2]["category_id"] is None
+
+    response = client.get(
+        "/api/v1/points/nearest", params={"lat": 48.8584, "lng": 2.2945, "limit": 1}
+    )
+    assert response.json()[0]["id"] == test_points[1].id
+
+
+def test_bulk_update_points_not_found(client, test_points, user_token):
+    """Test that updating a missing point changes nothing."""
+    response = client.patch(
+        "/api/v1/points/bulk",
+        json=[
+            {"id": test_points[0].id, "name": "Renamed Gate"},
+            {"id": 999999, "name": "Nowhere"},
+        ],
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 404
+    response = client.get(f"/api/v1/points/{test_points[0].id}")
+    assert response.json()["name"] == test_points[0].name
+
+
+def test_bulk_delete_points(client, test_points, admin_token, user_token):
+    """Test deleting many points (requires admin rights)."""
+    ids = [test_points[0].id, test_points[1].id]
+
+    response = client.request(
+        "DELETE",
+        "/api/v1/points/bulk",
+        json={"ids": ids},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 403
+
+    response = client.request(
+        "DELETE",
+        "/api/v1/points/bulk",
+        json={"ids": ids + [999999]},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 404
+
+    response = client.request(
+        "DELETE",
+        "/api/v1/points/bulk",
+        json={"ids": ids},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"deleted": ids}
+    for point_id in ids:
+        assert client.get(f"/api/v1/points/{point_id}").status_code == 404
+    assert client.get(f"/api/v1/points/{test_points[2].id}").status_code == 200
+
+
+@pytest.mark.parametrize("order", ["id", "created_at"])
+def test_read_points_cursor(client, test_points, order):
+    """Test that cursor pages walk every point once, in the same order as offsets."""
+    params = {"limit": 2, "order": order}
+    offset_ids = [
+        p["id"]
+        for p in client.get("/api/v1/points/", params={**params, "limit": 100}).json()[
+            "data"
+        ]
+    ]
+
+    ids, cursor = [], None
+    while True:
+        response = client.get(
+            "/api/v1/points/", params={**params, "cursor": cursor} if cursor else params
+        )
+        assert response.status_code == 200
+        data = response.json()
+        ids += [p["id"] for p in data["data"]]
+        cursor = data["meta"]["next_cursor"]
+        if cursor is None:
+            break
+
+    assert ids == offset_ids
+    assert len(ids) == len(test_points)
+
+
+def test_read_points_invalid_cursor(client, test_points):
+    """Test that a cursor that was not issued by the API is rejected."""
+    response = client.get("/api/v1/points/", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+
+def test_within_polygon_cursor(client, test_points):
+    """Test paging through polygon results with the Link header."""
+    polygon_wkt = "POLYGON((13.3 52.5, 13.3 52.55, 13.45 52.55, 13.45 52.5, 13.3 52.5))"
+
+    response = client.post(
+        "/api/v1/points/within", params={"polygon_wkt": polygon_wkt, "limit": 1}
+    )
+    assert response.status_code == 200
+    first_id = response.json()[0]["id"]
+    next_url = response.links["next"]["url"]
+
+    response = client.post(next_url)
+
+    assert response.status_code == 200
+    ids = [p["id"] for p in response.json()]
+    assert ids and min(ids) > first_id
+
+
+@pytest.mark.parametrize("count", ["exact", "estimated", "cached", "none"])
+def test_read_points_count_strategy(client, test_points, count):
+    """Test that each count strategy reports itself alongside the total."""
+    response = client.get("/api/v1/points/", params={"count": count, "limit": 2})
+
+    assert response.status_code == 200
+    meta = response.json()["meta"]
+    assert meta["count_strategy"] == count
+    if count == "none":
+        assert meta["total"] is None and meta["pages"] is None
+    elif count == "estimated":
+        assert meta["total"] >= 0
+    else:
+        assert meta["total"] == len(test_points)
+        assert meta["pages"] == (len(test_points) + 1) // 2
+
+
+def test_read_points_cached_count_follows_writes(
+    client, test_points, test_categories, user_token, admin_token
+):
+    """Test that cached counts are adjusted by creates, moves and deletes."""
+    museum_id = test_categories[1].id
+
+    def cached_total(**params):
+        response = client.get("/api/v1/points/", params={"count": "cached", **params})
+        return response.json()["meta"]["total"]
+
+    museums = sum(1 for p in test_points if p.category_id == museum_id)
+    assert cached_total(category_id=museum_id) == museums
+
+    response = client.post(
+        "/api/v1/points/",
+        json={
+            "name": "New Museum",
+            "latitude": 52.52,
+            "longitude": 13.4,
+            "category_id": museum_id,
+        },
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    new_id = response.json()["id"]
+    assert cached_total(category_id=museum_id) == museums + 1
+    assert cached_total() == len(test_points) + 1
+
+    client.put(
+        f"/api/v1/points/{new_id}",
+        json={"category_id": test_categories[0].id},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert cached_total(category_id=museum_id) == museums
+
+    client.delete(
+        f"/api/v1/points/{new_id}", headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert cached_total() == len(test_points)
+
+
+def test_create_point_unknown_category(client, user_token):
+    """Test that a foreign key violation is reported as a bad request."""
+    response = client.post(
+        "/api/v1/points/",
+        json={"name": "Lost", "latitude": 52.5, "longitude": 13.4, "category_id": 999},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 400
+    assert "Category with ID 999 not found" in response.json()["error"]
+
+
+def test_update_point_not_found(client, user_token):
+    """Test that updating a missing point is a 404."""
+    response = client.put(
+        "/api/v1/points/999999",
+        json={"name": "Nowhere"},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 404
+
+
+def test_point_from_row_matches_validated():
+    """Test that schemas placed from rows serialize like validated ones."""
+    now = datetime.now(timezone.utc)
+    with_category = PointRow(
+        1, "Reichstag", None, 2, now, now, 52.5186, 13.3761, "Museum", None, "#aa0000"
+    )
+    without_category = with_category._replace(
+        category_id=None, category_name=None, category_color=None
+    )
+
+    for row in (with_category, without_category):
+        point = NearbyPoint.from_row(row, distance=12.5)
+        validated = NearbyPoint.model_validate(json.loads(point.model_dump_json()))
+        assert NearbyPointList.dump_json([point]) == NearbyPointList.dump_json(
+            [validated]
+        )
+    assert NearbyPoint.from_row(without_category, distance=0.0).category is None
+
+
+def test_negotiate_encoder():
+    """Test that Accept picks the highest-q supported encoder, else JSON."""
+    pytest.importorskip("msgpack")
+
+    assert negotiate(None).media_type == "application/json"
+    assert negotiate("*/*").media_type == "application/json"
+    assert negotiate("text/html, image/png").media_type == "application/json"
+    assert negotiate("application/msgpack").media_type == "application/msgpack"
+    assert (
+        negotiate("application/json;q=0.5, application/x-msgpack").media_type
+        == "application/msgpack"
+    )
+    assert (
+        negotiate("application/msgpack;q=0, application/json").media_type
+        == "application/json"
+    )
+
+
+def test_nearby_points_msgpack(client, test_points):
+    """Test that nearby points come as MessagePack with native timestamps."""
+    msgpack = pytest.importorskip("msgpack")
+    url = "/api/v1/points/nearby?lat=52.5163&lng=13.3777&radius=5000"
+
+    as_json = client.get(url)
+    response = client.get(url, headers={"Accept": "application/msgpack"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"]
+    points = msgpack.unpackb(response.content, timestamp=3)
+    assert [p["id"] for p in points] == [p["id"] for p in as_json.json()]
+    assert isinstance(points[0]["created_at"], datetime)
+    assert points[0]["coordinates"] == as_json.json()[0]["coordinates"]
+
+
+def test_encode_points_columnar():
+    """Test that rows become an Arrow stream and a GeoParquet file."""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    now = datetime.now(timezone.utc)
+    rows = [
+        PointRow(
+            1, "Reichstag", None, 2, now, now, 52.5186, 13.3761, "Museum", None, None
+        ),
+        PointRow(2, "Tower", "Old", None, now, now, 51.5081, -0.0759, None, None, None),
+    ]
+
+    arrow = encode_points(rows, table_format_for("application/vnd.apache.arrow.stream"))
+    table = pa.ipc.open_stream(arrow.content).read_all()
+    assert arrow.media_type == "application/vnd.apache.arrow.stream"
+    assert table.column("id").to_pylist() == [1, 2]
+    assert table.column("lng").to_pylist() == [13.3761, -0.0759]
+    assert table.column("category_id").to_pylist() == [2, None]
+
+    parquet = encode_points(
+        rows, table_format_for("application/vnd.apache.parquet"), distances=[0.0, 5.5]
+    )
+    table = pq.read_table(io.BytesIO(parquet.content))
+    geo = json.loads(table.schema.metadata[b"geo"])
+    assert geo["columns"]["geometry"]["encoding"] == "WKB"
+    assert table.column("distance").to_pylist() == [0.0, 5.5]
+    # Little-endian WKB Point: x is longitude, y is latitude
+    assert struct.unpack("<BIdd", table.column("geometry")[1].as_py()) == (
+        1,
+        1,
+        -0.0759,
+        51.5081,
+    )
+
+    assert (
+        table_format_for("application/json, application/vnd.apache.parquet;q=0.5")
+        is None
+    )
+    assert table_format_for("*/*") is None
+
+
+def test_nearby_points_arrow(client, test_points):
+    """Test that nearby points come as an Arrow stream when Accept asks for one."""
+    pa = pytest.importorskip("pyarrow")
+    url = "/api/v1/points/nearby?lat=52.5163&lng=13.3777&radius=5000"
+
+    as_json = client.get(url).json()
+    response = client.get(
+        url, headers={"Accept": "application/vnd.apache.arrow.stream"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    assert "Accept" in response.headers["vary"]
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == [p["id"] for p in as_json]
+    assert table.column("distance").to_pylist() == pytest.approx(
+        [p["distance"] for p in as_json]
+    )
+
+    response = client.get(
+        "/api/v1/points/?limit=1",
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert pa.ipc.open_stream(response.content).read_all().num_rows == 1
+    assert int(response.headers["x-total-count"]) == len(test_points)
+
+
+def test_export_points_parquet(client, test_points):
+    """Test exporting all points as GeoParquet."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    response = client.get("/api/v1/points/export?format=parquet")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.content))
+    assert sorted(table.column("id").to_pylist()) == sorted(p.id for p in test_points)
+    assert b"geo" in table.schema.metadata
+
+
+def test_negotiate_encoding():
+    """Test that Accept-Encoding picks the highest-q coding we support."""
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("*") is not None
+
+
+def test_compression_middleware():
+    """Test buffered and streamed compression, the threshold and pass-through."""
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse, StreamingResponse
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get("/large")
+    def large():
+        return [{"name": "point", "lat": 52.5, "lng": 13.4}] * 200
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 5000)
+
+    @app.get("/stream")
+    def stream():
+        lines = (b'{"id": %d}\n' % i for i in range(1000))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    app.add_middleware(
+        CompressionMiddleware,
+        default=CompressionPolicy(minimum_size=500),
+        path_policies={"/stream": CompressionPolicy(minimum_size=0)},
+    )
+    client = TestClient(app)
+    accept = {"Accept-Encoding": "gzip"}
+
+    response = client.get("/large", headers=accept)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()[0]["name"] == "point"
+
+    assert "content-encoding" not in client.get("/small", headers=accept).headers
+    assert "content-encoding" not in client.get("/text", headers=accept).headers
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+    response = client.get("/stream", headers=accept)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.splitlines()[-1] == '{"id": 999}'
+
+
+def test_nearby_points_compressed(client, test_points):
+    """Test that large nearby responses are compressed when accepted."""
+    url = "/api/v1/points/nearby?lat=52.5163&lng=13.3777&radius=100000&limit=1000"
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.json() == plain.json()
+    if len(plain.content) >= settings.COMPRESSION_MINIMUM_SIZE:
+        assert response.headers["content-encoding"] == "gzip"
+    else:
+        assert "content-encoding" not in response.headers
+
+
+def test_get_point_tile_precompressed(client, test_points):
+    """Test that cached tiles are served from their compressed copy."""
+    url = tile_url(52.5163, 13.3777, 12)
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+    assert response.content == plain.content
+    assert "Accept-Encoding" in response.headers["vary"]
+    if len(plain.content) >= settings.COMPRESSION_MINIMUM_SIZE:
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"] != plain.headers["etag"]
+    else:
+        assert response.headers["etag"] == plain.headers["etag"]
+    not_modified = client.get(
+        url,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]},
+    )
+    assert not_modified.status_code == 304
+
+
+def test_nearby_points_cache_invalidated_on_write(client, test_points, user_token):
+    """Test that a write inside a cached search area drops the cached result."""
+    url = "/api/v1/points/nearby?lat=52.5163&lng=13.3777&radius=5000"
+    before = client.get(url).json()
+
+    response = client.post(
+        "/api/v1/points/",
+        json={"name": "Fresh Point", "latitude": 52.5170, "longitude": 13.3780},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 201
+
+    after = client.get(url).json()
+    assert len(after) == len(before) + 1
+    assert response.json()["id"] in [p["id"] for p in after]
+
+
+def test_cache_control_middleware():
+    """Test per-route Cache-Control, the no-store default and state ETags."""
+    from fastapi import FastAPI, Request
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int, request: Request):
+        request.state.etag = 'W/"v1"'
+        return {"id": item_id}
+
+    @app.post("/items/{item_id}")
+    def write_item(item_id: int, request: Request):
+        request.state.etag = 'W/"v1"'
+        return {"id": item_id}
+
+    @app.get("/health")
+    def health():
+        return {"ok": True}
+
+    app.add_middleware(
+        CacheControlMiddleware,
+        default=NO_STORE,
+        route_policies={
+            "/items/{item_id}": CachePolicy(max_age=10, stale_while_revalidate=60)
+        },
+    )
+    client = TestClient(app)
+
+    response = client.get("/items/1")
+    assert response.headers["cache-control"] == (
+        "public, max-age=10, stale-while-revalidate=60"
+    )
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "Accept" in response.headers["vary"]
+
+    response = client.post("/items/1")
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    assert client.get("/health").headers["cache-control"] == "no-store"
+
+
+def test_read_point_not_modified(client, test_points, admin_token):
+    """Test that a point answers If-None-Match with 304 until it changes."""
+    url = f"/api/v1/points/{test_points[0].id}"
+    response = client.get(url)
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public")
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.content == b""
+
+    # The point embeds its category, so writing the category changes it too
+    # (updated_at can't move here: every test runs in a single transaction)
+    client.put(
+        f"/api/v1/categories/{test_points[0].category_id}",
+        json={"color": "#000000"},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["category"]["color"] == "#000000"
+    assert response.headers["etag"] != etag
+
+
+def test_nearby_points_not_modified(client, test_points, user_token):
+    """Test that spatial queries revalidate against the points' data version."""
+    url = "/api/v1/points/nearby?lat=52.5163&lng=13.3777&radius=5000"
+    etag = client.get(url).headers["etag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    # Another query, or another representation of it, has its own ETag
+    other = client.get(url + "&limit=1", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    msgpack = client.get(
+        url, headers={"If-None-Match": etag, "Accept": "application/msgpack"}
+    )
+    assert msgpack.status_code == 200
+
+    client.post(
+        "/api/v1/points/",
+        json={"name": "Far Away", "latitude": -33.86, "longitude": 151.21},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_nearby_points_canonical_redirect(client, test_points):
+    """Test that off-grid nearby circles redirect to their canonical URL."""
+    url = "/api/v1/points/nearby?lat=52.516301&lng=13.377698&radius=500"
+
+    with patch.object(settings, "NEARBY_CANONICAL_MODE", "redirect"):
+        response = client.get(url, follow_redirects=False)
+        assert response.status_code == 307
+        location = response.headers["location"]
+        assert "lat=52.516" in location and "lng=13.378" in location
+
+        canonical = client.get(location, follow_redirects=False)
+        assert canonical.status_code == 200
+        assert "Brandenburg Gate" in [p["name"] for p in canonical.json()]
+
+
+def test_nearby_points_canonical_content_location(client, test_points):
+    """Test that the canonical circle can be served in place."""
+    url = "/api/v1/points/nearby?lat=52.516301&lng=13.377698&radius=500"
+
+    with patch.object(settings, "NEARBY_CANONICAL_MODE", "content-location"):
+        response = client.get(url)
+
+    assert response.status_code == 200
+    assert "radius=1000" in response.headers["content-location"]
+    assert "Brandenburg Gate" in [p["name"] for p in response.json()]
+    assert "content-location" not in client.get(url).headers
+
+
+def test_write_points_msgpack(client, test_points, user_token):
+    """Test that writes encode datetimes natively too, like reads do."""
+    msgpack = pytest.importorskip("msgpack")
+    headers = {
+        "Accept": "application/msgpack",
+        "Authorization": f"Bearer {user_token}",
+    }
+
+    created = client.post(
+        "/api/v1/points/",
+        json={"name": "Packed Point", "latitude": 52.5, "longitude": 13.4},
+        headers=headers,
+    )
+    updated = client.put(
+        f"/api/v1/points/{test_points[0].id}",
+        json={"name": "Packed Gate"},
+        headers=headers,
+    )
+
+    assert created.status_code == 201
+    assert updated.status_code == 200
+    for response in (created, updated):
+        assert response.headers["content-type"] == "application/msgpack"
+        point = msgpack.unpackb(response.content, timestamp=3)
+        assert isinstance(point["created_at"], datetime)
+        assert isinstance(point["updated_at"], datetime)
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point as ShapelyPoint
+from sqlalchemy.orm import Session
+
+from app.core.security import get_password_hash
+from app.models.category import Category
+from app.models.point import Point
+from app.models.user import User
+
+
+@pytest.fixture(scope="function")
+def committed_points(async_client, test_db_engine):
+    """Categories, points and a user committed where asyncpg sessions can see them."""
+    with Session(test_db_engine, expire_on_commit=False) as session:
+        park = Category(name="Park", description="Green spaces", color="#5733FF")
+        session.add(park)
+        session.flush()
+        points = [
+            Point(
+                name="Brandenburg Gate",
+                geometry=from_shape(ShapelyPoint(13.3777, 52.5163), srid=4326),
+                category_id=park.id,
+            ),
+            Point(
+                name="Tiergarten",
+                geometry=from_shape(ShapelyPoint(13.3500, 52.5150), srid=4326),
+                category_id=park.id,
+            ),
+        ]
+        session.add_all(points)
+        session.add(
+            User(
+                email="user@example.com",
+                username="regular_user",
+                hashed_password=get_password_hash("User123!"),
+            )
+        )
+        session.commit()
+    return points
+
+
+@pytest.fixture(scope="function")
+def async_user_token(async_client, committed_points):
+    """A token for the committed user, issued through the async runner."""
+    response = async_client.post(
+        "/api/v1/auth/token",
+        data={"username": "user@example.com", "password": "User123!"},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["access_token"]
+
+
+# Each test runs on AsyncSessionRunner, through SQLAlchemy's greenlet bridge
+
+
+def test_read_points_async(async_client, committed_points):
+    """Test listing, fetching and searching points on the async runner."""
+    response = async_client.get("/api/v1/points/")
+    assert response.status_code == 200
+    names = sorted(p["name"] for p in response.json()["data"])
+    assert names == ["Brandenburg Gate", "Tiergarten"]
+
+    gate = committed_points[0]
+    response = async_client.get(f"/api/v1/points/{gate.id}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Brandenburg Gate"
+
+    response = async_client.get(
+        "/api/v1/points/nearby?lat=52.5163&lng=13.3777&radius=1000"
+    )
+    assert response.status_code == 200
+    assert [p["name"] for p in response.json()] == ["Brandenburg Gate"]
+
+
+def test_write_points_async(async_client, async_user_token):
+    """Test creating, updating and deleting a point on the async runner."""
+    headers = {"Authorization": f"Bearer {async_user_token}"}
+
+    response = async_client.post(
+        "/api/v1/points/",
+        json={"name": "Reichstag", "latitude": 52.5186, "longitude": 13.3761},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    point_id = response.json()["id"]
+
+    response = async_client.put(
+        f"/api/v1/points/{point_id}", json={"name": "Bundestag"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["name"] == "Bundestag"
+
+    response = async_client.delete(f"/api/v1/points/{point_id}", headers=headers)
+    assert response.status_code == 200
+    assert async_client.get(f"/api/v1/points/{point_id}").status_code == 404
+
+
+def test_upload_points_async(async_client, async_user_token):
+    """Test that an upload is staged with asyncpg's COPY."""
+    body = (
+        "name,latitude,longitude,description,category\n"
+        "Reichstag,52.5186,13.3761,Parliament,Park\n"
+        "Nowhere,95,13.4,,\n"
+    )
+
+    response = async_client.post(
+        "/api/v1/points/upload",
+        content=body,
+        headers={
+            "Authorization": f"Bearer {async_user_token}",
+            "Content-Type": "text/csv",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+    assert response.json()["failed"] == 1
+    nearby = async_client.get("/api/v1/points/nearby?lat=52.5186&lng=13.3761&radius=10")
+    assert [p["name"] for p in nearby.json()] == ["Reichstag"]
+
+
+def test_export_points_async(async_client, committed_points):
+    """Test a streamed export on a runner opened for the response."""
+    response = async_client.get("/api/v1/points/export")
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["name"] for row in rows] == [p.name for p in committed_points]
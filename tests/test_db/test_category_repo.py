@@ -240,3 +240,39 @@ def test_count_categories(category_repository, test_categories):
 
     # Verify we get the expected count
     assert count == len(test_categories)
+
+
+def test_get_categories_keyset(category_repository, test_categories):
+    """Test getting the categories after a keyset cursor."""
+    first = category_repository.get_multi(limit=1)
+
+    rest = category_repository.get_multi(after=(first[0].id,))
+
+    assert [c.id for c in first + rest] == sorted(c.id for c in test_categories)
+
+
+def test_category_write_returning(
+    category_repository, point_repository, db_session, test_categories, test_points
+):
+    """Test single-statement category writes."""
+    category = category_repository.insert_category(
+        obj_data={"name": "Cafe", "description": None, "color": "#884400"}
+    )
+    assert category.id is not None
+
+    updated = category_repository.update_category(
+        id=category.id, obj_data={"color": "#000000"}
+    )
+    assert (updated.name, updated.color) == ("Cafe", "#000000")
+    assert (
+        category_repository.update_category(id=999999, obj_data={"name": "x"}) is None
+    )
+
+    # Deleting a category detaches its points, as the ORM delete did
+    park = test_categories[2]
+    park_points = [p.id for p in test_points if p.category_id == park.id]
+    assert category_repository.delete_category(id=park.id).id == park.id
+    db_session.expire_all()
+    assert category_repository.get(id=park.id) is None
+    assert all(point_repository.get(id=i).category_id is None for i in park_points)
+    assert category_repository.delete_category(id=park.id) is None
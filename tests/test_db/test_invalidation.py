@@ -0,0 +1,167 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.constants import CacheEntity
+from app.services import invalidation
+from app.services.category import CategoryService
+from app.services.counts import PointCounts
+from app.services.invalidation import (
+    FLUSH,
+    ChangeEvent,
+    InvalidationBus,
+    decode_payload,
+    encode_events,
+    publish,
+    register_caches,
+    run_invalidation_listener,
+)
+from app.services.query_cache import QueryCache
+from app.spatial.point_index import PointIndex
+from app.spatial.queries import radius_envelopes
+from app.spatial.tiles import TileCache, make_tile
+
+
+def test_encode_events_round_trip():
+    """Test that events survive a payload and large batches are split."""
+    events = [
+        ChangeEvent(CacheEntity.POINT, i, (52.5, 13.4), (52.6, 13.5), 3)
+        for i in range(500)
+    ]
+
+    payloads = list(encode_events(events))
+
+    assert len(payloads) > 1
+    assert all(len(p.encode()) <= invalidation.MAX_PAYLOAD_BYTES for p in payloads)
+    decoded = []
+    for payload in payloads:
+        origin, batch = decode_payload(payload)
+        assert origin == invalidation.WORKER_ID
+        decoded.extend(batch)
+    assert decoded == events
+
+
+def test_bus_skips_own_events():
+    """Test that a worker ignores its own notifications, but not others'."""
+    bus = InvalidationBus()
+    received = []
+    bus.subscribe(CacheEntity.CATEGORY, received.append)
+    event = ChangeEvent(CacheEntity.CATEGORY, 1)
+    (payload,) = encode_events([event])
+
+    bus.handle_payload(payload)
+    assert received == []
+
+    bus.handle_payload(payload.replace(invalidation.WORKER_ID, "another-worker"))
+    assert received == [event]
+
+
+def test_bus_flushes_on_unreadable_or_flush_events():
+    """Test that flush handlers run for FLUSH and for payloads we can't read."""
+    bus = InvalidationBus()
+    flushes = []
+    bus.on_flush(lambda: flushes.append(True))
+
+    (payload,) = encode_events([FLUSH])
+    bus.handle_payload(payload.replace(invalidation.WORKER_ID, "another-worker"))
+    bus.handle_payload("not json")
+
+    assert len(flushes) == 2
+
+
+def test_register_caches_applies_point_events():
+    """Test that another worker's point write reaches each local cache."""
+    bus = InvalidationBus()
+    tile_cache = TileCache(max_bytes=1024, ttl=60)
+    query_cache = QueryCache(max_entries=8, ttl=60)
+    point_counts = PointCounts(ttl=60)
+    point_index = PointIndex()
+    register_caches(
+        bus,
+        tile_caches=[tile_cache],
+        query_cache=query_cache,
+        point_counts=point_counts,
+        point_index=point_index,
+    )
+    tile_cache.put((10, 550, 335), None, make_tile(b"berlin"))
+    query_cache.put(
+        "berlin", [], radius_envelopes(52.5163, 13.3777, 5000), query_cache.generation
+    )
+    point_counts.get(None, lambda: {3: 10})
+
+    bus.dispatch(ChangeEvent(CacheEntity.POINT, 42, None, (52.5163, 13.3777), 3))
+
+    assert tile_cache.get((10, 550, 335), None) is None
+    assert query_cache.get("berlin") is None
+    assert point_counts.get(3, lambda: {}) == 11
+    assert len(point_index) == 1
+
+    bus.dispatch(ChangeEvent(CacheEntity.POINT, 42, (52.5163, 13.3777), None, 3))
+    assert point_counts.get(3, lambda: {}) == 10
+    assert len(point_index) == 0
+
+
+@pytest.mark.asyncio
+async def test_listener_receives_committed_events(test_db_engine, monkeypatch):
+    """Test that events reach other workers on commit, and never on rollback."""
+    bus = InvalidationBus()
+    received = []
+    bus.subscribe(CacheEntity.CATEGORY, received.append)
+    connected = asyncio.Event()
+    bus.on_flush(connected.set)
+    dsn = test_db_engine.url.render_as_string(hide_password=False)
+
+    listener = asyncio.create_task(run_invalidation_listener(bus, dsn))
+    try:
+        await asyncio.wait_for(connected.wait(), timeout=5)
+        with monkeypatch.context() as m:
+            # Sent as if by another worker
+            m.setattr(invalidation, "WORKER_ID", "another-worker")
+            with Session(test_db_engine) as session:
+                publish(session, [ChangeEvent(CacheEntity.CATEGORY, 1)])
+                session.rollback()
+                publish(session, [ChangeEvent(CacheEntity.CATEGORY, 2)])
+                session.commit()
+        for _ in range(50):
+            if received:
+                break
+            await asyncio.sleep(0.1)
+    finally:
+        listener.cancel()
+
+    assert received == [ChangeEvent(CacheEntity.CATEGORY, 2)]
+
+
+def test_category_delete_flushes_point_caches(monkeypatch):
+    """Test that deleting a category drops every cache its points were in."""
+    published = []
+    monkeypatch.setattr(
+        "app.services.category.publish",
+        lambda session, events: published.extend(events),
+    )
+    repository = MagicMock()
+    repository.delete_category.return_value = SimpleNamespace(
+        id=3, name="Park", description=None, color=None
+    )
+    query_cache = QueryCache(max_entries=8, ttl=60)
+    tile_cache = TileCache(max_bytes=1024, ttl=60)
+    point_counts = PointCounts(ttl=60)
+    point_index = PointIndex()
+    point_index.synced_at = 0.0
+    service = CategoryService(
+        repository, query_cache, tile_cache, None, point_counts, point_index
+    )
+    query_cache.put("berlin", [], radius_envelopes(52.5, 13.4, 5000), 0)
+    tile_cache.put((10, 550, 335), 3, make_tile(b"parks"))
+    point_counts.get(None, lambda: {3: 10})
+
+    service.delete_category(category_id=3)
+
+    assert published == [FLUSH]
+    assert query_cache.get("berlin") is None
+    assert tile_cache.get((10, 550, 335), 3) is None
+    assert point_counts.get(3, lambda: {3: 0}) == 0
+    assert point_index.synced_at is None
@@ -1,7 +1,13 @@
+import pytest
 from geoalchemy2.shape import to_shape
 from shapely import wkt
 from shapely.geometry import Point as ShapelyPoint
-from sqlalchemy import func
+from sqlalchemy import func, text
+
+from app.core.constants import PAGE_ORDER_KEYS, NearbyStrategy, PageOrder
+from app.models.point import Point
+from app.spatial.point_index import PointIndex, refresh_point_index
+from app.spatial.snapshot import dump_points
 
 
 def test_create_with_coordinates(point_repository, db_session, test_categories):
@@ -228,6 +234,99 @@ def test_get_nearest(point_repository, test_points):
     assert distances == sorted(distances)
 
 
+def test_get_nearest_batch_matches_single_queries(point_repository, test_points):
+    """Test that one batch query answers like a query per origin."""
+    origins = [
+        (52.5200, 13.4050, 3, None),  # Berlin center, k nearest
+        (52.5163, 13.3777, 5, 2500.0),  # Brandenburg Gate, within 2.5 km
+        (48.8584, 2.2945, 2, 1000.0),  # Paris, nothing in range
+        (52.5005, 13.4398, 1, None),
+    ]
+
+    rows = point_repository.get_nearest_batch(origins=origins)
+
+    for index, (lat, lng, k, radius) in enumerate(origins):
+        batch = [(p.id, d) for i, p, d in rows if i == index]
+        if radius is None:
+            single = point_repository.get_nearest(lat=lat, lng=lng, limit=k)
+        else:
+            single = point_repository.get_nearby(
+                lat=lat, lng=lng, radius=radius, limit=k
+            )
+        assert [i for i, _ in batch] == [p.id for p, _ in single]
+        assert [d for _, d in batch] == pytest.approx([d for _, d in single])
+
+    assert [i for i, _, _ in rows] == sorted(i for i, _, _ in rows)
+
+
+def test_get_distance_matrix(point_repository, test_points):
+    """Test that matrix cells match per-pair geodesic distances."""
+    coords = point_repository.get_coordinates(ids=[p.id for p in test_points])
+    sources = [coords[test_points[0].id], coords[test_points[1].id]]
+    destinations = [coords[p.id] for p in test_points]
+
+    batches = list(
+        point_repository.get_distance_matrix(
+            sources=sources, destinations=destinations, batch_rows=1
+        )
+    )
+
+    # One query per batch of source rows
+    assert [len(batch) for batch in batches] == [1, 1]
+    rows = [row for batch in batches for row in batch]
+    assert len(rows) == 2 and all(len(row) == len(test_points) for row in rows)
+    assert rows[0][0] == 0.0 and rows[1][1] == 0.0
+    # Geodesic distances from the first source agree with the nearby query
+    nearby = point_repository.get_nearby(
+        lat=sources[0][0], lng=sources[0][1], radius=100000
+    )
+    for point, distance in nearby:
+        column = [p.id for p in test_points].index(point.id)
+        assert rows[0][column] == pytest.approx(distance)
+
+
+def test_iter_export(point_repository, test_points):
+    """Test that the export reads every point, in id order, in batches."""
+    batches = list(point_repository.iter_export(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    rows = [row for batch in batches for row in batch]
+    assert [row.id for row in rows] == sorted(p.id for p in test_points)
+    gate = next(row for row in rows if row.name == "Brandenburg Gate")
+    assert (gate.lng, gate.lat) == pytest.approx((13.3777, 52.5163))
+
+    # Tiergarten and the Brandenburg Gate are the only points west of 13.38
+    rows = [
+        row
+        for batch in point_repository.iter_export(bbox=(13.3, 52.5, 13.38, 52.52))
+        for row in batch
+    ]
+    assert sorted(row.name for row in rows) == ["Brandenburg Gate", "Tiergarten"]
+
+
+def test_upload_staging_merge(point_repository, db_session, test_categories):
+    """Test that COPYed rows are merged into points with their geography."""
+    before = point_repository.count()
+    point_repository.create_upload_staging()
+    point_repository.copy_to_upload_staging(
+        rows=[
+            (1, "Reichstag", "Parliament, Berlin", 13.3761, 52.5186, None),
+            (2, 'Quote "test"', None, 13.3760, 52.5096, test_categories[0].id),
+        ]
+    )
+
+    assert point_repository.merge_upload_staging() == 2
+    assert point_repository.count() == before + 2
+
+    nearby = point_repository.get_nearby(lat=52.5186, lng=13.3761, radius=10)
+    assert [(p.name, p.description) for p, _ in nearby] == [
+        ("Reichstag", "Parliament, Berlin")
+    ]
+    quoted = db_session.query(Point).filter(Point.name == 'Quote "test"').one()
+    assert quoted.category_id == test_categories[0].id
+    assert db_session.query(Point.geog).filter(Point.id == quoted.id).scalar()
+
+
 def test_get_within_polygon(point_repository, test_points):
     """Test getting points within a polygon."""
     # Define a polygon covering central Berlin
@@ -248,3 +347,277 @@ def test_get_within_polygon(point_repository, test_points):
 
     # Verify we get the expected count
     assert len(points) == manual_count
+
+
+def test_create_sets_geography(point_repository, db_session, test_categories):
+    """Test that creating a point also stores its geography."""
+    point = point_repository.create_with_coordinates(
+        name="Geography Point",
+        description=None,
+        latitude=52.5200,
+        longitude=13.4050,
+    )
+    db_session.flush()
+
+    # The stored geography should match the geometry
+    geog_wkt = (
+        db_session.query(func.ST_AsText(Point.geog))
+        .filter(Point.id == point.id)
+        .scalar()
+    )
+    assert wkt.loads(geog_wkt).equals_exact(ShapelyPoint(13.4050, 52.5200), 1e-9)
+
+    db_session.commit()
+
+
+def test_update_coordinates_syncs_geography(point_repository, db_session, test_points):
+    """Test that moving a point keeps its stored geography in sync."""
+    test_point = test_points[0]
+
+    point_repository.update_coordinates(
+        point_id=test_point.id, latitude=48.8584, longitude=2.2945
+    )
+
+    geog_wkt = (
+        db_session.query(func.ST_AsText(Point.geog))
+        .filter(Point.id == test_point.id)
+        .scalar()
+    )
+    assert wkt.loads(geog_wkt).equals_exact(ShapelyPoint(2.2945, 48.8584), 1e-9)
+
+
+def test_get_nearby_bbox_matches_geography(point_repository, test_points):
+    """Test that the bbox strategy returns the same rows as the geography one."""
+    lat, lng = 52.5163, 13.3777  # Brandenburg Gate
+
+    for radius in (500, 2500, 10000):
+        geography_results = point_repository.get_nearby(
+            lat=lat, lng=lng, radius=radius, strategy=NearbyStrategy.GEOGRAPHY
+        )
+        bbox_results = point_repository.get_nearby(
+            lat=lat, lng=lng, radius=radius, strategy=NearbyStrategy.BBOX
+        )
+
+        assert [p.id for p, _ in bbox_results] == [p.id for p, _ in geography_results]
+        for _, distance in bbox_results:
+            assert distance <= radius
+
+
+def test_point_index_refresh_matches_database(point_repository, test_points):
+    """Test that an index loaded from the database answers like PostGIS."""
+    index = PointIndex()
+    refresh_point_index(index, point_repository)
+
+    assert index.is_fresh()
+    assert len(index) == len(test_points)
+
+    lat, lng = 52.5163, 13.3777  # Brandenburg Gate
+    database_results = point_repository.get_nearby(lat=lat, lng=lng, radius=5000)
+    index_results = index.nearby(lat=lat, lng=lng, radius=5000)
+
+    assert [i for i, _ in index_results] == [p.id for p, _ in database_results]
+    for (_, index_distance), (_, database_distance) in zip(
+        index_results, database_results
+    ):
+        # Haversine vs spheroid
+        assert abs(index_distance - database_distance) <= database_distance * 0.005
+
+
+def test_get_by_ids(point_repository, test_points):
+    """Test fetching points by a list of ids."""
+    ids = [test_points[0].id, test_points[2].id]
+
+    points = point_repository.get_by_ids(ids=ids)
+
+    assert sorted(p.id for p in points) == sorted(ids)
+    assert point_repository.get_by_ids(ids=[]) == []
+
+
+def test_snapshot_index_applies_recent_writes(
+    db_session, point_repository, test_points, tmp_path
+):
+    """Test that a snapshot-backed index picks up writes and deletes from the DB."""
+    path = str(tmp_path / "points.snap")
+    assert dump_points(point_repository, path, cell_size=0.05) == len(test_points)
+
+    # Changes made after the snapshot was published
+    moved, deleted = test_points[0], test_points[1]
+    point_repository.update_coordinates(
+        point_id=moved.id, latitude=48.8584, longitude=2.2945
+    )
+    point_repository.delete(id=deleted.id)
+    db_session.commit()
+
+    index = PointIndex(snapshot_path=path)
+    refresh_point_index(index, point_repository)
+
+    assert index.is_fresh()
+    assert len(index) == len(test_points) - 1
+    nearest_id, distance = index.nearest(lat=48.8584, lng=2.2945, limit=1)[0]
+    assert nearest_id == moved.id
+    assert distance < 1
+    assert deleted.id not in [i for i, _ in index.nearest(lat=0, lng=0, limit=100)]
+
+
+def test_bulk_create_update_delete(db_session, point_repository, test_categories):
+    """Test the set-based bulk write statements."""
+    ids = point_repository.bulk_create(
+        items=[
+            {
+                "name": f"Bulk {i}",
+                "description": None,
+                "latitude": 52.5 + i / 100,
+                "longitude": 13.4,
+                "category_id": test_categories[0].id,
+            }
+            for i in range(3)
+        ]
+    )
+    db_session.commit()
+    assert len(ids) == 3
+    assert point_repository.get_coordinates(ids=ids)[ids[2]] == pytest.approx(
+        (52.52, 13.4)
+    )
+
+    updated = point_repository.bulk_update(
+        items=[
+            {"id": ids[0], "name": "Renamed", "category_id": None},
+            {"id": ids[1], "latitude": 48.8584, "longitude": 2.2945},
+            {"id": ids[2], "latitude": 48.0, "longitude": 2.0},
+        ]
+    )
+    db_session.commit()
+    assert updated == 3
+    db_session.expire_all()
+    renamed = point_repository.get(id=ids[0])
+    assert (renamed.name, renamed.category_id) == ("Renamed", None)
+    assert point_repository.get_coordinates(ids=[ids[1]])[ids[1]] == pytest.approx(
+        (48.8584, 2.2945)
+    )
+    # The geography column follows the geometry
+    nearest = point_repository.get_nearest(lat=48.8584, lng=2.2945, limit=1)
+    assert nearest[0][0].id == ids[1]
+
+    deleted = point_repository.bulk_delete(ids=[ids[0], ids[1], 999999])
+    db_session.commit()
+    assert sorted(row[0] for row in deleted) == [ids[0], ids[1]]
+    assert [p.id for p in point_repository.get_by_ids(ids=ids)] == [ids[2]]
+
+
+@pytest.mark.parametrize("order", list(PageOrder))
+def test_get_multi_keyset(point_repository, test_points, order):
+    """Test that keyset pages match offset pages and cover every point once."""
+    offset_ids = [
+        p.id for p in point_repository.get_multi(limit=len(test_points), order=order)
+    ]
+
+    keyset_ids, after = [], None
+    while True:
+        page = point_repository.get_multi(limit=2, order=order, after=after)
+        keyset_ids += [p.id for p in page]
+        if len(page) < 2:
+            break
+        after = tuple(getattr(page[-1], name) for name in PAGE_ORDER_KEYS[order])
+
+    assert keyset_ids == offset_ids
+    assert sorted(keyset_ids) == sorted(p.id for p in test_points)
+
+
+def test_get_by_category_keyset(point_repository, test_points, test_categories):
+    """Test keyset pages of a category filter."""
+    park_id = test_categories[2].id
+    park_ids = sorted(p.id for p in test_points if p.category_id == park_id)
+
+    first = point_repository.get_by_category(category_id=park_id, limit=1)
+    rest = point_repository.get_by_category(
+        category_id=park_id, limit=10, after=(first[0].id,)
+    )
+
+    assert [p.id for p in first + rest] == park_ids
+
+
+def test_get_within_polygon_after_id(point_repository, test_points):
+    """Test that polygon results come in id order and resume after a cursor."""
+    polygon_wkt = "POLYGON((13.3 52.5, 13.3 52.55, 13.45 52.55, 13.45 52.5, 13.3 52.5))"
+    all_ids = [
+        p.id for p in point_repository.get_within_polygon(polygon_wkt=polygon_wkt)
+    ]
+
+    page = point_repository.get_within_polygon(
+        polygon_wkt=polygon_wkt, after_id=all_ids[0]
+    )
+
+    assert all_ids == sorted(all_ids)
+    assert [p.id for p in page] == all_ids[1:]
+
+
+def test_count_by_categories(db_session, point_repository, test_points):
+    """Test per-category counts and the planner estimate."""
+    counts = point_repository.count_by_categories()
+
+    assert sum(counts.values()) == len(test_points)
+    for category_id, count in counts.items():
+        assert count == sum(1 for p in test_points if p.category_id == category_id)
+
+    db_session.execute(text("ANALYZE points"))
+    assert point_repository.estimate_count() >= 0
+    assert point_repository.estimate_count(category_id=next(iter(counts))) >= 0
+
+
+def test_write_returning(db_session, point_repository, test_categories):
+    """Test that single-statement writes return the row with its category."""
+    museum = test_categories[1]
+
+    point = point_repository.insert_point(
+        name="Pergamon Museum",
+        description=None,
+        latitude=52.5212,
+        longitude=13.3969,
+        category_id=museum.id,
+    )
+    assert point.id is not None and point.created_at is not None
+    assert point.category.name == museum.name
+
+    point_id = point.id
+    point, previous_lat, previous_lng, previous_category = (
+        point_repository.update_point(
+            point_id=point_id,
+            values={"name": "Pergamonmuseum", "category_id": None},
+            latitude=52.52,
+            longitude=13.4,
+        )
+    )
+    assert (point.name, point.category) == ("Pergamonmuseum", None)
+    assert to_shape(point.geometry).coords[0] == pytest.approx((13.4, 52.52))
+    assert (previous_lat, previous_lng) == pytest.approx((52.5212, 13.3969))
+    assert previous_category == museum.id
+    # The stored geography moved with the geometry
+    nearest, distance = point_repository.get_nearest(lat=52.52, lng=13.4, limit=1)[0]
+    assert nearest.id == point_id and distance < 1
+
+    assert point_repository.delete_point(point_id=point_id).id == point_id
+    assert point_repository.get(id=point_id) is None
+    assert point_repository.delete_point(point_id=point_id) is None
+    assert (
+        point_repository.update_point(point_id=point_id, values={"name": "x"}) is None
+    )
+
+
+def test_read_rows(db_session, point_repository, test_points, test_categories):
+    """Test that reads return plain rows with coordinates and the category."""
+    gate = test_points[0]
+    park = test_categories[2]
+
+    row = point_repository.get_row(id=gate.id)
+    assert (row.id, row.name, row.category_id) == (gate.id, gate.name, park.id)
+    assert (row.lng, row.lat) == pytest.approx(to_shape(gate.geometry).coords[0])
+    assert (row.category_name, row.category_color) == (park.name, park.color)
+    assert point_repository.get_row(id=999999) is None
+
+    # Reads leave nothing in the identity map
+    db_session.expunge_all()
+    rows = point_repository.get_multi()
+    nearby = point_repository.get_nearby(lat=row.lat, lng=row.lng, radius=1)
+    assert len(rows) == len(test_points)
+    assert nearby[0][0] == row
+    assert not db_session.identity_map
@@ -0,0 +1,32 @@
+import pytest
+
+from app.database import SyncSessionRunner
+from app.services.async_adapter import AsyncServiceAdapter
+from app.services.category import CategoryService
+
+
+@pytest.mark.asyncio
+async def test_sync_runner_runs_repository_method(category_repository, test_categories):
+    """Test running a repository method through the sync session runner."""
+    runner = SyncSessionRunner(category_repository.session)
+
+    count = await runner.run(category_repository.count)
+
+    assert count == len(test_categories)
+
+
+@pytest.mark.asyncio
+async def test_service_adapter_awaits_service_methods(
+    category_repository, test_categories
+):
+    """Test that the adapter exposes service methods as coroutines."""
+    runner = SyncSessionRunner(category_repository.session)
+    service = AsyncServiceAdapter(CategoryService(category_repository), runner)
+
+    category = await service.get_category(category_id=test_categories[0].id)
+
+    assert category.id == test_categories[0].id
+    assert category.name == test_categories[0].name
+
+    # Non-callable attributes are passed through unchanged
+    assert service.category_repository is category_repository
@@ -0,0 +1,35 @@
+from app.spatial.canonical import canonical_circle
+from app.spatial.point_index import haversine
+
+BUCKETS = [100, 250, 500, 1000, 2500]
+
+
+def test_canonical_circle_covers_requested_circle():
+    """Test that the snapped circle contains the whole requested one."""
+    lat, lng, radius = 52.519201, 13.401634, 230
+
+    canonical = canonical_circle(lat, lng, radius, decimals=3, buckets=BUCKETS)
+
+    canonical_lat, canonical_lng, canonical_radius = canonical
+    assert (canonical_lat, canonical_lng) == (52.519, 13.402)
+    assert canonical_radius in BUCKETS
+    moved = float(haversine(lat, lng, canonical_lat, canonical_lng))
+    assert canonical_radius >= radius + moved
+
+
+def test_canonical_circle_is_stable():
+    """Test that nearby GPS fixes share a circle, which maps to itself."""
+    first = canonical_circle(52.519201, 13.401634, 230, decimals=3, buckets=BUCKETS)
+    second = canonical_circle(52.519288, 13.401711, 240, decimals=3, buckets=BUCKETS)
+
+    assert first == second
+    assert canonical_circle(*first, decimals=3, buckets=BUCKETS) == first
+
+
+def test_canonical_circle_without_large_enough_bucket():
+    """Test that circles past the largest bucket are left alone."""
+    assert canonical_circle(52.5192, 13.4016, 2490, decimals=3, buckets=BUCKETS) == (
+        52.5192,
+        13.4016,
+        2490,
+    )
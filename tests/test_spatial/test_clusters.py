@@ -0,0 +1,133 @@
+import math
+from unittest.mock import MagicMock
+
+from app.services.point import PointService
+from app.spatial.clusters import assemble_clusters, cells_per_tile, cluster_cell_size
+from app.spatial.tiles import (
+    WEB_MERCATOR_HALF_WIDTH,
+    column_runs,
+    tile_bounds,
+    tile_size_meters,
+    tiles_for_bbox,
+)
+
+
+def mercator(lat, lng):
+    """lng/lat to Web Mercator meters."""
+    x = math.radians(lng) * WEB_MERCATOR_HALF_WIDTH / math.pi
+    y = math.asinh(math.tan(math.radians(lat))) * WEB_MERCATOR_HALF_WIDTH / math.pi
+    return x, y
+
+
+def cell_centre(lat, lng, cell_size):
+    """Centre of the grid cell containing lat/lng, as ST_SnapToGrid returns it."""
+    x, y = mercator(lat, lng)
+    return (
+        (math.floor((x + WEB_MERCATOR_HALF_WIDTH) / cell_size) + 0.5) * cell_size
+        - WEB_MERCATOR_HALF_WIDTH,
+        (math.floor((y + WEB_MERCATOR_HALF_WIDTH) / cell_size) + 0.5) * cell_size
+        - WEB_MERCATOR_HALF_WIDTH,
+    )
+
+
+def test_cells_per_tile():
+    """Test that cluster cells always divide a tile evenly."""
+    assert cells_per_tile(64) == 4
+    assert cells_per_tile(256) == 1
+    assert cells_per_tile(100) == 3
+    assert cluster_cell_size(0, 64) == tile_size_meters(0) / 4
+
+
+def test_tile_bounds_round_trip():
+    """Test that a tile's bounds map back to that tile."""
+    min_lng, min_lat, max_lng, max_lat = tile_bounds(10, 550, 335)
+
+    assert tiles_for_bbox(
+        (min_lng + 1e-9, min_lat + 1e-9, max_lng - 1e-9, max_lat - 1e-9), 10
+    ) == [(10, 550, 335)]
+    assert min_lng < 13.3777 < max_lng
+    assert min_lat < 52.5163 < max_lat
+
+
+def test_tiles_for_bbox():
+    """Test the tiles covering a bbox, including across the antimeridian."""
+    assert tiles_for_bbox((-180, -85, 180, 85), 0) == [(0, 0, 0)]
+    assert len(tiles_for_bbox((-180, -85, 180, 85), 2)) == 16
+
+    wrapped = tiles_for_bbox((170, -10, -170, 10), 3)
+    assert sorted({x for _, x, _ in wrapped}) == [0, 7]
+
+
+def test_column_runs_split_at_the_antimeridian():
+    """Test that tiles either side of the antimeridian form separate runs."""
+    runs = column_runs(tiles_for_bbox((170, -10, -170, 10), 3))
+
+    assert [sorted({x for _, x, _ in run}) for run, _ in runs] == [[0], [7]]
+    assert [bounds[0] for _, bounds in runs] == [-180.0, 135.0]
+    assert [bounds[2] for _, bounds in runs] == [-135.0, 180.0]
+
+
+def test_clusters_across_the_antimeridian():
+    """Test that a bbox with min_lng > max_lng queries each side on its own."""
+    repository = MagicMock()
+    cell_size = cluster_cell_size(3, 64)
+    repository.get_grid_clusters.side_effect = lambda min_lng, **_: (
+        [(*cell_centre(-13.8, -172.0, cell_size), None, 2, -172.0, -13.8)]
+        if min_lng < 0
+        else [(*cell_centre(-17.8, 178.0, cell_size), None, 3, 178.0, -17.8)]
+    )
+    service = PointService(repository, MagicMock())
+
+    clusters = service.get_clusters(
+        min_lng=170, min_lat=-20, max_lng=-170, max_lat=-10, zoom=3
+    )
+
+    widths = [
+        call.kwargs["max_lng"] - call.kwargs["min_lng"]
+        for call in repository.get_grid_clusters.call_args_list
+    ]
+    assert len(widths) == 2 and all(width <= 45 for width in widths)
+    assert sorted(c.count for c in clusters) == [2, 3]
+
+
+def test_assemble_clusters_merges_categories():
+    """Test that per-category rows of one cell become one weighted cluster."""
+    zoom, radius = 10, 64
+    cell_size = cluster_cell_size(zoom, radius)
+    cx, cy = cell_centre(52.5163, 13.3777, cell_size)
+
+    clusters = assemble_clusters(
+        [
+            (cx, cy, 1, 3, 13.37, 52.51),
+            (cx, cy, None, 1, 13.41, 52.55),
+        ],
+        zoom,
+        radius,
+    )
+
+    assert list(clusters) == [(10, 550, 335)]
+    (cluster,) = clusters[(10, 550, 335)]
+    assert cluster.count == 4
+    lng, lat = cluster.coordinates.coordinates
+    assert abs(lng - 13.38) < 1e-9
+    assert abs(lat - 52.52) < 1e-9
+    assert [(c.category_id, c.count) for c in cluster.categories] == [(1, 3), (None, 1)]
+
+
+def test_assemble_clusters_groups_by_tile():
+    """Test that cells are assigned to the tile that contains them."""
+    zoom, radius = 5, 64
+    cell_size = cluster_cell_size(zoom, radius)
+    berlin = cell_centre(52.5163, 13.3777, cell_size)
+    paris = cell_centre(48.8584, 2.2945, cell_size)
+
+    clusters = assemble_clusters(
+        [(*berlin, 1, 2, 13.4, 52.5), (*paris, 2, 5, 2.3, 48.9)], zoom, radius
+    )
+
+    # Each city lands in the z5 tile that tiles_for_bbox reports for it
+    assert set(clusters) == {
+        tiles_for_bbox((13.4, 52.5, 13.4, 52.5), zoom)[0],
+        tiles_for_bbox((2.3, 48.9, 2.3, 48.9), zoom)[0],
+    }
+    assert sorted(c.count for tile in clusters.values() for c in tile) == [2, 5]
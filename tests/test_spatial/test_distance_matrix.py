@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+
+from app.spatial import matrix as matrix_module
+from app.spatial.matrix import (
+    DistanceMatrix,
+    encode_binary,
+    encode_json,
+    haversine_matrix,
+    row_blocks,
+)
+from app.spatial.point_index import haversine
+
+SOURCES = [(52.5163, 13.3777), (52.5208, 13.4094), (48.8584, 2.2945)]
+DESTINATIONS = [(52.5163, 13.3777), (51.5007, -0.1246)]
+
+
+def test_haversine_matrix_matches_pairwise():
+    """Test that the vectorized matrix matches one-to-many distances."""
+    rows = np.vstack(list(haversine_matrix(SOURCES, DESTINATIONS)))
+
+    assert rows.shape == (3, 2)
+    for i, (lat, lng) in enumerate(SOURCES):
+        expected = haversine(
+            lat,
+            lng,
+            np.array([d[0] for d in DESTINATIONS]),
+            np.array([d[1] for d in DESTINATIONS]),
+        )
+        np.testing.assert_allclose(rows[i], expected)
+    assert rows[0, 0] == 0.0
+
+
+def test_haversine_matrix_blocks(monkeypatch):
+    """Test that large matrices are produced in blocks of whole rows."""
+    monkeypatch.setattr(matrix_module, "MATRIX_BLOCK_CELLS", 4)
+
+    blocks = list(haversine_matrix(SOURCES, DESTINATIONS))
+
+    assert [b.shape for b in blocks] == [(2, 2), (1, 2)]
+
+
+def test_encode_json():
+    """Test that JSON output is a row-major nested list."""
+    matrix = DistanceMatrix(2, 2, row_blocks([[[0.0, 1.234]], [[5.6789, 0.0]]]))
+
+    data = json.loads(b"".join(encode_json(matrix)))
+
+    assert data == {"rows": 2, "columns": 2, "distances": [[0.0, 1.23], [5.68, 0.0]]}
+
+
+def test_encode_binary():
+    """Test that binary output is little-endian float64, row-major."""
+    matrix = DistanceMatrix(3, 2, haversine_matrix(SOURCES, DESTINATIONS))
+
+    values = np.frombuffer(b"".join(encode_binary(matrix)), dtype="<f8")
+
+    expected = np.vstack(list(haversine_matrix(SOURCES, DESTINATIONS)))
+    np.testing.assert_array_equal(values.reshape(3, 2), expected)
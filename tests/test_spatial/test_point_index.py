@@ -0,0 +1,159 @@
+import numpy as np
+from shapely.geometry import Polygon
+
+from app.spatial.point_index import PointIndex, haversine, parse_polygon
+
+BERLIN_ROWS = [
+    (1, 52.5163, 13.3777, 1),  # Brandenburg Gate
+    (2, 52.5186, 13.3761, 1),  # Reichstag
+    (3, 52.5208, 13.4094, 2),  # Alexanderplatz TV tower
+    (4, 52.5096, 13.3760, None),  # Potsdamer Platz
+    (5, 48.8584, 2.2945, 2),  # Eiffel Tower
+]
+
+
+def make_index(rows=BERLIN_ROWS):
+    index = PointIndex(cell_size=0.05, max_staleness=30)
+    index.load(rows)
+    index.mark_synced()
+    return index
+
+
+def brute_force_nearby(rows, lat, lng, radius):
+    ids = np.array([r[0] for r in rows])
+    distances = haversine(
+        lat, lng, np.array([r[1] for r in rows]), np.array([r[2] for r in rows])
+    )
+    mask = distances <= radius
+    order = np.lexsort((ids[mask], distances[mask]))
+    return ids[mask][order].tolist()
+
+
+def test_nearby_matches_brute_force():
+    """Test that grid candidates plus haversine match a full scan."""
+    rng = np.random.default_rng(42)
+    rows = [
+        (i, float(lat), float(lng), None)
+        for i, (lat, lng) in enumerate(
+            zip(rng.uniform(52.3, 52.7, 2000), rng.uniform(13.1, 13.7, 2000)), start=1
+        )
+    ]
+    index = make_index(rows)
+
+    for radius in (100, 1500, 12000):
+        pairs = index.nearby(lat=52.52, lng=13.40, radius=radius, limit=5000)
+        assert [i for i, _ in pairs] == brute_force_nearby(rows, 52.52, 13.40, radius)
+
+
+def test_nearby_orders_by_distance_and_limits():
+    """Test that nearby results are closest first and limited."""
+    index = make_index()
+
+    pairs = index.nearby(lat=52.5163, lng=13.3777, radius=3000, limit=3)
+
+    assert [i for i, _ in pairs] == [1, 2, 4]
+    assert pairs[0][1] == 0.0
+    assert all(a[1] <= b[1] for a, b in zip(pairs, pairs[1:]))
+
+
+def test_nearby_category_filter():
+    """Test that nearby can be restricted to one category."""
+    index = make_index()
+
+    pairs = index.nearby(lat=52.5163, lng=13.3777, radius=5000, category_id=2)
+
+    assert [i for i, _ in pairs] == [3]
+
+
+def test_nearby_across_antimeridian():
+    """Test that points on both sides of the antimeridian are found."""
+    index = make_index([(1, -17.0, 179.999, None), (2, -17.0, -179.999, None)])
+
+    pairs = index.nearby(lat=-17.0, lng=179.9995, radius=1000)
+
+    assert sorted(i for i, _ in pairs) == [1, 2]
+
+
+def test_nearest_expands_until_enough_points():
+    """Test that nearest widens its search radius to reach distant points."""
+    index = make_index()
+
+    pairs = index.nearest(lat=52.5163, lng=13.3777, limit=5)
+
+    assert [i for i, _ in pairs] == [1, 2, 4, 3, 5]
+    # Berlin to Paris is roughly 880 km
+    assert 850000 < pairs[-1][1] < 900000
+
+
+def test_within_polygon():
+    """Test that within_polygon returns points inside the polygon by id."""
+    index = make_index()
+    polygon = Polygon(
+        [(13.37, 52.51), (13.38, 52.51), (13.38, 52.52), (13.37, 52.52), (13.37, 52.51)]
+    )
+
+    assert index.within_polygon(polygon=polygon) == [1, 2]
+
+
+def test_upsert_and_remove():
+    """Test that incremental writes are visible to reads."""
+    index = make_index()
+
+    index.upsert(6, 52.5170, 13.3800, 1)  # New point near the Brandenburg Gate
+    index.upsert(5, 52.5160, 13.3780, 2)  # Eiffel Tower "moves" to Berlin
+    index.remove(2)
+
+    ids = [i for i, _ in index.nearby(lat=52.5163, lng=13.3777, radius=500)]
+    assert ids == [1, 5, 6]
+    assert len(index) == 5
+
+    # Freed slots are reused
+    index.upsert(7, 52.5186, 13.3761, None)
+    assert len(index) == 6
+
+
+def test_upsert_grows_empty_index():
+    """Test that an index can be built entirely from incremental writes."""
+    index = make_index([])
+
+    for i in range(1, 2001):
+        index.upsert(i, 10 + i * 1e-4, 20.0, None)
+
+    assert len(index) == 2000
+    assert [i for i, _ in index.nearest(lat=10.0, lng=20.0, limit=2)] == [1, 2]
+
+
+def test_freshness():
+    """Test that only a warm, recently synced index reports itself fresh."""
+    index = PointIndex(max_staleness=30)
+    assert not index.is_fresh()
+
+    index.load(BERLIN_ROWS)
+    assert not index.is_fresh()
+
+    index.mark_synced()
+    assert index.is_fresh()
+
+    index.synced_at -= 31
+    assert not index.is_fresh()
+
+
+def test_parse_polygon():
+    """Test that only valid polygons are answered from the index."""
+    assert parse_polygon("POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))") is not None
+    assert parse_polygon("POLYGON((0 0, 1 0") is None
+    assert parse_polygon("POLYGON EMPTY") is None
+    # Self-intersecting bow tie
+    assert parse_polygon("POLYGON((0 0, 1 1, 1 0, 0 1, 0 0))") is None
+
+
+def test_within_polygon_after_id():
+    """Test that within_polygon pages through ids after a cursor."""
+    index = make_index()
+    polygon = Polygon(
+        [(13.0, 52.0), (14.0, 52.0), (14.0, 53.0), (13.0, 53.0), (13.0, 52.0)]
+    )
+
+    assert index.within_polygon(polygon=polygon, limit=2) == [1, 2]
+    assert index.within_polygon(polygon=polygon, limit=2, after_id=2) == [3, 4]
+    assert index.within_polygon(polygon=polygon, limit=2, after_id=4) == []
@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+
+from app.spatial.point_index import PointIndex
+from app.spatial.snapshot import PointSnapshot, write_snapshot
+
+ROWS = [
+    (1, 52.5163, 13.3777, 1),  # Brandenburg Gate
+    (2, 52.5186, 13.3761, 1),  # Reichstag
+    (3, 52.5208, 13.4094, 2),  # Alexanderplatz TV tower
+    (4, 52.5096, 13.3760, None),  # Potsdamer Platz
+    (5, 48.8584, 2.2945, 2),  # Eiffel Tower
+]
+
+
+def snapshot_index(path, rows=ROWS):
+    write_snapshot(str(path), rows, cell_size=0.05)
+    index = PointIndex(cell_size=0.05, snapshot_path=str(path))
+    assert index.open_snapshot()
+    index.mark_synced()
+    return index
+
+
+def test_snapshot_round_trip(tmp_path):
+    """Test that a written snapshot maps back to the same rows."""
+    path = tmp_path / "points.snap"
+
+    assert write_snapshot(str(path), ROWS, cell_size=0.05) == 5
+    snapshot = PointSnapshot(str(path))
+
+    assert snapshot.count == 5
+    rows = sorted(
+        zip(
+            snapshot.ids.tolist(),
+            snapshot.lats.tolist(),
+            snapshot.lngs.tolist(),
+            snapshot.categories.tolist(),
+        )
+    )
+    assert rows == [(i, lat, lng, -1 if c is None else c) for i, lat, lng, c in ROWS]
+    # Views over the mapping, not copies
+    assert not snapshot.lats.flags.writeable
+    assert snapshot.watermark is None
+
+
+def test_snapshot_index_matches_loaded_index(tmp_path):
+    """Test that a snapshot-backed index answers like an in-memory one."""
+    rng = np.random.default_rng(7)
+    rows = [
+        (i, float(lat), float(lng), int(c))
+        for i, (lat, lng, c) in enumerate(
+            zip(
+                rng.uniform(52.3, 52.7, 3000),
+                rng.uniform(13.1, 13.7, 3000),
+                rng.integers(1, 4, 3000),
+            ),
+            start=1,
+        )
+    ]
+    loaded = PointIndex(cell_size=0.05)
+    loaded.load(rows)
+    mapped = snapshot_index(tmp_path / "points.snap", rows)
+
+    assert len(mapped) == 3000
+    for radius in (250, 2000, 20000):
+        assert mapped.nearby(
+            lat=52.5, lng=13.4, radius=radius, limit=5000
+        ) == loaded.nearby(lat=52.5, lng=13.4, radius=radius, limit=5000)
+    assert mapped.nearest(lat=52.5, lng=13.4, limit=10) == loaded.nearest(
+        lat=52.5, lng=13.4, limit=10
+    )
+    assert mapped.nearby(
+        lat=52.5, lng=13.4, radius=5000, category_id=2
+    ) == loaded.nearby(lat=52.5, lng=13.4, radius=5000, category_id=2)
+
+
+def test_overlay_shadows_snapshot_rows(tmp_path):
+    """Test that recent writes override and delete snapshot rows."""
+    index = snapshot_index(tmp_path / "points.snap")
+
+    index.upsert(5, 52.5160, 13.3780, 2)  # Eiffel Tower "moves" to Berlin
+    index.upsert(6, 52.5170, 13.3800, 1)  # New point
+    index.remove(2)
+
+    ids = [i for i, _ in index.nearby(lat=52.5163, lng=13.3777, radius=500)]
+    assert ids == [1, 5, 6]
+    # Nothing is left at the old Eiffel Tower position
+    assert index.nearby(lat=48.8584, lng=2.2945, radius=1000) == []
+    assert len(index) == 5
+
+
+def test_retain_drops_deleted_points(tmp_path):
+    """Test that ids missing from the database are hidden."""
+    index = snapshot_index(tmp_path / "points.snap")
+    index.upsert(6, 52.5170, 13.3800, 1)
+
+    index.retain(np.array([1, 3, 5]))
+
+    assert len(index) == 3
+    assert [i for i, _ in index.nearest(lat=52.5163, lng=13.3777, limit=5)] == [
+        1,
+        3,
+        5,
+    ]
+
+
+def test_republished_snapshot_is_swapped_in(tmp_path):
+    """Test that a new snapshot replaces the old one and clears the overlay."""
+    path = tmp_path / "points.snap"
+    index = snapshot_index(path)
+    index.upsert(6, 52.5170, 13.3800, 1)
+    old_snapshot = index.snapshot
+
+    # Nothing changed on disk
+    assert not index.open_snapshot()
+
+    write_snapshot(str(path), ROWS[:2], cell_size=0.05)
+    assert index.open_snapshot()
+    index.mark_synced()
+
+    assert index.snapshot is not old_snapshot
+    assert len(index) == 2
+    assert [i for i, _ in index.nearest(lat=52.5163, lng=13.3777, limit=5)] == [1, 2]
+    # Readers still holding the old mapping keep working
+    assert old_snapshot.count == 5
+    # No temporary files are left behind
+    assert os.listdir(tmp_path) == ["points.snap"]
+
+
+def test_empty_snapshot(tmp_path):
+    """Test that an empty table produces a usable snapshot."""
+    index = snapshot_index(tmp_path / "points.snap", [])
+
+    assert len(index) == 0
+    assert index.nearest(lat=0.0, lng=0.0, limit=3) == []
@@ -0,0 +1,117 @@
+import time
+from unittest.mock import MagicMock
+
+from app.services.point import PointService
+from app.services.query_cache import (
+    WORLD,
+    QueryCache,
+    normalize_coords,
+    polygon_area,
+)
+from app.spatial.queries import radius_envelopes
+
+BERLIN = (52.5163, 13.3777)
+PARIS = (48.8584, 2.2945)
+
+
+def test_normalize_coords():
+    """Test that coordinates differing only past 1e-6 degrees share a key."""
+    assert normalize_coords(52.51630004, 13.37769996) == (52.5163, 13.3777)
+    assert normalize_coords(-0.0000001, 0.0) == (0.0, 0.0)
+
+
+def test_polygon_area():
+    """Test that a polygon's area is its bbox, or the world if unreadable."""
+    assert polygon_area("POLYGON((13 52, 14 52, 14 53, 13 53, 13 52))") == [
+        (13.0, 52.0, 14.0, 53.0)
+    ]
+    assert polygon_area("POLYGON((13 52, 14") == [WORLD]
+    assert polygon_area("POLYGON EMPTY") == [WORLD]
+
+
+def test_query_cache_get_put():
+    """Test that results are served until they expire."""
+    cache = QueryCache(max_entries=8, ttl=0.01)
+    cache.put("berlin", ["row"], radius_envelopes(*BERLIN, 1000), cache.generation)
+
+    assert cache.get("berlin") == ["row"]
+    assert cache.get("paris") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    time.sleep(0.02)
+    assert cache.get("berlin") is None
+    assert len(cache) == 0
+
+
+def test_query_cache_evicts_least_recently_used():
+    """Test that the cache keeps at most max_entries results."""
+    cache = QueryCache(max_entries=2, ttl=60)
+    area = radius_envelopes(*BERLIN, 1000)
+
+    cache.put("a", 1, area, cache.generation)
+    cache.put("b", 2, area, cache.generation)
+    cache.get("a")  # Touch so "b" is the oldest
+    cache.put("c", 3, area, cache.generation)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_query_cache_invalidate_point():
+    """Test that a write drops only the results whose area contains it."""
+    cache = QueryCache(max_entries=8, ttl=60)
+    cache.put("berlin", 1, radius_envelopes(*BERLIN, 5000), cache.generation)
+    cache.put("paris", 2, radius_envelopes(*PARIS, 5000), cache.generation)
+    cache.put("world", 3, [WORLD], cache.generation)
+
+    cache.invalidate_point(52.52, 13.38)
+
+    assert cache.get("berlin") is None
+    assert cache.get("paris") == 2
+    assert cache.get("world") is None
+
+    # Outside the circle's envelope, though in the same grid cell
+    cache.put("berlin", 1, radius_envelopes(*BERLIN, 5000), cache.generation)
+    cache.invalidate_point(52.9, 13.9)
+    assert cache.get("berlin") == 1
+
+
+def test_query_cache_invalidate_across_antimeridian():
+    """Test that areas split at the antimeridian are invalidated on both sides."""
+    cache = QueryCache(max_entries=8, ttl=60)
+    area = radius_envelopes(0.0, 179.99, 5000)
+
+    cache.put("fiji", 1, area, cache.generation)
+    cache.invalidate_point(0.0, -179.99)
+
+    assert cache.get("fiji") is None
+
+
+def test_query_cache_skips_results_older_than_a_write():
+    """Test that a result loaded before a write is not stored after it."""
+    cache = QueryCache(max_entries=8, ttl=60)
+    generation = cache.generation
+
+    cache.invalidate_point(*PARIS)
+    cache.put("berlin", 1, radius_envelopes(*BERLIN, 1000), generation)
+
+    assert cache.get("berlin") is None
+
+
+def test_point_service_queries_exact_coords():
+    """Test that rounding only shapes the cache key, never the query."""
+    repository = MagicMock()
+    repository.get_nearby.return_value = []
+    repository.get_nearest.return_value = []
+    lat, lng = 52.51630004, 13.37769996
+
+    for query_cache in (None, QueryCache(max_entries=8, ttl=60)):
+        service = PointService(repository, MagicMock(), query_cache=query_cache)
+        service.get_nearby_points(lat=lat, lng=lng, radius=1000)
+        service.get_nearest_points(lat=lat, lng=lng)
+
+        assert repository.get_nearby.call_args.kwargs["lat"] == lat
+        assert repository.get_nearby.call_args.kwargs["lng"] == lng
+        assert repository.get_nearest.call_args.kwargs["lat"] == lat
+        assert repository.get_nearest.call_args.kwargs["lng"] == lng
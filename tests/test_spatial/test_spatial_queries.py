@@ -11,9 +11,11 @@ from app.core.constants import SpatialRefSys
 from app.models.point import Point
 from app.spatial.queries import (
     add_distance_to_query,
+    bbox_envelopes,
     filter_by_distance,
     nearest_neighbor_query,
     point_to_ewkb,
+    radius_envelopes,
 )
 
 
@@ -185,3 +187,73 @@ def test_points_within_polygon(db_session, test_points):
 
     # The query count should match our manual count
     assert len(points_in_polygon) == manual_count
+
+
+def destination(lat, lng, bearing, distance, r=6371008.8):
+    """Spherical destination point from a start, bearing (degrees) and distance."""
+    lat1, lng1, theta = map(math.radians, [lat, lng, bearing])
+    delta = distance / r
+    lat2 = math.asin(
+        math.sin(lat1) * math.cos(delta)
+        + math.cos(lat1) * math.sin(delta) * math.cos(theta)
+    )
+    lng2 = lng1 + math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(lat1),
+        math.cos(delta) - math.sin(lat1) * math.sin(lat2),
+    )
+    # Normalize longitude to [-180, 180)
+    return math.degrees(lat2), (math.degrees(lng2) + 540) % 360 - 180
+
+
+def in_envelopes(envelopes, lat, lng):
+    return any(
+        min_lng <= lng <= max_lng and min_lat <= lat <= max_lat
+        for min_lng, min_lat, max_lng, max_lat in envelopes
+    )
+
+
+def test_radius_envelopes_cover_circle():
+    """Test that the envelope contains every point on the search circle."""
+    for lat, lng, radius in [
+        (52.5200, 13.4050, 500),
+        (-33.8688, 151.2093, 25000),
+        (0.0, 0.0, 100000),
+        (70.0, -40.0, 100000),
+    ]:
+        envelopes = radius_envelopes(lat, lng, radius)
+        assert len(envelopes) == 1
+
+        for bearing in range(0, 360, 5):
+            assert in_envelopes(envelopes, *destination(lat, lng, bearing, radius))
+
+
+def test_radius_envelopes_split_at_antimeridian():
+    """Test that a circle crossing the antimeridian yields two boxes."""
+    lat, lng, radius = -17.7134, 179.99, 5000
+
+    envelopes = radius_envelopes(lat, lng, radius)
+
+    # One box on each side of the antimeridian
+    assert len(envelopes) == 2
+    assert envelopes[0][2] == 180.0
+    assert envelopes[1][0] == -180.0
+
+    for bearing in range(0, 360, 5):
+        assert in_envelopes(envelopes, *destination(lat, lng, bearing, radius))
+
+
+def test_radius_envelopes_near_pole():
+    """Test that a circle reaching a pole covers all longitudes."""
+    envelopes = radius_envelopes(89.99, 45.0, 5000)
+
+    assert envelopes == [(-180.0, envelopes[0][1], 180.0, 90.0)]
+    assert envelopes[0][1] < 89.99
+
+
+def test_bbox_envelopes():
+    """Test that only a bbox crossing the antimeridian is split."""
+    assert bbox_envelopes((13.0, 52.0, 14.0, 53.0)) == [(13.0, 52.0, 14.0, 53.0)]
+    assert bbox_envelopes((170.0, -20.0, -170.0, -10.0)) == [
+        (170.0, -20.0, 180.0, -10.0),
+        (-180.0, -20.0, -170.0, -10.0),
+    ]
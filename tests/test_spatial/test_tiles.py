@@ -0,0 +1,97 @@
+import time
+
+from app.core.utils import etag_matches
+from app.spatial.tiles import TileCache, make_tile, tiles_for_point
+
+
+def test_tiles_for_point_covers_every_zoom():
+    """Test that a point maps to its containing tile at each zoom level."""
+    tiles = set(tiles_for_point(52.5163, 13.3777, max_zoom=14))
+
+    assert (0, 0, 0) in tiles
+    assert (10, 550, 335) in tiles
+    assert (14, 8800, 5373) in tiles
+    assert {z for z, _, _ in tiles} == set(range(15))
+
+
+def test_tiles_for_point_includes_buffer_neighbours():
+    """Test that points near a tile edge also invalidate the neighbour."""
+    # Exactly on the z=1 boundary between x=0 and x=1
+    tiles = set(tiles_for_point(10.0, 0.0, max_zoom=1))
+
+    assert (1, 0, 0) in tiles
+    assert (1, 1, 0) in tiles
+
+
+def test_make_tile_etag():
+    """Test that the ETag depends only on the tile content."""
+    assert make_tile(b"abc").etag == make_tile(b"abc").etag
+    assert make_tile(b"abc").etag != make_tile(b"abd").etag
+    assert make_tile(b"").etag.startswith('"')
+
+
+def test_tile_cache_get_put():
+    """Test that cached tiles are keyed by tile and category."""
+    cache = TileCache(max_bytes=1024, ttl=60)
+    tile = make_tile(b"points")
+
+    cache.put((10, 550, 335), None, tile)
+
+    assert cache.get((10, 550, 335), None) == tile
+    assert cache.get((10, 550, 335), 1) is None
+    assert cache.get((10, 550, 336), None) is None
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_tile_cache_evicts_least_recently_used():
+    """Test that the cache stays within its byte budget."""
+    cache = TileCache(max_bytes=10, ttl=60)
+
+    cache.put((1, 0, 0), None, make_tile(b"aaaa"))
+    cache.put((1, 0, 1), None, make_tile(b"bbbb"))
+    cache.get((1, 0, 0), None)  # Touch so (1, 0, 1) is the oldest
+    cache.put((1, 1, 0), None, make_tile(b"cccc"))
+
+    assert cache.get((1, 0, 1), None) is None
+    assert cache.get((1, 0, 0), None) is not None
+    assert cache.get((1, 1, 0), None) is not None
+    # Larger than the whole budget: never cached
+    cache.put((1, 1, 1), None, make_tile(b"x" * 11))
+    assert cache.get((1, 1, 1), None) is None
+
+
+def test_tile_cache_expires_entries():
+    """Test that entries older than the TTL are not served."""
+    cache = TileCache(max_bytes=1024, ttl=0.01)
+    cache.put((0, 0, 0), None, make_tile(b"points"))
+
+    time.sleep(0.02)
+
+    assert cache.get((0, 0, 0), None) is None
+    assert len(cache) == 0
+
+
+def test_tile_cache_invalidate_point():
+    """Test that a write drops all variants of the tiles around it only."""
+    cache = TileCache(max_bytes=1024, ttl=60)
+    cache.put((10, 550, 335), None, make_tile(b"all"))
+    cache.put((10, 550, 335), 1, make_tile(b"category"))
+    cache.put((10, 0, 0), None, make_tile(b"far away"))
+
+    cache.invalidate_point(52.5163, 13.3777)
+
+    assert cache.get((10, 550, 335), None) is None
+    assert cache.get((10, 550, 335), 1) is None
+    assert cache.get((10, 0, 0), None) is not None
+
+
+def test_etag_matches():
+    """Test If-None-Match parsing."""
+    etag = '"abc"'
+
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"xyz", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"xyz"', etag)
+    assert not etag_matches(None, etag)